@@ -0,0 +1,198 @@
+"""
+Batch analysis of the BeeActions h5 files found in a directory.
+
+Usage: python -m beeactions.analyze directory [-o summary.json] [-j workers]
+
+Files are analysed in parallel by a pool of processes. Only the events (time, action and bee arrays or events table)
+of each scan are read, never the settings saved as xml in the attributes. For each scan are computed:
+
+* the number of events, the duration and the number of events of each action
+* the distribution of the intervals between consecutive events (percentiles and log spaced histogram)
+* the latency from the start of the scan to the first occurrence of each action
+* the action transition matrix, counting the successive actions of a same bee
+* the bouts of each bee (successive events of a bee separated by less than the bout gap): number, duration and
+  interval between bouts
+
+All results are written in a single json file.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tables
+
+from beeactions.storage import read_events, get_scan_array
+
+interval_bins = np.logspace(-3, 3, 25)  # 1 ms to 1000 s
+
+
+def find_h5_files(directory):
+    files = []
+    for root, dirs, names in os.walk(directory):
+        for name in names:
+            if name.endswith('.h5') or name.endswith('.hdf5'):
+                files.append(os.path.join(root, name))
+    return sorted(files)
+
+
+def iter_scan_groups(h5file):
+    """
+    Iterate over the groups of a h5 file holding events (an events table or a time_axis array)
+    """
+    for group in h5file.walk_groups():
+        if 'events' in group or get_scan_array(group, 'time_axis') is not None:
+            yield group
+
+
+def percentiles(values, q=(5, 25, 50, 75, 95)):
+    if len(values) == 0:
+        return dict([(f'p{p}', None) for p in q])
+    return dict([(f'p{p}', float(value)) for p, value in zip(q, np.percentile(values, q))])
+
+
+def interval_metrics(times):
+    """
+    Distribution of the intervals (in s) between consecutive events, times being sorted and in s
+    """
+    intervals = np.diff(times)
+    metrics = dict(count=int(len(intervals)), mean=float(intervals.mean()) if len(intervals) else None)
+    metrics.update(percentiles(intervals))
+    metrics['histogram'] = np.histogram(intervals, bins=interval_bins)[0].tolist()
+    return metrics
+
+
+def first_latencies(times, codes, actions):
+    """
+    Time (in s) from the start of the scan to the first event of each action (None if the action never occurs)
+    """
+    first = np.full((len(actions),), np.inf)
+    np.minimum.at(first, codes[codes >= 0], times[codes >= 0])
+    return dict([(action, float(value) if np.isfinite(value) else None) for action, value in zip(actions, first)])
+
+
+def transition_matrix(times, codes, bees, n_actions):
+    """
+    Count the transitions from an action to the next action done by the same bee
+
+    Returns
+    -------
+    ndarray: matrix whose element (i, j) is the number of times action j followed action i
+    """
+    valid = (bees >= 0) & (codes >= 0)
+    times, codes, bees = times[valid], codes[valid], bees[valid]
+    order = np.lexsort((times, bees))
+    codes, bees = codes[order].astype(np.int64), bees[order]
+    same_bee = bees[1:] == bees[:-1]
+    transitions = codes[:-1][same_bee] * n_actions + codes[1:][same_bee]
+    return np.bincount(transitions, minlength=n_actions * n_actions).reshape((n_actions, n_actions))
+
+
+def bout_metrics(times, bees, bout_gap):
+    """
+    Split the events of each bee into bouts separated by more than bout_gap seconds
+    """
+    valid = bees >= 0
+    times, bees = times[valid], bees[valid]
+    if len(times) == 0:
+        return dict(n_bouts=0, bees=0, duration=percentiles([]), interval=percentiles([]))
+    order = np.lexsort((times, bees))
+    times, bees = times[order], bees[order]
+    new_bee = np.concatenate(([True], bees[1:] != bees[:-1]))
+    new_bout = new_bee | np.concatenate(([True], np.diff(times) > bout_gap))
+    starts = np.flatnonzero(new_bout)
+    ends = np.concatenate((starts[1:], [len(times)])) - 1
+    durations = times[ends] - times[starts]
+    # interval between a bout and the previous bout of the same bee
+    same_bee = ~new_bee[starts[1:]]
+    intervals = (times[starts[1:]] - times[ends[:-1]])[same_bee]
+    return dict(n_bouts=int(len(starts)), bees=int(np.count_nonzero(new_bee)), duration=percentiles(durations),
+                interval=percentiles(intervals))
+
+
+def analyze_scan(group, bout_gap=5., per_bee=False):
+    """
+    Compute the metrics of the events of a scan group
+    """
+    events, actions = read_events(group)
+    events = events[np.argsort(events['timestamp'], kind='stable')]
+    times = events['timestamp'] / 1e9
+    codes = events['action']
+    bees = events['bee']
+
+    counts = np.bincount(codes[codes >= 0], minlength=len(actions))
+    metrics = dict(n_events=int(len(events)), duration=float(times[-1] - times[0]) if len(times) else 0.,
+                   actions=actions, action_counts=dict(zip(actions, counts.tolist())),
+                   intervals=interval_metrics(times), first_latency=first_latencies(times, codes, actions),
+                   transitions=transition_matrix(times, codes, bees, len(actions)).tolist(),
+                   bouts=bout_metrics(times, bees, bout_gap))
+    if per_bee:
+        metrics['bee_transitions'] = dict([
+            (str(bee), transition_matrix(times[bees == bee], codes[bees == bee], bees[bees == bee],
+                                         len(actions)).tolist()) for bee in np.unique(bees[bees >= 0])])
+    return metrics
+
+
+def analyze_file(path, bout_gap=5., per_bee=False):
+    """
+    Analyze all the scans of a h5 file
+
+    Returns
+    -------
+    list of dict: one dict per scan with the file, the scan path and its metrics or the error raised
+    """
+    results = []
+    try:
+        with tables.open_file(path, 'r') as h5file:
+            for group in iter_scan_groups(h5file):
+                try:
+                    results.append(dict(file=path, scan=group._v_pathname,
+                                        metrics=analyze_scan(group, bout_gap, per_bee)))
+                except Exception as e:
+                    results.append(dict(file=path, scan=group._v_pathname, error=str(e)))
+    except Exception as e:
+        results.append(dict(file=path, scan=None, error=str(e)))
+    return results
+
+
+def analyze_directory(directory, output, workers=None, bout_gap=5., per_bee=False):
+    """
+    Analyze in parallel all the h5 files found in directory and write the results in the json file output
+    """
+    files = find_h5_files(directory)
+    start = time.perf_counter()
+    scans = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(analyze_file, files, [bout_gap] * len(files), [per_bee] * len(files)):
+            scans.extend(results)
+    summary = dict(directory=os.path.abspath(directory), n_files=len(files), n_scans=len(scans),
+                   bout_gap=bout_gap, interval_bins=interval_bins.tolist(),
+                   elapsed=time.perf_counter() - start, scans=scans)
+    with open(output, 'w') as f:
+        json.dump(summary, f, indent=1)
+    return summary
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m beeactions.analyze',
+                                     description='Compute the metrics of all the BeeActions scans of a directory')
+    parser.add_argument('directory', help='directory searched (recursively) for h5 files')
+    parser.add_argument('-o', '--output', default='beeactions_summary.json', help='json summary file')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes (default: all cores)')
+    parser.add_argument('--bout-gap', type=float, default=5., help='maximum gap (in s) between events of a bout')
+    parser.add_argument('--per-bee', action='store_true', help='also save the transition matrix of each bee')
+    options = parser.parse_args(args)
+
+    summary = analyze_directory(options.directory, options.output, options.workers, options.bout_gap,
+                                options.per_bee)
+    errors = [scan for scan in summary['scans'] if 'error' in scan]
+    print(f"{summary['n_scans']} scans from {summary['n_files']} files analysed in {summary['elapsed']:.2f} s, "
+          f"{len(errors)} errors, results saved in {options.output}")
+    return 0 if not errors else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt, QObject, QEvent, QTimer, pyqtSignal
+
+from beeactions.key_dispatcher import key_combination
+
+digit_keys = dict([(getattr(Qt, f'Key_{digit}'), str(digit)) for digit in range(10)])
+
+
+class BeeNumberEntry(QObject):
+    """
+    Non modal entry of bee numbers from the keyboard.
+
+    Digits typed before an action shortcut are bound to this action. If no digits have been typed, the action is kept
+    pending and the digits typed after it are bound to it. A pending action is saved when Enter is pressed, when
+    another action shortcut is triggered or after *timeout* seconds without typing (with bee -1 if no digit has been
+    typed). Digits typed without any action are dropped after *timeout*. Backspace removes the last digit and Escape
+    clears them. The event time is always the one of the action keypress. Digits completing a pending shortcut sequence
+    (see set_dispatcher) are not captured.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *timeout*        float       time (in s) after which digits or a pending action expire
+    =============== =========== ==========================================================
+    """
+    event_signal = pyqtSignal(object, object, int)  # time, action, bee
+    pending_signal = pyqtSignal(str)
+
+    def __init__(self, timeout=1.5):
+        super().__init__()
+        self.timeout = timeout
+        self.enabled = False
+        self.reserved_keys = set([])
+        self.dispatcher = None
+        self._digits = ''
+        self._pending = None
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.commit)
+
+    def set_enabled(self, enabled=True):
+        """
+        Start or stop capturing digits typed on the keyboard. When stopping, a pending action is saved.
+        """
+        app = QtWidgets.QApplication.instance()
+        if enabled and not self.enabled:
+            app.installEventFilter(self)
+        elif not enabled and self.enabled:
+            self.commit()
+            app.removeEventFilter(self)
+        self.enabled = enabled
+
+    def set_reserved_keys(self, keys):
+        """
+        Set the keys used as action shortcuts that should not be captured as digits
+        """
+        self.reserved_keys = set(keys)
+
+    def set_dispatcher(self, dispatcher):
+        """
+        Set the KeyDispatcher whose pending sequences are completed by digits (for instance 'G, 1'), these digits being
+        then not captured
+        """
+        self.dispatcher = dispatcher
+
+    def is_editing(self):
+        widget = QtWidgets.QApplication.focusWidget()
+        return isinstance(widget, (QtWidgets.QLineEdit, QtWidgets.QAbstractSpinBox, QtWidgets.QTextEdit,
+                                   QtWidgets.QPlainTextEdit))
+
+    def eventFilter(self, obj, event):
+        if event.type() != QEvent.KeyPress or event.isAutoRepeat() or self.is_editing():
+            return False
+        if event.modifiers() & ~Qt.KeypadModifier:
+            return False
+
+        key = event.key()
+        if key in digit_keys and key not in self.reserved_keys and \
+                not (self.dispatcher is not None and self.dispatcher.continues(key_combination(event))):
+            self.add_digit(digit_keys[key])
+            return True
+        elif key in (Qt.Key_Return, Qt.Key_Enter) and self._pending is not None:
+            self.commit()
+            return True
+        elif key == Qt.Key_Backspace and self._digits:
+            self._digits = self._digits[:-1]
+            self.update_pending()
+            return True
+        elif key == Qt.Key_Escape and self._digits:
+            self._digits = ''
+            self.update_pending()
+            return True
+        return False
+
+    def add_digit(self, digit):
+        self._digits += digit
+        self._timer.start(int(1000 * self.timeout))
+        self.update_pending()
+
+    def action(self, now, action):
+        """
+        Bind an action triggered at time now (in ns) to the typed digits, or keep it pending until digits are typed
+        """
+        if self._pending is not None:
+            self.commit()
+
+        if self._digits:
+            bee = int(self._digits)
+            self._digits = ''
+            self._timer.stop()
+            self.event_signal.emit(now, action, bee)
+        else:
+            self._pending = (now, action)
+            self._timer.start(int(1000 * self.timeout))
+        self.update_pending()
+
+    def pending_action(self):
+        """
+        Get the action waiting for its bee number, None if there is none
+        """
+        return self._pending[1] if self._pending is not None else None
+
+    def commit(self):
+        """
+        Save the pending action, if any, with the typed digits (bee -1 if none) and clear the digits
+        """
+        self._timer.stop()
+        if self._pending is not None:
+            now, action = self._pending
+            self._pending = None
+            self.event_signal.emit(now, action, int(self._digits) if self._digits else -1)
+        self._digits = ''
+        self.update_pending()
+
+    def update_pending(self):
+        if self._pending is not None:
+            self.pending_signal.emit(f'{self._pending[1]} at {self._pending[0] // 1000000000} s, '
+                                     f'Bee: {self._digits}_')
+        elif self._digits:
+            self.pending_signal.emit(f'Bee: {self._digits}_')
+        else:
+            self.pending_signal.emit('')
@@ -0,0 +1,272 @@
+"""
+Headless load test of BeeActions driven by synthetic keystrokes.
+
+Usage: python -m beeactions.benchmarks.load [-r rates] [-d duration] [--pattern constant|burst] [--storage modes]
+                                            [--actions n] [--bees] [-o results.json]
+
+The application is started on the Qt offscreen platform with a generated preset (written in a temporary directory
+together with the h5 files). For each storage mode and rate, a scan is started (set_scan), key presses of the preset
+shortcuts are sent to the main window, going through the key dispatcher and log_data as real ones, then the scan is
+stopped (stop_daq). Keystrokes are sent at a constant rate or by bursts of --burst-size keys.
+
+Each run reports the sustained event rate, the UI thread stalls (delays of a 5 ms heartbeat timer), the latency
+percentiles of each stage (see latency.LatencyRecorder), the h5 file size and the peak RSS of the process. Results
+are saved as json (by default in the directory of the h5 files) to compare storage modes and versions.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import platform
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt, QObject, QTimer
+from PyQt5.QtTest import QTest
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+letter_keys = [(chr(code), getattr(Qt, f'Key_{chr(code)}')) for code in range(ord('A'), ord('Z') + 1)]
+digit_keys = [getattr(Qt, f'Key_{digit}') for digit in range(10)]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024  # bytes on macOS, kB on Linux
+
+
+def generate_shortcuts(n_actions):
+    """
+    Get n_actions distinct shortcuts, none of them being the prefix of another one (an action bound to a chord prefix
+    would only fire after the chord timeout): letters then Ctrl+letters, or if more than 52 actions are needed,
+    letters then two key sequences whose Ctrl+letter prefix is not bound
+
+    Returns
+    -------
+    list of (str, list of (int, Qt.KeyboardModifiers)): the shortcut text and the key presses to type it
+    """
+    shortcuts = [(name, [(key, Qt.NoModifier)]) for name, key in letter_keys]
+    if n_actions <= 2 * len(letter_keys):
+        shortcuts += [(f'Ctrl+{name}', [(key, Qt.ControlModifier)]) for name, key in letter_keys]
+    else:
+        for first, first_key in letter_keys:
+            shortcuts += [(f'Ctrl+{first}, {name}', [(first_key, Qt.ControlModifier), (key, Qt.NoModifier)])
+                          for name, key in letter_keys]
+    if n_actions > len(shortcuts):
+        raise ValueError(f'At most {len(shortcuts)} actions can be generated')
+    return shortcuts[:n_actions]
+
+
+def write_preset(directory, n_actions):
+    """
+    Write a preset of n_actions actions (Action00, Action01...) in directory
+
+    Returns
+    -------
+    str: the preset file path
+    list: the key presses of each action shortcut
+    """
+    from pyqtgraph.parametertree import Parameter
+    from pymodaq.daq_utils import custom_parameter_tree as custom_tree
+    from pymodaq.daq_utils.h5modules import H5Saver
+    import beeactions.shortcut_manager  # registers the groupshortcut parameter type
+
+    actions = [f'Action{ind:02d}' for ind in range(n_actions)]
+    params = Parameter.create(title='Preset', name='Preset', type='group', children=[
+        {'title': 'Filename:', 'name': 'filename', 'type': 'str', 'value': 'load_test'},
+        {'title': 'Author:', 'name': 'author', 'type': 'str', 'value': 'load test'},
+        {'title': 'Saving options:', 'name': 'saving_options', 'type': 'group', 'children': H5Saver.params},
+        {'title': 'Actions:', 'name': 'actions', 'type': 'groupshortcut', 'addList': actions}])
+    shortcuts = generate_shortcuts(n_actions)
+    for action, (text, keys) in zip(actions, shortcuts):
+        params.child(('actions')).addNew(action)
+        params.child(('actions')).children()[-1].child(('shortcut')).setValue(text)
+    path = os.path.join(directory, 'load_test')
+    custom_tree.parameter_to_xml_file(params, path)
+    return path + '.xml', [keys for text, keys in shortcuts]
+
+
+class StallMonitor(QObject):
+    """
+    Heartbeat timer of the UI thread: the delay between two timeouts beyond the interval is a stall of the event loop
+    """
+    def __init__(self, interval=5):
+        super().__init__()
+        self.interval = interval
+        self.stalls_ms = []
+        self._last = None
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.beat)
+
+    def start(self):
+        self.stalls_ms = []
+        self._last = time.perf_counter()
+        self.timer.start(self.interval)
+
+    def stop(self):
+        self.timer.stop()
+
+    def beat(self):
+        now = time.perf_counter()
+        self.stalls_ms.append(max(0., 1000 * (now - self._last) - self.interval))
+        self._last = now
+
+    def summary(self):
+        stalls = np.array(self.stalls_ms) if self.stalls_ms else np.zeros((1,))
+        return dict(p50_ms=float(np.percentile(stalls, 50)), p99_ms=float(np.percentile(stalls, 99)),
+                    max_ms=float(stalls.max()), over_16ms=int(np.count_nonzero(stalls > 16)),
+                    over_100ms=int(np.count_nonzero(stalls > 100)))
+
+
+class KeyDriver(QObject):
+    """
+    Send the key presses of random actions to a widget following a schedule of event times
+    """
+    def __init__(self, widget, action_keys, bees=False):
+        super().__init__()
+        self.widget = widget
+        self.action_keys = action_keys
+        self.bees = bees
+        self.n_sent = 0
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self.tick)
+
+    def run(self, schedule):
+        """
+        Send one action at each time (in s from now) of schedule, returns the elapsed time once all are sent
+        """
+        self.schedule = schedule
+        self.n_sent = 0
+        self.start = time.perf_counter()
+        self.timer.start(1)
+        while self.n_sent < len(schedule):
+            QtWidgets.QApplication.processEvents()
+            time.sleep(0.0005)
+        self.timer.stop()
+        return time.perf_counter() - self.start
+
+    def tick(self):
+        elapsed = time.perf_counter() - self.start
+        while self.n_sent < len(self.schedule) and self.schedule[self.n_sent] <= elapsed:
+            if self.bees:
+                for digit in str(random.randint(0, 999)):
+                    QTest.keyClick(self.widget, digit_keys[int(digit)])
+            for key, modifier in random.choice(self.action_keys):
+                QTest.keyClick(self.widget, key, modifier)
+            self.n_sent += 1
+
+
+def make_schedule(rate, duration, pattern='constant', burst_size=20):
+    """
+    Get the times (in s) of the events of a run: at a constant rate, or by bursts of burst_size back to back events
+    with the same mean rate
+    """
+    n_events = int(rate * duration)
+    if pattern == 'burst':
+        return np.repeat(np.arange(0, n_events, burst_size) / rate, burst_size)[:n_events]
+    return np.arange(n_events) / rate
+
+
+def run_scan(manager, driver, monitor, storage_mode, rate, duration, pattern, burst_size):
+    session = manager.current
+    session.settings.child('settings', 'storage', 'storage_mode').setValue(storage_mode)
+    session.set_scan()
+    h5_file = session.h5saver.h5_file.filename
+    schedule = make_schedule(rate, duration, pattern, burst_size)
+    monitor.start()
+    elapsed = driver.run(schedule)
+    monitor.stop()
+    start = time.perf_counter()
+    session.stop_daq()
+    stop_time = time.perf_counter() - start
+    writer = session.writer.stats()
+    return dict(storage_mode=storage_mode, rate=rate, duration=duration, pattern=pattern, n_sent=driver.n_sent,
+                n_written=writer['n_written'], sent_rate=driver.n_sent / elapsed,
+                sustained_rate=writer['n_written'] / (elapsed + stop_time), stop_time_s=stop_time,
+                writer=writer, stalls=monitor.summary(), latency=session.latency.summary(),
+                file_size_mb=os.path.getsize(h5_file) / 1024 ** 2, peak_rss_mb=peak_rss_mb())
+
+
+def run_load_test(rates=(10, 100), duration=10., pattern='constant', burst_size=20, storage_modes=('arrays', 'table'),
+                  n_actions=20, bees=False, directory=None):
+    """
+    Start BeeActions headless and run one scan per storage mode and rate
+
+    Returns
+    -------
+    dict: the test configuration and the results of each run
+    """
+    from pymodaq.daq_utils.gui_utils import DockArea
+    from beeactions import main
+    from beeactions.version import get_version
+
+    directory = directory if directory is not None else tempfile.mkdtemp(prefix='beeactions_load_')
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
+    win = QtWidgets.QMainWindow()
+    area = DockArea()
+    win.setCentralWidget(area)
+    manager = main.SessionManager(area)
+    win.show()
+    manager.setup_deferred()
+    session = manager.current
+    # no modal dialog: dataset/scan attributes are accepted as they are
+    session.show_file_attributes = lambda type_info='dataset': True
+    session.h5saver.settings.child(('base_path')).setValue(directory)
+    session.settings.child('settings', 'save_bee_number').setValue(bees)
+    preset, action_keys = write_preset(directory, n_actions)
+    session.set_shortcut_mode(preset)
+    win.activateWindow()
+    win.setFocus()
+
+    driver = KeyDriver(win, action_keys, bees)
+    monitor = StallMonitor()
+    runs = []
+    for storage_mode in storage_modes:
+        for rate in rates:
+            runs.append(run_scan(manager, driver, monitor, storage_mode, rate, duration, pattern, burst_size))
+            print(f"{storage_mode} {rate}/s: {runs[-1]['sustained_rate']:.1f} events/s sustained, "
+                  f"max stall {runs[-1]['stalls']['max_ms']:.1f} ms, {runs[-1]['file_size_mb']:.2f} MB")
+    manager.quit_fun()
+    return dict(version=get_version(), python=platform.python_version(), platform=platform.platform(),
+                n_actions=n_actions, bees=bees, burst_size=burst_size, directory=directory, runs=runs)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m beeactions.benchmarks.load',
+                                     description='Load test of BeeActions driven by synthetic keystrokes')
+    parser.add_argument('-r', '--rates', type=float, nargs='+', default=[10, 100], help='events per second')
+    parser.add_argument('-d', '--duration', type=float, default=10., help='duration (s) of each run')
+    parser.add_argument('--pattern', choices=['constant', 'burst'], default='constant')
+    parser.add_argument('--burst-size', type=int, default=20, help='number of back to back events of a burst')
+    parser.add_argument('--storage', nargs='+', choices=['arrays', 'table'], default=['arrays', 'table'])
+    parser.add_argument('--actions', type=int, default=20, help='number of actions of the generated preset')
+    parser.add_argument('--bees', action='store_true', help='type a bee number before each action')
+    parser.add_argument('--directory', default=None, help='directory of the preset and h5 files (default: temporary)')
+    parser.add_argument('-o', '--output', default=None,
+                        help='json results file (default: beeactions_load.json in the directory of the h5 files)')
+    options = parser.parse_args(args)
+
+    results = run_load_test(options.rates, options.duration, options.pattern, options.burst_size, options.storage,
+                            options.actions, options.bees, options.directory)
+    output = options.output if options.output is not None else os.path.join(results['directory'],
+                                                                            'beeactions_load.json')
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f'Results saved in {output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
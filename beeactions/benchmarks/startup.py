@@ -0,0 +1,113 @@
+"""
+Startup time benchmark of BeeActions.
+
+Usage: python -m beeactions.benchmarks.startup [-n runs] [--import-budget s] [--paint-budget s] [-o results.json]
+
+Each run is done in a fresh python process (using the offscreen Qt platform) so that nothing is cached between runs.
+Two times are measured:
+
+* import: time to import beeactions.main
+* first paint: time from the start of the process to the first paint of the main window
+
+The medians over the runs are printed and compared to the budgets (by default import_budget and paint_budget, a
+budget of 0 disabling its check): the exit code is 1 if a budget is exceeded so that the benchmark can be used to catch
+startup regressions.
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+import numpy as np
+
+import_budget = 1.  # maximum median times (in s), with margin for slower laptops than the development machines
+paint_budget = 2.
+
+child_script = """
+import time
+start = time.perf_counter()
+import sys
+import json
+import beeactions.main as main
+import_time = time.perf_counter() - start
+from PyQt5 import QtWidgets, QtCore
+
+class PaintFilter(QtCore.QObject):
+    paint_time = None
+
+    def eventFilter(self, obj, event):
+        if event.type() == QtCore.QEvent.Paint and self.paint_time is None:
+            self.paint_time = time.perf_counter() - start
+            QtCore.QTimer.singleShot(0, app.quit)
+        return False
+
+app = QtWidgets.QApplication(sys.argv)
+win = QtWidgets.QMainWindow()
+win.setVisible(False)
+area = main.DockArea()
+win.setCentralWidget(area)
+paint_filter = PaintFilter()
+win.installEventFilter(paint_filter)
+prog = main.SessionManager(area)
+win.show()
+QtCore.QTimer.singleShot(30000, app.quit)
+app.exec_()
+print(json.dumps(dict(import_time=import_time, paint_time=paint_filter.paint_time)))
+"""
+
+
+def run_once():
+    """
+    Measure in a new process the import and first paint times (in s)
+    """
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    result = subprocess.run([sys.executable, '-c', child_script], env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_benchmark(runs=5):
+    times = [run_once() for ind in range(runs)]
+    results = dict(runs=runs)
+    for key in ('import_time', 'paint_time'):
+        values = [t[key] for t in times if t[key] is not None]
+        results[key] = dict(median=float(np.median(values)) if values else None,
+                            min=float(np.min(values)) if values else None,
+                            max=float(np.max(values)) if values else None)
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m beeactions.benchmarks.startup',
+                                     description='Measure the import and first paint times of BeeActions')
+    parser.add_argument('-n', '--runs', type=int, default=5, help='number of runs (one process each)')
+    parser.add_argument('--import-budget', type=float, default=import_budget,
+                        help=f'maximum median import time (s, default {import_budget}, 0: no check)')
+    parser.add_argument('--paint-budget', type=float, default=paint_budget,
+                        help=f'maximum median time to first paint (s, default {paint_budget}, 0: no check)')
+    parser.add_argument('-o', '--output', default=None, help='json file where to save the results')
+    options = parser.parse_args(args)
+
+    results = run_benchmark(options.runs)
+    over_budget = False
+    for key, budget in (('import_time', options.import_budget), ('paint_time', options.paint_budget)):
+        median = results[key]['median']
+        status = ''
+        if budget > 0:
+            results[key]['budget'] = budget
+            if median is None or median > budget:
+                over_budget = True
+                status = f' > budget {budget:.3f} s'
+        print(f"{key}: median {median:.3f} s (min {results[key]['min']:.3f}, max {results[key]['max']:.3f})"
+              f"{status}" if median is not None else f'{key}: not measured{status}')
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    return 1 if over_budget else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
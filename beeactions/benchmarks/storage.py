@@ -0,0 +1,103 @@
+"""
+Write throughput and on-disk size of the storage profiles.
+
+Usage: python -m beeactions.benchmarks.storage [-n events] [--profiles names] [--storage modes] [--directory dir]
+                                               [-o results.json]
+
+For each storage profile (see profiles.storage_profiles) and storage mode, a synthetic session (random actions and
+bees, exponential intervals between events) is written into a new h5 file by the background writer, with the chunks,
+compression and flush policy of the profile, through a writer queue of the size used by the application so that
+the events are put as fast as the writer sustains them. The write throughput (events/s from the first queued event
+to the last flush), the flush timings and the size of the file are reported. The h5 files are removed unless a
+directory is given.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+import numpy as np
+
+from beeactions.h5writer import H5Writer, Event
+from beeactions.profiles import storage_profiles
+from beeactions.storage import storage_modes, create_storage
+
+
+def synthetic_events(n_events, actions, n_bees=100, mean_interval=1., seed=0):
+    """
+    Get n_events random events: actions and bees drawn uniformly, intervals (in s) drawn from an exponential law
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = np.cumsum(rng.exponential(mean_interval * 1e9, n_events)).astype(np.int64)
+    codes = rng.integers(0, len(actions), n_events)
+    bees = rng.integers(0, n_bees, n_events)
+    return [Event(int(timestamp), actions[code], int(bee)) for timestamp, code, bee in zip(timestamps, codes, bees)]
+
+
+def run_profile(path, profile, mode, events, actions):
+    from pymodaq.daq_utils.h5modules import H5Saver
+
+    h5saver = H5Saver(save_type='custom')
+    h5saver.init_file(update_h5=True, addhoc_file_path=path)
+    scan_group = h5saver.add_scan_group()
+    storage = create_storage(mode, h5saver, scan_group, actions, save_bee=True, profile=profile)
+    writer = H5Writer(h5saver, flush_count=profile.flush_count, flush_interval=profile.flush_interval)
+    writer.start(storage)
+    start = time.perf_counter()
+    for event in events:
+        writer.put(event)
+    writer.stop()
+    elapsed = time.perf_counter() - start
+    stats = writer.stats()
+    h5saver.close_file()
+    return dict(profile=profile._asdict(), storage_mode=mode, n_events=stats['n_written'], time_s=elapsed,
+                events_per_s=stats['n_written'] / elapsed, n_flushes=stats['n_flushes'],
+                mean_flush_ms=stats['mean_flush_ms'], max_flush_ms=stats['max_flush_ms'],
+                file_size_mb=os.path.getsize(path) / 1024 ** 2)
+
+
+def run_benchmark(n_events=20000, profiles=None, modes=storage_modes, directory=None, n_actions=10):
+    """
+    Write the same synthetic session with each profile and storage mode
+
+    Returns
+    -------
+    list of dict: the results of each profile and storage mode
+    """
+    if directory is None:
+        with tempfile.TemporaryDirectory(prefix='beeactions_storage_') as temp_directory:
+            return run_benchmark(n_events, profiles, modes, temp_directory, n_actions)
+    actions = [f'Action{ind:02d}' for ind in range(n_actions)]
+    events = synthetic_events(n_events, actions)
+    results = []
+    for name in (profiles if profiles is not None else list(storage_profiles)):
+        for mode in modes:
+            path = os.path.join(directory, f'{name}_{mode}.h5')
+            results.append(run_profile(path, storage_profiles[name], mode, events, actions))
+            print(f"{name} {mode}: {results[-1]['events_per_s']:.0f} events/s, "
+                  f"{results[-1]['n_flushes']} flushes (max {results[-1]['max_flush_ms']:.1f} ms), "
+                  f"{results[-1]['file_size_mb']:.2f} MB")
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m beeactions.benchmarks.storage',
+                                     description='Measure the write throughput and file size of the storage profiles')
+    parser.add_argument('-n', '--events', type=int, default=20000, help='number of events of the session')
+    parser.add_argument('--profiles', nargs='+', choices=list(storage_profiles), default=None)
+    parser.add_argument('--storage', nargs='+', choices=storage_modes, default=storage_modes)
+    parser.add_argument('--directory', default=None, help='directory where to keep the h5 files (default: removed)')
+    parser.add_argument('-o', '--output', default=None, help='json file where to save the results')
+    options = parser.parse_args(args)
+
+    results = run_benchmark(options.events, options.profiles, options.storage, options.directory)
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,535 @@
+"""
+SQLite catalog of the datasets and scans of all the BeeActions h5 files, so that sessions can be searched without
+opening the h5 files.
+
+Usage: python -m beeactions.catalog [--db catalog.sqlite] scan directories [-j workers]
+       python -m beeactions.catalog [--db catalog.sqlite] query [--author A] [--sample S] [--action A --min-count N]
+                                                               [--bee N] [--json]
+       python -m beeactions.catalog [--db catalog.sqlite] sql "SELECT ..."
+
+For each h5 file are indexed the attributes of its datasets and scans (see BeeActions.save_metadata), and for each
+scan its number of events, its duration (time of its last event), the number of events of each action and of each
+bee. The summary of a scan is read from its footer (see storage.ScanStorage.write_footer), the events being only read
+for scans without an up to date footer. Files are indexed again only when their modification time changed: a scan is
+indexed when it is stopped (see BeeActions.stop_daq), and the data directories are rescanned in the background by
+CatalogScanner. The xml settings are not indexed.
+
+Tables: files (path, mtime_ns, size, indexed_at, error), datasets (file, path, author, sample, experiment_type,
+date_time, description, attributes), scans (id, file, path, dataset, name, author, date_time, description, scan_done,
+n_events, duration_s, attributes), scan_actions (scan, action, count) and scan_bees (scan, bee, count). attributes
+columns hold all the attributes as json.
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tables
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from beeactions.storage import get_scan_array, iter_events
+from beeactions.export import get_attributes
+from beeactions.analyze import find_h5_files, iter_scan_groups
+
+catalog_version = 1
+footer_attributes = ['n_events', 'last_timestamp_ns', 'action_counts', 'bee_counts']
+
+schema = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, indexed_at REAL,
+                                  error TEXT);
+CREATE TABLE IF NOT EXISTS datasets (file TEXT REFERENCES files(path) ON DELETE CASCADE, path TEXT, author TEXT,
+                                     sample TEXT, experiment_type TEXT, date_time TEXT, description TEXT,
+                                     attributes TEXT, PRIMARY KEY (file, path));
+CREATE TABLE IF NOT EXISTS scans (id INTEGER PRIMARY KEY, file TEXT REFERENCES files(path) ON DELETE CASCADE,
+                                  path TEXT, dataset TEXT, name TEXT, author TEXT, date_time TEXT, description TEXT,
+                                  scan_done INTEGER, n_events INTEGER, duration_s REAL, attributes TEXT,
+                                  UNIQUE (file, path));
+CREATE TABLE IF NOT EXISTS scan_actions (scan INTEGER REFERENCES scans(id) ON DELETE CASCADE, action TEXT,
+                                         count INTEGER, PRIMARY KEY (scan, action));
+CREATE TABLE IF NOT EXISTS scan_bees (scan INTEGER REFERENCES scans(id) ON DELETE CASCADE, bee INTEGER,
+                                      count INTEGER, PRIMARY KEY (scan, bee));
+CREATE INDEX IF NOT EXISTS scans_author ON scans (author);
+CREATE INDEX IF NOT EXISTS datasets_sample ON datasets (sample);
+CREATE INDEX IF NOT EXISTS scan_actions_action ON scan_actions (action, count);
+CREATE INDEX IF NOT EXISTS scan_bees_bee ON scan_bees (bee);
+"""
+
+
+def get_catalog_path():
+    from beeactions.paths import get_local_path
+    return os.path.join(get_local_path('catalog'), 'catalog.sqlite')
+
+
+def connect(path):
+    """
+    Open the catalog database, creating its tables if needed. A catalog of another version is emptied.
+    """
+    connection = sqlite3.connect(path, timeout=30)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')  # queries are not blocked while the catalog is updated
+    connection.execute('PRAGMA foreign_keys=ON')
+    if connection.execute('PRAGMA user_version').fetchone()[0] != catalog_version:
+        with connection:
+            for table in ['scan_bees', 'scan_actions', 'scans', 'datasets', 'files']:
+                connection.execute(f'DROP TABLE IF EXISTS {table}')
+            connection.execute(f'PRAGMA user_version={catalog_version}')
+    connection.executescript(schema)
+    return connection
+
+
+def get_dataset_path(group):
+    """
+    Path of the closest group holding group (or group itself) whose type attribute is 'dataset', None if none
+    """
+    while group is not None:
+        attrs = group._v_attrs
+        if 'type' in attrs._f_list('user') and str(attrs['type']) == 'dataset':
+            return group._v_pathname
+        group = group._v_parent if group._v_pathname != '/' else None
+    return None
+
+
+def summarize_events(scan_group):
+    """
+    Get the number of events, the time of the last event (in ns) and the counts per action and per bee of a scan,
+    from its footer if it is up to date, else by reading its events
+    """
+    attrs = scan_group._v_attrs
+    if 'events' in scan_group:
+        node = scan_group.events
+        actions = list(node._v_attrs['actions'])
+    else:
+        node = get_scan_array(scan_group, 'time_axis')
+        action_array = get_scan_array(scan_group, 'actions')
+        actions = None if isinstance(action_array, tables.VLArray) else list(action_array._v_attrs['actions'])
+    if actions is not None and 'n_events' in attrs._f_list('user') and attrs['n_events'] == node.nrows:
+        counts = np.asarray(attrs['action_counts'], dtype=np.int64)
+        bee_counts = np.asarray(attrs['bee_counts'], dtype=np.int64).reshape((2, -1))
+        return int(attrs['n_events']), int(attrs['last_timestamp_ns']), \
+            dict([(action, int(count)) for action, count in zip(actions, counts)]), \
+            dict(zip(bee_counts[0].tolist(), bee_counts[1].tolist()))
+
+    n_events = 0
+    last_timestamp = 0
+    counts = np.zeros((0,), dtype=np.int64)
+    bee_counts = dict([])
+    for events, actions in iter_events(scan_group):
+        if len(events) == 0:
+            continue
+        n_events += len(events)
+        last_timestamp = max(last_timestamp, int(events['timestamp'].max()))
+        codes = events['action']
+        chunk_counts = np.bincount(codes[codes >= 0], minlength=len(actions))
+        counts = np.concatenate((counts, np.zeros((len(chunk_counts) - len(counts),), dtype=np.int64))) \
+            if len(chunk_counts) > len(counts) else counts
+        counts[:len(chunk_counts)] += chunk_counts
+        bees, bee_chunk_counts = np.unique(events['bee'][events['bee'] >= 0], return_counts=True)
+        for bee, count in zip(bees.tolist(), bee_chunk_counts.tolist()):
+            bee_counts[bee] = bee_counts.get(bee, 0) + count
+    return n_events, last_timestamp, dict([(action, int(count)) for action, count in zip(actions or [], counts)]), \
+        bee_counts
+
+
+def summarize_scan(scan_group):
+    attributes = get_attributes(scan_group)
+    for name in footer_attributes:
+        attributes.pop(name, None)
+    n_events, last_timestamp, action_counts, bee_counts = summarize_events(scan_group)
+    return dict(path=scan_group._v_pathname, dataset=get_dataset_path(scan_group),
+                name=attributes.get('scan_name', scan_group._v_name), attributes=attributes, n_events=n_events,
+                duration_s=last_timestamp / 1e9, action_counts=action_counts, bee_counts=bee_counts)
+
+
+def summarize_h5file(h5file, scan_paths=None):
+    """
+    Get the summary of the datasets and scans of an opened h5 file (only of the scans in scan_paths if not None)
+    """
+    datasets = []
+    for group in h5file.walk_groups():
+        if get_dataset_path(group) == group._v_pathname:
+            datasets.append(dict(path=group._v_pathname, attributes=get_attributes(group)))
+    scans = [summarize_scan(group) for group in iter_scan_groups(h5file)
+             if scan_paths is None or group._v_pathname in scan_paths]
+    stat = os.stat(h5file.filename)
+    return dict(path=os.path.abspath(h5file.filename), mtime_ns=stat.st_mtime_ns, size=stat.st_size,
+                datasets=datasets, scans=scans)
+
+
+def summarize_file(path):
+    """
+    Get the summary of a h5 file, or its error if it cannot be read (for instance while it is written)
+    """
+    stat = os.stat(path)
+    try:
+        with tables.open_file(path, 'r') as h5file:
+            return summarize_h5file(h5file)
+    except Exception as e:
+        return dict(path=os.path.abspath(path), mtime_ns=stat.st_mtime_ns, size=stat.st_size, error=str(e))
+
+
+class Catalog:
+    """
+    Catalog database: update from file summaries and queries. A Catalog should be used from a single thread, several
+    Catalog objects (of several threads or processes) can share the same database.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *path*           str         path of the database (default: in the local catalog directory)
+    =============== =========== ==========================================================
+    """
+    def __init__(self, path=None):
+        self.path = path if path is not None else get_catalog_path()
+        self.connection = connect(self.path)
+
+    def close(self):
+        self.connection.close()
+
+    def file_mtimes(self):
+        rows = self.connection.execute('SELECT path, mtime_ns FROM files')
+        return dict([(row['path'], row['mtime_ns']) for row in rows])
+
+    def update(self, summary, partial=False):
+        """
+        Replace the entries of a file by its summary (see summarize_file). If partial, only its datasets and the scans
+        of the summary are replaced. An error never replaces a valid entry of the same modification time.
+        """
+        with self.connection as connection:
+            row = connection.execute('SELECT mtime_ns, error FROM files WHERE path=?', (summary['path'],)).fetchone()
+            if 'error' in summary and row is not None and row['mtime_ns'] == summary['mtime_ns'] and \
+                    row['error'] is None:
+                return
+            if partial and row is not None:
+                connection.execute('UPDATE files SET mtime_ns=?, size=?, indexed_at=? WHERE path=?',
+                                   (summary['mtime_ns'], summary['size'], time.time(), summary['path']))
+                connection.execute('DELETE FROM datasets WHERE file=?', (summary['path'],))
+                connection.executemany('DELETE FROM scans WHERE file=? AND path=?',
+                                       [(summary['path'], scan['path']) for scan in summary['scans']])
+            else:
+                connection.execute('DELETE FROM files WHERE path=?', (summary['path'],))
+                connection.execute('INSERT INTO files VALUES (?, ?, ?, ?, ?)',
+                                   (summary['path'], summary['mtime_ns'], summary['size'], time.time(),
+                                    summary.get('error', None)))
+            for dataset in summary.get('datasets', []):
+                attributes = dataset['attributes']
+                connection.execute('INSERT INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                   (summary['path'], dataset['path'], attributes.get('author', None),
+                                    attributes.get('sample', None), attributes.get('experiment_type', None),
+                                    attributes.get('date_time', None), attributes.get('description', None),
+                                    json.dumps(attributes)))
+            for scan in summary.get('scans', []):
+                attributes = scan['attributes']
+                scan_id = connection.execute(
+                    'INSERT INTO scans (file, path, dataset, name, author, date_time, description, scan_done, '
+                    'n_events, duration_s, attributes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (summary['path'], scan['path'], scan['dataset'], scan['name'], attributes.get('author', None),
+                     attributes.get('date_time', None), attributes.get('description', None),
+                     attributes.get('scan_done', None), scan['n_events'], scan['duration_s'],
+                     json.dumps(attributes))).lastrowid
+                connection.executemany('INSERT INTO scan_actions VALUES (?, ?, ?)',
+                                       [(scan_id, action, count) for action, count in scan['action_counts'].items()])
+                connection.executemany('INSERT INTO scan_bees VALUES (?, ?, ?)',
+                                       [(scan_id, bee, count) for bee, count in scan['bee_counts'].items()])
+
+    def remove(self, paths):
+        with self.connection as connection:
+            connection.executemany('DELETE FROM files WHERE path=?', [(path,) for path in paths])
+
+    def index_scan(self, scan_group):
+        """
+        Index a scan of an opened h5 file (and the datasets of the file). The whole file is indexed if it is not in
+        the catalog yet.
+        """
+        h5file = scan_group._v_file
+        path = os.path.abspath(h5file.filename)
+        indexed = self.connection.execute('SELECT 1 FROM files WHERE path=? AND error IS NULL', (path,)).fetchone()
+        if indexed is not None:
+            self.update(summarize_h5file(h5file, [scan_group._v_pathname]), partial=True)
+        else:
+            self.update(summarize_h5file(h5file))
+
+    def rescan(self, directories, workers=None, mp_context=None, exclude=()):
+        """
+        Index the h5 files of directories (searched recursively) added or modified since indexed, and remove the
+        entries of the files that no longer exist. Files are read by a pool of processes. The files of exclude (open
+        for writing by a session, whose scans are indexed when stopped, see index_scan) are neither read nor removed.
+
+        Returns
+        -------
+        int: the number of indexed files
+        int: the number of removed files
+        """
+        mtimes = self.file_mtimes()
+        exclude = set([os.path.abspath(path) for path in exclude])
+        files = []
+        removed = []
+        for directory in directories:
+            directory = os.path.abspath(directory)
+            found = set([os.path.abspath(path) for path in find_h5_files(directory)])
+            files.extend([path for path in found - exclude if mtimes.get(path, None) != os.stat(path).st_mtime_ns])
+            removed.extend([path for path in mtimes if path.startswith(directory + os.sep) and path not in found])
+        if removed:
+            self.remove(removed)
+        if files:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as executor:
+                for summary in executor.map(summarize_file, files):
+                    self.update(summary)
+        return len(files), len(removed)
+
+    def query_scans(self, author=None, sample=None, experiment_type=None, action=None, min_count=None, bee=None,
+                    file=None, limit=None):
+        """
+        Get the scans matching all the given criteria: author, sample and experiment type of the dataset (substrings,
+        case insensitive), at least min_count events of action (at least one if min_count is None), events of bee,
+        substring of the file path
+
+        Returns
+        -------
+        list of dict: file, path, name, author, sample, experiment_type, date_time, scan_done, n_events, duration_s
+                      and count (number of events of action, None if no action is given)
+        """
+        conditions = []
+        params = []
+        for column, value in [('s.author', author), ('d.sample', sample), ('d.experiment_type', experiment_type),
+                              ('s.file', file)]:
+            if value is not None:
+                conditions.append(f"{column} LIKE ? ESCAPE '\\'")
+                params.append('%' + value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        count = 'NULL'
+        join = ''
+        if action is not None:
+            join = ' JOIN scan_actions a ON a.scan = s.id AND a.action = ?'
+            params.insert(0, action)
+            count = 'a.count'
+            conditions.append('a.count >= ?')
+            params.append(min_count if min_count is not None else 1)
+        if bee is not None:
+            conditions.append('s.id IN (SELECT scan FROM scan_bees WHERE bee = ?)')
+            params.append(bee)
+        sql = f'SELECT s.file, s.path, s.name, s.author, d.sample, d.experiment_type, s.date_time, s.scan_done, ' \
+              f's.n_events, s.duration_s, {count} AS count FROM scans s{join} ' \
+              f'LEFT JOIN datasets d ON d.file = s.file AND d.path = s.dataset'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY s.file, s.path'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    def scan_counts(self, file, path):
+        """
+        Get the number of events of each action and of each bee of a scan
+        """
+        scan = self.connection.execute('SELECT id FROM scans WHERE file=? AND path=?', (file, path)).fetchone()
+        if scan is None:
+            return dict([]), dict([])
+        actions = self.connection.execute('SELECT action, count FROM scan_actions WHERE scan=?', (scan['id'],))
+        bees = self.connection.execute('SELECT bee, count FROM scan_bees WHERE scan=? ORDER BY count DESC',
+                                       (scan['id'],))
+        return dict([tuple(row) for row in actions]), dict([tuple(row) for row in bees])
+
+    def execute(self, sql, params=()):
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+
+class CatalogScanner(QObject):
+    """
+    Rescan the data directories from a worker thread every *interval* seconds (and on request), the files being read
+    by spawned processes so that neither the UI nor the writers wait for it. The files open in the sessions (see
+    set_open_files) are skipped. scanned_signal gives the number of indexed and removed files of each rescan that
+    changed the catalog.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *path*           str         path of the catalog database
+    *interval*       float       time (in s) between two rescans
+    =============== =========== ==========================================================
+    """
+    scanned_signal = pyqtSignal(int, int)
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, path=None, interval=600.):
+        super().__init__()
+        self.path = path
+        self.interval = interval
+        self.directories = []
+        self.open_files = []
+        self._wake = threading.Event()
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name='CatalogScanner', daemon=True)
+
+    def set_directories(self, directories):
+        self.directories = list(directories)
+
+    def set_open_files(self, paths):
+        self.open_files = list(paths)
+
+    def start(self):
+        self._thread.start()
+
+    def rescan(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop = True
+        self._wake.set()
+        self._thread.join()
+
+    def _run(self):
+        catalog = Catalog(self.path)
+        try:
+            while not self._stop:
+                directories = [directory for directory in self.directories if os.path.isdir(directory)]
+                try:
+                    indexed, removed = catalog.rescan(directories, workers=1,
+                                                      mp_context=multiprocessing.get_context('spawn'),
+                                                      exclude=self.open_files)
+                    if indexed or removed:
+                        self.scanned_signal.emit(indexed, removed)
+                except Exception as e:
+                    logging.exception(f'CatalogScanner: {str(e)}')
+                    self.error_signal.emit(f'Catalog not updated: {str(e)}')
+                self._wake.wait(self.interval)
+                self._wake.clear()
+        finally:
+            catalog.close()
+
+
+class CatalogDialog(QtWidgets.QDialog):
+    """
+    Search the scans of the catalog by author, sample, number of events of an action and bee
+    """
+    columns = ['file', 'name', 'author', 'sample', 'experiment_type', 'date_time', 'n_events', 'duration_s', 'count']
+
+    def __init__(self, catalog, actions=(), parent=None):
+        super().__init__(parent)
+        self.catalog = catalog
+        self.results = []
+        self.setWindowTitle('Catalog of the scans')
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+
+        form = QtWidgets.QFormLayout()
+        self.author_edit = QtWidgets.QLineEdit()
+        self.sample_edit = QtWidgets.QLineEdit()
+        self.action_combo = QtWidgets.QComboBox()
+        self.action_combo.setEditable(True)
+        self.action_combo.addItems([''] + list(actions))
+        self.min_count_spin = QtWidgets.QSpinBox()
+        self.min_count_spin.setRange(1, 10 ** 9)
+        self.bee_edit = QtWidgets.QLineEdit()
+        form.addRow('Author:', self.author_edit)
+        form.addRow('Sample:', self.sample_edit)
+        form.addRow('Action:', self.action_combo)
+        form.addRow('At least (events of the action):', self.min_count_spin)
+        form.addRow('Bee:', self.bee_edit)
+        layout.addLayout(form)
+
+        self.search_pb = QtWidgets.QPushButton('Search')
+        self.search_pb.clicked.connect(self.search)
+        layout.addWidget(self.search_pb)
+        self.table = QtWidgets.QTableWidget(0, len(self.columns))
+        self.table.setHorizontalHeaderLabels(self.columns)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table.itemSelectionChanged.connect(self.show_counts)
+        layout.addWidget(self.table)
+        self.status_label = QtWidgets.QLabel()
+        self.status_label.setWordWrap(True)
+        layout.addWidget(self.status_label)
+        self.resize(900, 600)
+
+    def search(self):
+        bee = self.bee_edit.text().strip()
+        try:
+            start = time.perf_counter()
+            self.results = self.catalog.query_scans(author=self.author_edit.text() or None,
+                                                    sample=self.sample_edit.text() or None,
+                                                    action=self.action_combo.currentText() or None,
+                                                    min_count=self.min_count_spin.value(),
+                                                    bee=int(bee) if bee else None)
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            self.status_label.setText(str(e))
+            return
+        self.table.setRowCount(len(self.results))
+        for row, result in enumerate(self.results):
+            for column, name in enumerate(self.columns):
+                value = result[name]
+                if name == 'duration_s' and value is not None:
+                    value = f'{value:.1f}'
+                self.table.setItem(row, column, QtWidgets.QTableWidgetItem('' if value is None else str(value)))
+        self.table.resizeColumnsToContents()
+        self.status_label.setText(f'{len(self.results)} scans ({1000 * elapsed:.1f} ms)')
+
+    def show_counts(self):
+        rows = set([index.row() for index in self.table.selectedIndexes()])
+        if len(rows) != 1:
+            return
+        result = self.results[rows.pop()]
+        actions, bees = self.catalog.scan_counts(result['file'], result['path'])
+        self.status_label.setText(f"{result['file']} {result['path']}\n" +
+                                  ', '.join([f'{action}: {count}' for action, count in actions.items()]) +
+                                  f'\n{len(bees)} bees: ' +
+                                  ', '.join([f'{bee} ({count})' for bee, count in list(bees.items())[:20]]))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m beeactions.catalog',
+                                     description='Index BeeActions h5 files and search their scans')
+    parser.add_argument('--db', default=None, help='catalog database (default: in the local catalog directory)')
+    commands = parser.add_subparsers(dest='command', required=True)
+    scan_parser = commands.add_parser('scan', help='index the new or modified h5 files of directories')
+    scan_parser.add_argument('directories', nargs='+')
+    scan_parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes (default: all cores)')
+    query_parser = commands.add_parser('query', help='search the scans')
+    query_parser.add_argument('--author', default=None)
+    query_parser.add_argument('--sample', default=None)
+    query_parser.add_argument('--experiment', default=None, help='experiment type')
+    query_parser.add_argument('--action', default=None)
+    query_parser.add_argument('--min-count', type=int, default=None, help='minimum number of events of the action')
+    query_parser.add_argument('--bee', type=int, default=None)
+    query_parser.add_argument('--file', default=None, help='substring of the file path')
+    query_parser.add_argument('--json', action='store_true', help='print the results as json')
+    sql_parser = commands.add_parser('sql', help='run a SQL query on the catalog')
+    sql_parser.add_argument('sql')
+    options = parser.parse_args(args)
+
+    catalog = Catalog(options.db)
+    try:
+        if options.command == 'scan':
+            start = time.perf_counter()
+            indexed, removed = catalog.rescan(options.directories, options.workers)
+            errors = catalog.execute('SELECT path, error FROM files WHERE error IS NOT NULL')
+            for error in errors:
+                print(f"{error['path']}: {error['error']}")
+            print(f'{indexed} files indexed, {removed} removed, {len(errors)} errors '
+                  f'({time.perf_counter() - start:.1f} s)')
+            return 0 if not errors else 1
+        if options.command == 'query':
+            results = catalog.query_scans(options.author, options.sample, options.experiment, options.action,
+                                          options.min_count, options.bee, options.file)
+        else:
+            results = catalog.execute(options.sql)
+        if options.command == 'sql' or options.json:
+            print(json.dumps(results, indent=1))
+        else:
+            for result in results:
+                count = f" {options.action}: {result['count']}" if options.action is not None else ''
+                print(f"{result['file']} {result['path']} {result['author']} {result['sample']} "
+                      f"{result['n_events']} events {result['duration_s']:.1f} s{count}")
+            print(f'{len(results)} scans')
+        return 0
+    finally:
+        catalog.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,485 @@
+"""
+In-process publish/subscribe bus of the logged events, and socket server streaming them to external subscribers
+(dashboards, stimulus controllers...).
+
+Sessions publish each logged event (BusEvent) to the EventBus of the SessionManager. Publishing only puts the event in
+the inbox of the bus, it never waits for the subscribers: a bus thread dispatches the events to the bounded queue of
+each subscriber, never waiting either, according to the policy of the subscriber when its queue is full:
+
+* drop: the event is dropped (and counted) for this subscriber
+* block: the event waits in the bounded backlog of the subscriber, a feeder thread of the subscriber waiting for room
+  in its queue (at most *block_timeout* seconds, then the event is dropped). A slow subscriber thus only delays
+  itself, never the other subscribers nor the keystroke path. When the backlog is full too, the event is dropped and
+  the subscription is marked as overflowed.
+
+Subscribers either pull their events (Subscription.get), or give a callback called with batches of events from the UI
+thread (ui=True, the queue being drained by a timer) or from a delivery thread of their own.
+
+The BusServer streams the events as json lines ({"session", "timestamp_ns", "wall_ns", "action", "bee", "frame"}) to
+the clients of a local TCP (host:port) or Unix socket. A client first sends a subscription line: 'SUBSCRIBE [drop|block]
+[maxsize] [session]'. Socket subscribers wait at most *block_timeout* seconds of the BusServer with the block policy,
+and are disconnected when their backlog overflows.
+
+Usage (test subscriber): python -m beeactions.event_bus [--address host:port|path] [--policy drop|block]
+                                                        [--maxsize n] [--session name] [--delay s]
+"""
+import os
+import sys
+import json
+import time
+import queue
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from collections import namedtuple
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from beeactions.ingest import parse_address
+
+BusEvent = namedtuple('BusEvent', ['session', 'timestamp', 'action', 'bee', 'frame', 'wall_ns', 'key_ns'],
+                      defaults=[-1, None, None])
+BusEvent.__doc__ = """
+Published event: session name, time (ns since the start of the scan), action name, bee number (None if not saved),
+video frame index (-1 if none), wall clock time (ns since the epoch, None when timed by a video) and monotonic time
+of the key press or reception of the event (ns, None if unknown, not streamed by the BusServer)
+"""
+
+default_address = '127.0.0.1:50778'
+bus_policies = ['drop', 'block']
+
+_STOP = object()
+
+
+def to_json_line(event):
+    return (json.dumps(dict(session=event.session, timestamp_ns=event.timestamp, wall_ns=event.wall_ns,
+                            action=event.action, bee=-1 if event.bee is None else event.bee,
+                            frame=event.frame)) + '\n').encode('utf-8')
+
+
+class Subscription:
+    """
+    Bounded queue of the events delivered to a subscriber
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *name*           str         name of the subscriber
+    *maxsize*        int         maximum number of events waiting in the queue
+    *policy*         str         'drop' or 'block' (see bus_policies)
+    *block_timeout*  float       maximum wait (in s) of the block policy, None for no limit
+    *session*        str         name of the session whose events are delivered, None for all
+    *backlog_size*   int         maximum number of events waiting for room in the queue with the block policy
+                                 (default: 10 * maxsize)
+    =============== =========== ==========================================================
+    """
+    def __init__(self, name, maxsize=1000, policy='drop', block_timeout=5., session=None, backlog_size=None):
+        if policy not in bus_policies:
+            raise ValueError(f'{policy} is not a bus policy, one of {bus_policies}')
+        self.name = name
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.session = session
+        self.callback = None
+        self.ui = False
+        self.closed = False
+        self.overflowed = False
+        self.queue = queue.Queue(maxsize)
+        # events waiting for room in the queue, block policy only
+        self.backlog = queue.Queue(backlog_size if backlog_size is not None else 10 * maxsize)
+        self.n_delivered = 0
+        self.n_dropped = 0
+
+    def accepts(self, event):
+        return self.session is None or event.session == self.session
+
+    def offer(self, event):
+        """
+        Put an event in the queue, or in the backlog with the block policy (from the bus thread, never waits)
+        """
+        if self.policy == 'block':
+            try:
+                self.backlog.put_nowait(event)
+            except queue.Full:
+                self.overflowed = True
+                self.drop()
+            return
+        try:
+            self.queue.put_nowait(event)
+            self.n_delivered += 1
+        except queue.Full:
+            self.drop()
+
+    def drop(self):
+        if not self.n_dropped:
+            logging.warning(f'EventBus: queue of {self.name} full, events dropped')
+        self.n_dropped += 1
+
+    def feed(self):
+        """
+        Move the events of the backlog into the queue, waiting for room (from the feeder thread of the subscription).
+        Once the subscription is closed, the events finding no room are dropped without waiting.
+        """
+        while not self.closed or not self.backlog.empty():
+            try:
+                event = self.backlog.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            try:
+                self.put(event)
+            finally:
+                self.backlog.task_done()
+
+    def put(self, event):
+        deadline = time.monotonic() + self.block_timeout if self.block_timeout is not None else None
+        while True:
+            timeout = 0. if self.closed else 0.2
+            if deadline is not None:
+                timeout = max(0., min(timeout, deadline - time.monotonic()))
+            try:
+                self.queue.put(event, timeout=timeout)
+                self.n_delivered += 1
+                return
+            except queue.Full:
+                if self.closed or (deadline is not None and time.monotonic() >= deadline):
+                    self.drop()
+                    return
+
+    def pending(self):
+        """
+        Check if events are waiting in the backlog or the queue
+        """
+        return self.backlog.unfinished_tasks > 0 or not self.queue.empty()
+
+    def join(self):
+        """
+        Wait until the events of the backlog and of the queue have been handled (see get)
+        """
+        self.backlog.join()
+        self.queue.join()
+
+    def get(self, timeout=None, max_events=1000, done=True):
+        """
+        Get the queued events (at most max_events), waiting at most timeout seconds for the first one. If done is
+        False, the events are only marked as handled (see queue.Queue.task_done) by a call to task_done.
+
+        Returns
+        -------
+        list of BusEvent: empty if no event was published within timeout
+        """
+        events = []
+        try:
+            events.append(self.queue.get(timeout=timeout))
+            while len(events) < max_events:
+                events.append(self.queue.get_nowait())
+        except queue.Empty:
+            pass
+        if done:
+            self.task_done(len(events))
+        return events
+
+    def task_done(self, n_events):
+        for _ in range(n_events):
+            self.queue.task_done()
+
+    def stats(self):
+        return dict(name=self.name, policy=self.policy, queue_depth=self.queue.qsize(),
+                    backlog=self.backlog.qsize(), n_delivered=self.n_delivered, n_dropped=self.n_dropped)
+
+
+class EventBus(QObject):
+    """
+    Publish/subscribe bus of the logged events (see the module description)
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *interval*       int         time (in ms) between two deliveries to the UI subscribers
+    =============== =========== ==========================================================
+    """
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, interval=20):
+        super().__init__()
+        self._inbox = queue.SimpleQueue()
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self._threads = dict([])  # subscription: its feeder and delivery threads
+        self.n_published = 0
+        self._thread = None
+        self._timer = QTimer()
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.deliver_ui)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._thread = threading.Thread(target=self._run, name='EventBus', daemon=True)
+        self._thread.start()
+        self._timer.start()
+
+    def stop(self):
+        """
+        Deliver the published events and stop the bus and delivery threads
+        """
+        if self.running:
+            self.flush()
+            self._inbox.put(_STOP)
+            self._thread.join()
+        self._thread = None
+        self._timer.stop()
+        for subscription in self.subscriptions():
+            self.unsubscribe(subscription)
+
+    def publish(self, event):
+        """
+        Publish a BusEvent, never waiting for the subscribers
+        """
+        self._inbox.put(event)
+        self.n_published += 1
+
+    def subscribe(self, name, callback=None, maxsize=1000, policy='drop', block_timeout=5., session=None, ui=False,
+                  backlog_size=None):
+        """
+        Subscribe to the published events. callback, if given, is called with lists of events from the UI thread if
+        ui is True, else from a delivery thread. Without callback, the events are got with Subscription.get. With the
+        block policy, a feeder thread moves the events of the backlog into the queue (see Subscription).
+
+        Returns
+        -------
+        Subscription
+        """
+        subscription = Subscription(name, maxsize, policy, block_timeout, session, backlog_size)
+        subscription.callback = callback
+        subscription.ui = ui
+        threads = []
+        if policy == 'block':
+            threads.append(threading.Thread(target=subscription.feed, name=f'EventBus {name} feeder', daemon=True))
+        if callback is not None and not ui:
+            threads.append(threading.Thread(target=self._deliver, args=(subscription,), name=f'EventBus {name}',
+                                            daemon=True))
+        self._threads[subscription] = threads
+        for thread in threads:
+            thread.start()
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+        subscription.closed = True
+        for thread in self._threads.pop(subscription, []):
+            if thread is not threading.current_thread():
+                thread.join()
+
+    def subscriptions(self):
+        with self._lock:
+            return list(self._subscriptions)
+
+    def stats(self):
+        return dict(n_published=self.n_published,
+                    subscriptions=[subscription.stats() for subscription in self.subscriptions()])
+
+    def flush(self, session=None):
+        """
+        Wait until the published events have been dispatched, then handled by the subscribers of session only (by all
+        the subscribers with a callback if session is None). To be called from the UI thread.
+        """
+        if not self.running:
+            return
+        marker = threading.Event()
+        self._inbox.put(marker)
+        marker.wait()  # the bus thread never waits for the subscribers
+        for subscription in self.subscriptions():
+            if subscription.callback is None or (session is not None and subscription.session != session):
+                continue
+            if subscription.ui:
+                while subscription.pending():
+                    events = subscription.get(timeout=0.01)
+                    if events:
+                        self._call(subscription, events)
+            else:
+                subscription.join()
+
+    def deliver_ui(self):
+        for subscription in self.subscriptions():
+            if subscription.ui and subscription.callback is not None:
+                events = subscription.get(timeout=0)
+                if events:
+                    self._call(subscription, events)
+
+    def _call(self, subscription, events):
+        try:
+            subscription.callback(events)
+        except Exception as e:
+            logging.exception(f'EventBus {subscription.name}: {str(e)}')
+            self.error_signal.emit(f'{subscription.name}: {len(events)} events not handled: {str(e)}')
+
+    def _deliver(self, subscription):
+        while not subscription.closed or not subscription.queue.empty():
+            events = subscription.get(timeout=0.2, done=False)
+            if events:
+                self._call(subscription, events)
+                subscription.task_done(len(events))
+
+    def _run(self):
+        while True:
+            item = self._inbox.get()
+            if item is _STOP:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            for subscription in self.subscriptions():
+                if subscription.accepts(item):
+                    subscription.offer(item)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.bus_server.serve_connection(self.request, self.client_address)
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class BusServer:
+    """
+    Socket server streaming the events of an EventBus to external subscribers, each connection getting its own
+    subscription (see the module description)
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *bus*            EventBus    the bus whose events are streamed
+    *address*        str         host:port of the TCP socket or path of the Unix socket
+    *maxsize*        int         default queue size of the subscriptions
+    *block_timeout*  float       maximum wait (in s) of the subscriptions with the block policy
+    =============== =========== ==========================================================
+    """
+    max_maxsize = 100000
+
+    def __init__(self, bus, address=default_address, maxsize=1000, block_timeout=1.):
+        self.bus = bus
+        self.address = address
+        self.maxsize = maxsize
+        self.block_timeout = block_timeout
+        self._server = None
+        self._thread = None
+        self._stopping = False
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        family, address = parse_address(self.address)
+        if family == socket.AF_INET:
+            self._server = _TCPServer(address, _Handler)
+        else:
+            if os.path.exists(address):
+                os.remove(address)  # socket left by a previous instance
+            self._server = _UnixServer(address, _Handler)
+        self._server.bus_server = self
+        self._stopping = False
+        self._thread = threading.Thread(target=self._server.serve_forever, name='BusServer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self.running:
+            self._stopping = True
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            family, address = parse_address(self.address)
+            if family != socket.AF_INET and os.path.exists(address):
+                os.remove(address)
+        self._thread = None
+
+    def read_subscription(self, connection):
+        connection.settimeout(5.)
+        line = b''
+        while not line.endswith(b'\n') and len(line) < 1024:
+            data = connection.recv(1)
+            if not data:
+                break
+            line += data
+        fields = line.decode('utf-8').split()
+        if not fields or fields[0].upper() != 'SUBSCRIBE':
+            raise ValueError(f'invalid subscription line {line!r}')
+        policy = fields[1] if len(fields) > 1 else 'drop'
+        if policy not in bus_policies:
+            raise ValueError(f'{policy} is not a bus policy, one of {bus_policies}')
+        maxsize = int(fields[2]) if len(fields) > 2 else self.maxsize
+        if not 0 < maxsize <= self.max_maxsize:
+            raise ValueError(f'invalid queue size {maxsize}, from 1 to {self.max_maxsize}')
+        session = fields[3] if len(fields) > 3 else None
+        return policy, maxsize, session
+
+    def serve_connection(self, connection, client_address):
+        """
+        Stream the events of a subscription to a connection (from the connection thread)
+        """
+        try:
+            policy, maxsize, session = self.read_subscription(connection)
+        except (ValueError, UnicodeDecodeError, OSError) as e:
+            logging.warning(f'BusServer {client_address}: {str(e)}')
+            return
+        subscription = self.bus.subscribe(f'socket {client_address}', maxsize=maxsize, policy=policy,
+                                          block_timeout=self.block_timeout, session=session, backlog_size=maxsize)
+        connection.settimeout(None)
+        try:
+            while not self._stopping:
+                if subscription.overflowed:
+                    logging.warning(f'BusServer {client_address}: backlog full, disconnected')
+                    break
+                events = subscription.get(timeout=0.2)
+                if events:
+                    connection.sendall(b''.join([to_json_line(event) for event in events]))
+        except OSError:
+            pass  # client disconnected
+        finally:
+            self.bus.unsubscribe(subscription)
+            logging.info(f'BusServer {client_address} disconnected: {subscription.stats()}')
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m beeactions.event_bus',
+                                     description='Print the events streamed by the event bus server of BeeActions')
+    parser.add_argument('--address', default=default_address, help='host:port or path of a Unix socket')
+    parser.add_argument('--policy', choices=bus_policies, default='drop')
+    parser.add_argument('--maxsize', type=int, default=1000, help='queue size of the subscription')
+    parser.add_argument('--session', default=None, help='only the events of this session')
+    parser.add_argument('--delay', type=float, default=0., help='delay (in s) after each event (slow subscriber)')
+    options = parser.parse_args(args)
+
+    family, address = parse_address(options.address)
+    with socket.socket(family, socket.SOCK_STREAM) as client:
+        client.connect(address)
+        client.sendall(f"SUBSCRIBE {options.policy} {options.maxsize} {options.session or ''}\n".encode('utf-8'))
+        try:
+            for line in client.makefile('r', encoding='utf-8'):
+                print(line, end='', flush=True)
+                if options.delay:
+                    time.sleep(options.delay)
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import numpy as np
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+
+
+class GrowableArray:
+    """
+    Preallocated 1D numpy array whose capacity doubles when full
+    """
+    def __init__(self, dtype, capacity=1024):
+        self._data = np.empty((capacity,), dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, value):
+        if self._size == len(self._data):
+            data = np.empty((2 * len(self._data),), dtype=self._data.dtype)
+            data[:self._size] = self._data[:self._size]
+            self._data = data
+        self._data[self._size] = value
+        self._size += 1
+
+    def clear(self):
+        self._size = 0
+
+    def set(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)
+        if len(values) > len(self._data):
+            self._data = np.empty((max(len(values), 2 * len(self._data)),), dtype=self._data.dtype)
+        self._data[:len(values)] = values
+        self._size = len(values)
+
+    @property
+    def values(self):
+        """
+        View (no copy) of the filled part of the array
+        """
+        return self._data[:self._size]
+
+
+class EventBuffer:
+    """
+    Columnar buffer of the logged events: time (int64 ns), action code and bee number
+    """
+    def __init__(self, capacity=1024):
+        self.times = GrowableArray(np.int64, capacity)
+        self.actions = GrowableArray(np.int16, capacity)
+        self.bees = GrowableArray(np.int32, capacity)
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, time, action, bee=-1):
+        self.times.append(time)
+        self.actions.append(action)
+        self.bees.append(bee)
+
+    def clear(self):
+        self.times.clear()
+        self.actions.clear()
+        self.bees.clear()
+
+
+class EventListModel(QAbstractListModel):
+    """
+    List model of the logged events, newest first, rendering the text of an event only when its row is displayed.
+
+    The events can be filtered by bee and/or action: the model then displays the rows of an index array of the
+    matching events, the event buffer itself is never copied.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.buffer = EventBuffer()
+        self.action_names = []
+        self.action_codes = dict([])
+        self.show_bee = True
+        self.filter_bee = None
+        self.filter_action = None
+        self._rows = None
+
+    def clear(self, actions=[], show_bee=True):
+        """
+        Remove all the events, actions being the names of the expected actions
+        """
+        self.beginResetModel()
+        self.buffer.clear()
+        self.action_names = list(actions)
+        self.action_codes = dict([(action, code) for code, action in enumerate(self.action_names)])
+        self.show_bee = show_bee
+        if self._rows is not None:
+            self._rows.clear()
+        self.endResetModel()
+
+    def get_code(self, action):
+        if action not in self.action_codes:
+            self.action_codes[action] = len(self.action_names)
+            self.action_names.append(action)
+        return self.action_codes[action]
+
+    def add_event(self, time, action, bee=-1):
+        """
+        Add an event at time (in ns), action being its name
+        """
+        code = self.get_code(action)
+        index = len(self.buffer)
+        self.buffer.append(time, code, bee)
+        if self._rows is None:
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self.endInsertRows()
+        elif self.match(code, bee):
+            self.beginInsertRows(QModelIndex(), 0, 0)
+            self._rows.append(index)
+            self.endInsertRows()
+
+    def match(self, code, bee):
+        return (self.filter_action is None or code == self.action_codes.get(self.filter_action, -2)) and \
+               (self.filter_bee is None or bee == self.filter_bee)
+
+    def set_filter(self, bee=None, action=None):
+        """
+        Display only the events of the given bee and/or action (None for all)
+        """
+        self.beginResetModel()
+        self.filter_bee = bee
+        self.filter_action = action
+        if bee is None and action is None:
+            self._rows = None
+        else:
+            mask = np.ones((len(self.buffer),), dtype=bool)
+            if action is not None:
+                mask &= self.buffer.actions.values == self.action_codes.get(action, -2)
+            if bee is not None:
+                mask &= self.buffer.bees.values == bee
+            self._rows = GrowableArray(np.int64)
+            self._rows.set(np.flatnonzero(mask))
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.buffer) if self._rows is None else len(self._rows)
+
+    def event_index(self, row):
+        """
+        Get the index in the event buffer of the event displayed at row
+        """
+        count = self.rowCount()
+        if self._rows is None:
+            return count - 1 - row
+        return int(self._rows.values[count - 1 - row])
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        ind = self.event_index(index.row())
+        seconds = int(self.buffer.times.values[ind]) // 1000000000
+        action = self.action_names[self.buffer.actions.values[ind]]
+        if self.show_bee:
+            return f'Elapsed time: {seconds} s, Bee {self.buffer.bees.values[ind]} did :{action}'
+        return f'Elapsed time: {seconds} s:{action}'
+
+
+class EventLogView(QtWidgets.QWidget):
+    """
+    Virtualized view of the logged events with filters on bee and action
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.model = EventListModel()
+        layout = QtWidgets.QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+        filter_layout = QtWidgets.QHBoxLayout()
+        filter_layout.addWidget(QtWidgets.QLabel('Bee:'))
+        self.bee_spin = QtWidgets.QSpinBox()
+        self.bee_spin.setRange(-1, 1000000)
+        self.bee_spin.setSpecialValueText('All')
+        self.bee_spin.setValue(-1)
+        filter_layout.addWidget(self.bee_spin)
+        filter_layout.addWidget(QtWidgets.QLabel('Action:'))
+        self.action_combo = QtWidgets.QComboBox()
+        self.action_combo.addItem('All')
+        filter_layout.addWidget(self.action_combo)
+        layout.addLayout(filter_layout)
+
+        self.list_view = QtWidgets.QListView()
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setModel(self.model)
+        layout.addWidget(self.list_view)
+
+        self.bee_spin.valueChanged.connect(self.update_filter)
+        self.action_combo.currentIndexChanged.connect(self.update_filter)
+
+    def clear(self, actions=[], show_bee=True):
+        self.model.clear(actions, show_bee)
+        self.action_combo.blockSignals(True)
+        self.action_combo.clear()
+        self.action_combo.addItems(['All'] + list(actions))
+        self.action_combo.blockSignals(False)
+        self.update_filter()
+
+    def add_event(self, time, action, bee=-1):
+        self.model.add_event(time, action, bee)
+
+    def update_filter(self):
+        bee = self.bee_spin.value()
+        action = self.action_combo.currentText()
+        self.model.set_filter(bee=None if bee == -1 else bee,
+                              action=None if action in ('All', '') else action)
@@ -0,0 +1,237 @@
+"""
+Export of the scans of BeeActions h5 files to Parquet and/or CSV files.
+
+Usage: python -m beeactions.export inputs [inputs ...] [-o output_dir] [-f parquet csv] [-j workers]
+
+inputs are h5 files or directories searched recursively for h5 files. Each h5 file gives one file per format holding
+the events of all its scans (columns: scan, timestamp_ns, time_s, action_code, action, bee), named by its path
+relative to the input directory (see output_names). Events are streamed by chunks of fixed size so that memory stays
+bounded whatever the length of the sessions. The dataset and scan attributes (see BeeActions.save_metadata) are saved
+as file metadata for Parquet files, and in a json file next to CSV files. The xml settings (see settings_store) are
+only exported with the --settings option. Parquet export needs pyarrow. Files are exported in parallel by a pool of
+processes.
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import tables
+
+from beeactions.storage import iter_events
+from beeactions.settings_store import read_settings
+from beeactions.analyze import find_h5_files, iter_scan_groups
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    has_arrow = True
+except ImportError:
+    has_arrow = False
+
+export_formats = ['parquet', 'csv']
+columns = ['scan', 'timestamp_ns', 'time_s', 'action_code', 'action', 'bee']
+
+
+def to_json_value(value):
+    if isinstance(value, bytes):
+        return value.decode(errors='replace')
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, np.ndarray):
+        return value.tolist()
+    elif isinstance(value, (str, int, float, bool, list, dict)) or value is None:
+        return value
+    return str(value)
+
+
+def get_attributes(node, settings=False):
+    """
+    Get the user attributes of a node as a json serializable dict, without the xml settings unless settings is True
+    """
+    attrs = node._v_attrs
+    attributes = dict([(name, to_json_value(attrs[name])) for name in attrs._f_list('user') if name != 'settings'])
+    if settings:
+        xml = read_settings(node)
+        if xml is not None:
+            attributes['settings'] = to_json_value(xml)
+    return attributes
+
+
+def get_metadata(h5file, scan_groups, settings=False):
+    """
+    Get the dataset attributes (groups whose type attribute is 'dataset') and the attributes of the scan groups
+    """
+    datasets = dict([])
+    for group in h5file.walk_groups():
+        if 'type' in group._v_attrs._f_list('user') and to_json_value(group._v_attrs['type']) == 'dataset':
+            datasets[group._v_pathname] = get_attributes(group, settings)
+    scans = dict([(group._v_pathname, get_attributes(group, settings)) for group in scan_groups])
+    return dict(h5_file=h5file.filename, datasets=datasets, scans=scans)
+
+
+def chunk_columns(scan_path, events, actions):
+    names = np.array(list(actions) + [''], dtype=object)
+    return dict(scan=np.full((len(events),), scan_path, dtype=object), timestamp_ns=events['timestamp'],
+                time_s=events['timestamp'] / 1e9, action_code=events['action'], action=names[events['action']],
+                bee=events['bee'])
+
+
+class ParquetExporter:
+    def __init__(self, path, metadata):
+        if not has_arrow:
+            raise ImportError('pyarrow is needed to export to Parquet')
+        self.path = path
+        self.schema = pa.schema([('scan', pa.string()), ('timestamp_ns', pa.int64()), ('time_s', pa.float64()),
+                                 ('action_code', pa.int16()), ('action', pa.string()), ('bee', pa.int32())],
+                                metadata={'beeactions': json.dumps(metadata)})
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    @staticmethod
+    def files(path):
+        return [path]
+
+    def write(self, data):
+        self.writer.write_table(pa.Table.from_pydict(data, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+class CSVExporter:
+    def __init__(self, path, metadata):
+        self.path = path
+        with open(os.path.splitext(path)[0] + '.json', 'w') as f:
+            json.dump(metadata, f, indent=1)
+        self._file = open(path, 'w', newline='')
+        self.writer = csv.writer(self._file)
+        self.writer.writerow(columns)
+
+    @staticmethod
+    def files(path):
+        return [path, os.path.splitext(path)[0] + '.json']
+
+    def write(self, data):
+        self.writer.writerows(zip(*[data[column] for column in columns]))
+
+    def close(self):
+        self._file.close()
+
+
+exporters = dict(parquet=ParquetExporter, csv=CSVExporter)
+
+
+def export_file(path, output_dir, formats=('parquet', 'csv'), chunk_size=65536, settings=False, name=None):
+    """
+    Export all the scans of a h5 file into one file per format in output_dir, named name (a path relative to
+    output_dir, without extension) or by default as the h5 file
+
+    Returns
+    -------
+    dict: the h5 file, the exported files and number of events, or the error raised (the files partly exported are
+          then removed)
+    """
+    outputs = []
+    files = []
+    try:
+        with tables.open_file(path, 'r') as h5file:
+            scan_groups = list(iter_scan_groups(h5file))
+            metadata = get_metadata(h5file, scan_groups, settings)
+            if name is None:
+                name = os.path.splitext(os.path.split(path)[1])[0]
+            base = os.path.join(output_dir, name)
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            for fmt in formats:
+                files.extend(exporters[fmt].files(f'{base}.{fmt}'))
+                outputs.append(exporters[fmt](f'{base}.{fmt}', metadata))
+            n_events = 0
+            for group in scan_groups:
+                for events, actions in iter_events(group, chunk_size):
+                    data = chunk_columns(group._v_pathname, events, actions)
+                    for output in outputs:
+                        output.write(data)
+                    n_events += len(events)
+        for output in outputs:
+            output.close()
+        return dict(file=path, outputs=[output.path for output in outputs], n_scans=len(scan_groups),
+                    n_events=n_events)
+    except Exception as e:
+        for output in outputs:
+            try:
+                output.close()
+            except Exception:
+                pass
+        for file in files:
+            if os.path.isfile(file):
+                os.remove(file)
+        return dict(file=path, error=str(e))
+
+
+def output_names(inputs):
+    """
+    Get the h5 files given in inputs (files or directories searched recursively) and the names of their exported
+    files: the path relative to the input directory (its subdirectories being recreated in the output directory) or
+    the file name, without extension. A suffix is added to names already taken by another input.
+
+    Returns
+    -------
+    list of (str, str): the h5 files and the names of their exported files
+    """
+    files = []
+    names = set([])
+    for path in inputs:
+        if os.path.isdir(path):
+            found = [(file, os.path.relpath(file, path)) for file in find_h5_files(path)]
+        else:
+            found = [(path, os.path.split(path)[1])]
+        for file, relative in found:
+            name = unique = os.path.splitext(relative)[0]
+            index = 1
+            while os.path.normcase(unique) in names:
+                unique = f'{name}_{index}'
+                index += 1
+            names.add(os.path.normcase(unique))
+            files.append((file, unique))
+    return files
+
+
+def export_files(inputs, output_dir, formats=('parquet', 'csv'), workers=None, chunk_size=65536, settings=False):
+    """
+    Export in parallel the h5 files given in inputs (files or directories searched recursively), see output_names
+    """
+    files = output_names(inputs)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    n = len(files)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(export_file, [file for file, _ in files], [output_dir] * n, [formats] * n,
+                                 [chunk_size] * n, [settings] * n, [name for _, name in files]))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m beeactions.export',
+                                     description='Export the events of BeeActions h5 files to Parquet and CSV')
+    parser.add_argument('inputs', nargs='+', help='h5 files or directories searched (recursively) for h5 files')
+    parser.add_argument('-o', '--output', default='.', help='output directory')
+    parser.add_argument('-f', '--formats', nargs='+', choices=export_formats, default=export_formats)
+    parser.add_argument('-j', '--workers', type=int, default=None, help='number of processes (default: all cores)')
+    parser.add_argument('--chunk-size', type=int, default=65536, help='number of events read and written at once')
+    parser.add_argument('--settings', action='store_true', help='also export the xml settings attributes')
+    options = parser.parse_args(args)
+
+    if 'parquet' in options.formats and not has_arrow:
+        parser.error('pyarrow is needed to export to Parquet')
+    results = export_files(options.inputs, options.output, options.formats, options.workers, options.chunk_size,
+                           options.settings)
+    errors = [result for result in results if 'error' in result]
+    for result in errors:
+        print(f"{result['file']}: {result['error']}")
+    print(f'{len(results) - len(errors)} files exported to {options.output}, {len(errors)} errors')
+    return 0 if not errors else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
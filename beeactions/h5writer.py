@@ -0,0 +1,154 @@
+import time
+import queue
+import logging
+import threading
+from collections import namedtuple
+
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+
+# frame: video frame index, key_ns: monotonic time of the key press, origin of the durable latency (None: put time)
+Event = namedtuple('Event', ['timestamp', 'action', 'bee', 'frame', 'key_ns'], defaults=[-1, None])
+
+_STOP = object()
+
+
+class H5Writer(QObject):
+    """
+    Write logged events into the storage of the current scan from a worker thread.
+
+    Events are put in a bounded queue by the UI thread and written by batches. The file is flushed, together with the
+    footer of the scan, every *flush_count* events or every *flush_interval* seconds, whichever comes first. Any
+    access to the h5 file from another thread while a scan is running should be done holding *lock*.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *h5saver*        H5Saver     the saver holding the h5 file (default: the one of the started storage)
+    *queue_size*     int         maximum number of events waiting to be written
+    *flush_count*    int         number of written events triggering a flush
+    *flush_interval* float       maximum time (in s) between two flushes of pending events
+    *latency*        object      optional LatencyRecorder recording the queue, append, flush and durable latencies
+    =============== =========== ==========================================================
+    """
+    status_signal = pyqtSignal(dict)
+
+    def __init__(self, h5saver=None, queue_size=10000, flush_count=50, flush_interval=1., latency=None):
+        super().__init__()
+        self.h5saver = h5saver
+        self.latency = latency
+        self.queue_size = queue_size
+        self.flush_count = flush_count
+        self.flush_interval = flush_interval
+        self.lock = threading.RLock()
+        self._queue = queue.Queue(queue_size)
+        self._thread = None
+        self.storage = None
+        self._reset_stats()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _reset_stats(self):
+        self.n_written = 0
+        self.n_flushes = 0
+        self.max_queue_depth = 0
+        self.last_flush_time = 0.
+        self.max_flush_time = 0.
+        self.total_flush_time = 0.
+
+    def stats(self):
+        """
+        Get the queue depth and flush timings (in ms) of the writer
+        """
+        return dict(queue_depth=self._queue.qsize(), max_queue_depth=self.max_queue_depth,
+                    n_written=self.n_written, n_flushes=self.n_flushes,
+                    last_flush_ms=1000 * self.last_flush_time, max_flush_ms=1000 * self.max_flush_time,
+                    mean_flush_ms=1000 * self.total_flush_time / self.n_flushes if self.n_flushes else 0.)
+
+    def start(self, storage):
+        """
+        Start the worker thread writing events into the given scan storage (see storage.ScanStorage)
+        """
+        if self.running:
+            self.stop()
+        self.storage = storage
+        self._queue = queue.Queue(self.queue_size)
+        self._reset_stats()
+        self._thread = threading.Thread(target=self._run, name='H5Writer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Write all the queued events, flush the file and stop the worker thread
+        """
+        if self.running:
+            self._queue.put(_STOP)
+            self._thread.join()
+        self._thread = None
+
+    def put(self, event):
+        """
+        Queue an event to be written. Blocks only if the queue is full.
+        """
+        if not self.running:
+            logging.warning(f'Event {event} not saved: no scan running')
+            return False
+        self._queue.put((event, time.monotonic_ns()))
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return True
+
+    def _run(self):
+        pending = []
+        last_flush = time.perf_counter()
+        stop = False
+        while not stop:
+            timeout = max(0., self.flush_interval - (time.perf_counter() - last_flush))
+            batch = []
+            try:
+                item = self._queue.get(timeout=timeout if pending else None)
+                while True:
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.flush_count:
+                        break
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                pass
+
+            try:
+                if batch:
+                    self._write_batch(batch)
+                    pending.extend([queued_ns if event.key_ns is None else event.key_ns for event, queued_ns in batch])
+                if pending and (stop or len(pending) >= self.flush_count or
+                                time.perf_counter() - last_flush >= self.flush_interval):
+                    self._flush(pending)
+                    pending = []
+                    last_flush = time.perf_counter()
+            except Exception as e:
+                logging.exception(f'H5Writer: {str(e)}')
+
+    def _write_batch(self, batch):
+        start = time.monotonic_ns()
+        with self.lock:
+            self.storage.write([event for event, queued_ns in batch])
+        if self.latency is not None:
+            self.latency.record_many('queue', [start - queued_ns for event, queued_ns in batch])
+            self.latency.record('append', time.monotonic_ns() - start)
+        self.n_written += len(batch)
+
+    def _flush(self, origin_ns):
+        start = time.perf_counter()
+        with self.lock:
+            self.storage.write_footer()
+            (self.h5saver if self.h5saver is not None else self.storage.h5saver).flush()
+        self.last_flush_time = time.perf_counter() - start
+        if self.latency is not None:
+            self.latency.record('flush', int(1e9 * self.last_flush_time))
+            self.latency.record_many('durable', time.monotonic_ns() - np.array(origin_ns, dtype=np.int64))
+        self.max_flush_time = max(self.max_flush_time, self.last_flush_time)
+        self.total_flush_time += self.last_flush_time
+        self.n_flushes += 1
+        self.status_signal.emit(self.stats())
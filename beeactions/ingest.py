@@ -0,0 +1,322 @@
+"""
+Local socket ingestion of events sent by automated sources (trackers...), merged into the running scan next to the
+keystroke events. The server is bound to the session that was current when it was enabled: its events never go to
+another session, and they are rejected while this session has no running scan.
+
+Protocol: a client connects to the TCP (host:port) or Unix socket (path) of the IngestServer and sends utf-8 lines,
+one event per line, tab separated: wall_time_ns, action, bee. wall_time_ns is the time of the event as ns since the
+epoch (time.time_ns()), it may be empty to use the time of reception. bee may be empty or -1 when there is no bee
+number. Empty lines and lines starting with # are ignored. Events are batched by sending several lines at once.
+
+Received events are put in a bounded queue by the connection threads and merged into the scan by the UI thread, at
+most *max_events_per_tick* events at each tick of a timer. When the queue is full, the connection threads stop reading
+their socket until there is room again, so that a flood of events slows down its source (through TCP/Unix socket flow
+control) rather than the UI thread.
+
+Usage (test client): python -m beeactions.ingest [--address host:port|path] [-n events] [-r rate] [--batch n]
+                                                 [--actions names] [--bees n]
+"""
+import os
+import sys
+import time
+import queue
+import random
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from collections import namedtuple
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+IngestEvent = namedtuple('IngestEvent', ['wall_ns', 'action', 'bee', 'received_ns'])
+IngestEvent.__doc__ = """
+Received event: time (ns since the epoch, None for the time of reception), action name, bee number (-1 if none) and
+monotonic time of reception (ns)
+"""
+
+default_address = '127.0.0.1:50777'
+max_line_length = 4096
+
+
+def parse_address(address):
+    """
+    Get the socket family and address of 'host:port' (TCP) or of a path (Unix socket)
+    """
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return socket.AF_INET, (host or '127.0.0.1', int(port))
+    if not hasattr(socket, 'AF_UNIX'):
+        raise ValueError(f'{address} is not a host:port address (Unix sockets are not available)')
+    return socket.AF_UNIX, address
+
+
+def parse_line(line, received_ns):
+    """
+    Parse a protocol line (bytes, without the end of line) into an IngestEvent, None if it is empty or a comment
+    """
+    line = line.decode('utf-8').strip('\r')
+    if not line.strip() or line.startswith('#'):
+        return None
+    fields = line.split('\t')
+    if len(fields) < 2 or len(fields) > 3 or not fields[1]:
+        raise ValueError(f'invalid line {line!r}')
+    wall_ns = int(fields[0]) if fields[0].strip() else None
+    bee = int(fields[2]) if len(fields) == 3 and fields[2].strip() else -1
+    return IngestEvent(wall_ns, fields[1], bee, received_ns)
+
+
+def format_event(action, bee=-1, wall_ns=None):
+    """
+    Get the protocol line of an event
+    """
+    return f"{'' if wall_ns is None else wall_ns}\t{action}\t{bee}\n".encode('utf-8')
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        self.server.ingest.serve_connection(self.request, self.client_address)
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+
+class IngestServer(QObject):
+    """
+    Socket server receiving events from local clients (see the protocol above). The events are given by batches to
+    *handler* (called from the UI thread with a list of IngestEvent) which returns the number of events accepted.
+
+    ===================== =========== ==========================================================
+    **Parameters**         **Type**    **Description**
+    *handler*              callable    function merging a list of IngestEvent into the scan
+    *address*              str         host:port of the TCP socket or path of the Unix socket
+    *queue_size*           int         maximum number of received events waiting for the UI thread
+    *max_events_per_tick*  int         maximum number of events given to handler at each tick
+    *interval*             int         time (in ms) between two ticks
+    ===================== =========== ==========================================================
+    """
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, handler, address=default_address, queue_size=10000, max_events_per_tick=200, interval=20):
+        super().__init__()
+        self.handler = handler
+        self.address = address
+        self.max_events_per_tick = max_events_per_tick
+        self._queue = queue.Queue(queue_size)
+        self._server = None
+        self._thread = None
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._reset_stats()
+        self._timer = QTimer()
+        self._timer.setInterval(interval)
+        self._timer.timeout.connect(self.drain)
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _reset_stats(self):
+        self.n_connections = 0
+        self.n_received = 0
+        self.n_accepted = 0
+        self.n_rejected = 0
+        self.n_invalid = 0
+        self.max_queue_depth = 0
+        self.blocked_time = 0.
+
+    def stats(self):
+        """
+        Get the number of received, accepted and rejected (unknown action, no running scan...) events, of invalid
+        lines, the queue depth and the time (in s) the connections were blocked by a full queue
+        """
+        return dict(address=self.address, n_connections=self.n_connections, n_received=self.n_received,
+                    n_accepted=self.n_accepted, n_rejected=self.n_rejected, n_invalid=self.n_invalid,
+                    queue_depth=self._queue.qsize(), max_queue_depth=self.max_queue_depth,
+                    blocked_s=self.blocked_time)
+
+    def start(self):
+        """
+        Listen on the socket and start merging the received events
+        """
+        if self.running:
+            return
+        family, address = parse_address(self.address)
+        if family == socket.AF_INET:
+            self._server = _TCPServer(address, _Handler)
+        else:
+            if os.path.exists(address):
+                os.remove(address)  # socket left by a previous instance
+            self._server = _UnixServer(address, _Handler)
+        self._server.ingest = self
+        self._stopping = False
+        self._reset_stats()
+        self._thread = threading.Thread(target=self._server.serve_forever, name='IngestServer', daemon=True)
+        self._thread.start()
+        self._timer.start()
+
+    def stop(self):
+        """
+        Close the socket and its connections, merge the events already received
+        """
+        if self.running:
+            self._stopping = True
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            family, address = parse_address(self.address)
+            if family != socket.AF_INET and os.path.exists(address):
+                os.remove(address)
+        self._thread = None
+        self._timer.stop()
+        while not self._queue.empty():
+            self.drain()
+
+    def serve_connection(self, connection, client_address):
+        """
+        Read the events of a connection and queue them (from the connection thread), waiting while the queue is full
+        """
+        with self._lock:
+            self.n_connections += 1
+        connection.settimeout(0.5)
+        buffer = b''
+        while not self._stopping:
+            try:
+                data = connection.recv(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if not data:
+                break
+            lines = (buffer + data).split(b'\n')
+            buffer = lines.pop()
+            if len(buffer) > max_line_length:
+                lines.append(buffer)
+                buffer = b''
+            received_ns = time.monotonic_ns()
+            events = []
+            invalid = 0
+            for line in lines:
+                try:
+                    event = parse_line(line, received_ns)
+                    if event is not None:
+                        events.append(event)
+                except (ValueError, UnicodeDecodeError) as e:
+                    if not self.n_invalid + invalid:
+                        logging.warning(f'IngestServer {client_address}: {str(e)}')
+                    invalid += 1
+            with self._lock:
+                self.n_received += len(events)
+                self.n_invalid += invalid
+            for event in events:
+                if not self._put(event):
+                    return
+
+    def _put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            start = time.perf_counter()
+            while True:
+                try:
+                    self._queue.put(event, timeout=0.5)
+                    break
+                except queue.Full:
+                    if self._stopping:
+                        return False
+            with self._lock:
+                self.blocked_time += time.perf_counter() - start
+        self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return True
+
+    def drain(self):
+        """
+        Give at most max_events_per_tick queued events to the handler (from the UI thread)
+        """
+        events = []
+        try:
+            while len(events) < self.max_events_per_tick:
+                events.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        if not events:
+            return
+        try:
+            accepted = self.handler(events)
+        except Exception as e:
+            logging.exception(f'IngestServer: {str(e)}')
+            self.error_signal.emit(f'Ingested events not saved: {str(e)}')
+            accepted = 0
+        self.n_accepted += accepted
+        self.n_rejected += len(events) - accepted
+
+
+class IngestClient:
+    """
+    Client sending events to an IngestServer
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *address*        str         host:port of the TCP socket or path of the Unix socket
+    =============== =========== ==========================================================
+    """
+    def __init__(self, address=default_address):
+        family, address = parse_address(address)
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.connect(address)
+
+    def send(self, events):
+        """
+        Send a batch of events given as (action, bee, wall_ns) tuples, bee and wall_ns being optional. Blocks while
+        the server applies backpressure.
+        """
+        self.socket.sendall(b''.join([format_event(*event) for event in events]))
+
+    def close(self):
+        self.socket.close()
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(prog='python -m beeactions.ingest',
+                                     description='Send random events to the ingestion server of BeeActions')
+    parser.add_argument('--address', default=default_address, help='host:port or path of a Unix socket')
+    parser.add_argument('-n', '--events', type=int, default=1000, help='number of events')
+    parser.add_argument('-r', '--rate', type=float, default=50., help='events per second (0: as fast as possible)')
+    parser.add_argument('--batch', type=int, default=10, help='number of events sent at once')
+    parser.add_argument('--actions', nargs='+', default=['Landed'], help='action names of the loaded preset')
+    parser.add_argument('--bees', type=int, default=0, help='bee numbers drawn from 0 to bees-1 (0: no bee)')
+    options = parser.parse_args(args)
+
+    client = IngestClient(options.address)
+    start = time.perf_counter()
+    blocked = 0.
+    try:
+        for first in range(0, options.events, options.batch):
+            batch = [(random.choice(options.actions), random.randrange(options.bees) if options.bees else -1,
+                      time.time_ns()) for _ in range(min(options.batch, options.events - first))]
+            send_start = time.perf_counter()
+            client.send(batch)
+            blocked += time.perf_counter() - send_start
+            if options.rate > 0:
+                delay = start + (first + len(batch)) / options.rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        client.close()
+    elapsed = time.perf_counter() - start
+    print(f'{options.events} events sent in {elapsed:.2f} s ({options.events / elapsed:.0f} events/s), '
+          f'{blocked:.2f} s in send (backpressure)')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,222 @@
+"""
+Append-only binary journal of the events logged during a scan.
+
+Each scan gets a journal file made of a small json header followed by fixed-size records (timestamp, action code, bee
+id, video frame index). Appending a record is a single unbuffered write so that events survive a crash of the
+application even if the h5 file could not be flushed. Journals of scans that were not properly stopped are
+replayed into their h5 file on the next startup. A journal is locked by the process writing it, so that the journals
+of the scans running in other instances of the application are not replayed.
+"""
+import os
+import json
+import struct
+import logging
+
+import numpy as np
+import tables
+
+from beeactions.storage import event_dtype, scan_arrays, get_scan_array, encode_string
+
+MAGIC = b'BEEJRNL\x00'
+VERSION = 1
+JOURNAL_EXT = '.bjl'
+
+record_dtype = np.dtype(event_dtype.descr + [('frame', '<i8')])  # int64 ns timestamps
+_record = struct.Struct('<qhiq')
+_header_length = struct.Struct('<I')
+
+
+def lock_file(file):
+    """
+    Take an exclusive lock on an open file without waiting, released when the file is closed
+
+    Returns
+    -------
+    bool: False if the file is locked by another process
+    """
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class EventJournal:
+    """
+    Journal file attached to a scan of a h5 file
+
+    =============== =========== ==============================================================
+    **Parameters**   **Type**    **Description**
+    *path*           str         path of the journal file
+    *header*         dict        h5 file, scan path, action names and initial array lengths
+    =============== =========== ==============================================================
+    """
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self._file = None
+
+    @classmethod
+    def create(cls, path, h5_file, scan_path, actions, offsets=dict([])):
+        """
+        Create a new journal file and write its header
+
+        =============== =========== ==============================================================
+        **Parameters**   **Type**    **Description**
+        *path*           str         path of the journal file
+        *h5_file*        str         path of the h5 file holding the scan
+        *scan_path*      str         path of the scan group within the h5 file
+        *actions*        list        action names, the action code of an event is its index in it
+        *offsets*        dict        number of rows in each scan array when the journal is started
+        =============== =========== ==============================================================
+        """
+        header = dict(version=VERSION, h5_file=h5_file, scan_path=scan_path, actions=list(actions),
+                      offsets=dict([(name, int(rows)) for name, rows in offsets.items()]))
+        header_bytes = json.dumps(header).encode()
+        journal = cls(path, header)
+        journal._file = open(path, 'wb', buffering=0)
+        lock_file(journal._file)
+        journal._file.write(MAGIC + _header_length.pack(len(header_bytes)) + header_bytes)
+        return journal
+
+    def append(self, timestamp, action, bee=-1, frame=-1):
+        """
+        Append one event record, action being the action code
+        """
+        self._file.write(_record.pack(timestamp, action, bee, frame))
+
+    def close(self, remove=False):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if remove and os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+def read_journal(path):
+    """
+    Read a journal file
+
+    Returns
+    -------
+    dict: the journal header
+    ndarray: the records as a structured array of dtype record_dtype
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise IOError(f'{path} is not a BeeActions journal')
+        length, = _header_length.unpack(f.read(_header_length.size))
+        header = json.loads(f.read(length).decode())
+        data = f.read()
+    if header.get('version') != VERSION:
+        raise IOError(f'{path}: unknown journal version {header.get("version")}')
+    n_records = len(data) // record_dtype.itemsize  # a truncated last record is dropped
+    records = np.frombuffer(data, dtype=record_dtype, count=n_records)
+    return header, records
+
+
+def _append_missing(array, values, offset, actions):
+    missing = int(len(values) - (array.nrows - offset))
+    if missing <= 0:
+        return 0
+    values = values[len(values) - missing:]
+    if isinstance(array, tables.VLArray):
+        for code in values:  # string array of action names, saved before actions were encoded
+            array.append(encode_string(array, actions[code] if code >= 0 else ''))
+    else:
+        array.append(values)
+    if 'shape' in array._v_attrs:
+        shape = list(array._v_attrs['shape'])
+        shape[0] += missing
+        array._v_attrs['shape'] = tuple(shape)
+    return missing
+
+
+def replay_journal(path):
+    """
+    Append to the scan arrays of the h5 file the journal events that were not saved there. If the scan has been
+    properly stopped (scan_done attribute True) nothing is done. If the h5 file cannot be opened, the events are
+    saved in a new file next to it.
+
+    Returns
+    -------
+    int: the number of recovered events
+    """
+    header, records = read_journal(path)
+    values = dict(time_axis=records['timestamp'], actions=records['action'], bees=records['bee'])
+    if np.any(records['frame'] >= 0):  # scan annotated from a video
+        values['frames'] = records['frame']
+    try:
+        h5file = tables.open_file(header['h5_file'], 'a')
+    except Exception as e:
+        logging.warning(f'Cannot open {header["h5_file"]} to replay {path}: {str(e)}')
+        return save_recovered(header, values)
+
+    try:
+        scan_group = h5file.get_node(header['scan_path'])
+        if 'scan_done' in scan_group._v_attrs and scan_group._v_attrs['scan_done']:
+            return 0
+        recovered = 0
+        if 'events' in scan_group:
+            table = scan_group.events
+            recovered = max(0, int(len(records) - (table.nrows - header['offsets'].get('events', 0))))
+            if recovered:
+                table.append(records[list(event_dtype.names)][len(records) - recovered:].astype(event_dtype))
+        for name in scan_arrays + ['frames']:
+            array = get_scan_array(scan_group, name)
+            if array is not None and name in values:
+                recovered = max(recovered, _append_missing(array, values[name], header['offsets'].get(name, 0),
+                                                           header['actions']))
+        scan_group._v_attrs['recovered_events'] = recovered
+        return recovered
+    finally:
+        h5file.close()
+
+
+def save_recovered(header, values):
+    """
+    Save the journal events in a new h5 file when the original one is not usable
+    """
+    base, ext = os.path.splitext(header['h5_file'])
+    scan_name = header['scan_path'].strip('/').replace('/', '_')
+    with tables.open_file(f'{base}_{scan_name}_recovered.h5', 'w') as h5file:
+        for name in scan_arrays + ['frames']:
+            if name in values:
+                h5file.create_array('/', name, values[name])
+        h5file.root.actions._v_attrs['actions'] = header['actions']
+        h5file.root.time_axis._v_attrs['units'] = 'ns'
+        h5file.root._v_attrs['h5_file'] = header['h5_file']
+        h5file.root._v_attrs['scan_path'] = header['scan_path']
+    return len(values['time_axis'])
+
+
+def replay_journals(journal_dir):
+    """
+    Replay all the journals found in journal_dir, removing them once their events are safe in a h5 file. The journals
+    locked by the instances of the application still writing them are skipped.
+
+    Returns
+    -------
+    list of (str, int): the replayed journal paths and their number of recovered events
+    """
+    replayed = []
+    for file in sorted(os.listdir(journal_dir)):
+        if file.endswith(JOURNAL_EXT):
+            path = os.path.join(journal_dir, file)
+            try:
+                with open(path, 'rb') as f:
+                    if not lock_file(f):
+                        logging.info(f'Journal {path} in use by another process, not replayed')
+                        continue
+                    recovered = replay_journal(path)
+                os.remove(path)
+                replayed.append((path, recovered))
+            except Exception as e:
+                logging.exception(f'Cannot replay journal {path}: {str(e)}')
+    return replayed
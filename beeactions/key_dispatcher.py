@@ -0,0 +1,175 @@
+import time
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import Qt, QObject, QEvent, QTimer, pyqtSignal
+
+modifier_keys = set([Qt.Key_Shift, Qt.Key_Control, Qt.Key_Alt, Qt.Key_Meta, Qt.Key_AltGr, Qt.Key_CapsLock,
+                     Qt.Key_NumLock, Qt.Key_ScrollLock])
+modifier_mask = int(Qt.ShiftModifier | Qt.ControlModifier | Qt.AltModifier | Qt.MetaModifier)
+
+
+def key_combination(event):
+    """
+    Get the key combination (key code or-ed with the modifiers, as in QKeySequence) of a QKeyEvent
+    """
+    return event.key() | (int(event.modifiers()) & modifier_mask)
+
+
+def parse_sequence(text):
+    """
+    Get the tuple of key combinations of a key sequence given as text (for instance 'Ctrl+E' or 'G, 1')
+    """
+    sequence = QtGui.QKeySequence(text)
+    return tuple([sequence[ind] for ind in range(sequence.count())])
+
+
+def sequence_text(sequence):
+    return QtGui.QKeySequence(*sequence).toString()
+
+
+class KeyDispatcher(QObject):
+    """
+    Single application event filter dispatching key combinations and multi-key sequences (chords) to action ids.
+
+    Bindings are stored in a dict from the tuple of key combinations to the action id, so that a key press is
+    dispatched with one lookup whatever the number of actions, and no Qt object is created per shortcut. Actions are
+    enabled or disabled by id. When a sequence is both bound and the prefix of longer sequences, it is triggered if no
+    other key is pressed within *chord_timeout* seconds. Keys are not dispatched while a text widget has the focus or a
+    modal dialog is open.
+
+    activated_signal is emitted with the action id and the monotonic time (time.monotonic_ns) of the key press
+    completing the sequence.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *chord_timeout*  float       maximum time (in s) between two keys of a sequence
+    =============== =========== ==========================================================
+    """
+    activated_signal = pyqtSignal(int, object)
+    sequence_signal = pyqtSignal(str)
+
+    def __init__(self, chord_timeout=1.):
+        super().__init__()
+        self.chord_timeout = chord_timeout
+        self.enabled = False
+        self.bindings = dict([])
+        self.prefixes = set([])
+        self.disabled_actions = set([])
+        self._sequence = ()
+        self._sequence_ns = None
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.timeout)
+
+    def set_enabled(self, enabled=True):
+        app = QtWidgets.QApplication.instance()
+        if enabled and not self.enabled:
+            app.installEventFilter(self)
+        elif not enabled and self.enabled:
+            app.removeEventFilter(self)
+            self.reset()
+        self.enabled = enabled
+
+    def set_bindings(self, sequences):
+        """
+        Set the bindings, the action id being the index of its key sequence (text or tuple of key combinations) in
+        sequences. Empty sequences are not bound.
+
+        Returns
+        -------
+        list of int: ids of the actions whose sequence is already bound to a previous action
+        """
+        self.bindings = dict([])
+        self.prefixes = set([])
+        self.disabled_actions = set([])
+        conflicts = []
+        for action_id, sequence in enumerate(sequences):
+            if isinstance(sequence, str):
+                sequence = parse_sequence(sequence)
+            if not sequence:
+                continue
+            if sequence in self.bindings:
+                conflicts.append(action_id)
+                continue
+            self.bindings[sequence] = action_id
+            for ind in range(1, len(sequence)):
+                self.prefixes.add(sequence[:ind])
+        self.reset()
+        return conflicts
+
+    def set_action_enabled(self, action_id, enabled=True):
+        if enabled:
+            self.disabled_actions.discard(action_id)
+        else:
+            self.disabled_actions.add(action_id)
+
+    def first_keys(self):
+        """
+        Get the key combinations starting a bound sequence
+        """
+        return set([sequence[0] for sequence in self.bindings])
+
+    def reset(self):
+        self._timer.stop()
+        if self._sequence:
+            self.sequence_signal.emit('')
+        self._sequence = ()
+        self._sequence_ns = None
+
+    def is_blocked(self):
+        if QtWidgets.QApplication.activeModalWidget() is not None:
+            return True
+        widget = QtWidgets.QApplication.focusWidget()
+        return isinstance(widget, (QtWidgets.QLineEdit, QtWidgets.QAbstractSpinBox, QtWidgets.QTextEdit,
+                                   QtWidgets.QPlainTextEdit))
+
+    def eventFilter(self, obj, event):
+        if event.type() != QEvent.KeyPress or event.isAutoRepeat() or event.key() in modifier_keys:
+            return False
+        if event.key() == Qt.Key_unknown or self.is_blocked():
+            return False
+        return self.key_press(key_combination(event), time.monotonic_ns())
+
+    def key_press(self, combination, time_ns):
+        """
+        Process a key combination pressed at time_ns, returns True if it has been used
+        """
+        sequence = self._sequence + (combination,)
+        if sequence not in self.bindings and sequence not in self.prefixes and self._sequence:
+            # the pending sequence is broken, the key may start a new one
+            self.timeout()
+            sequence = (combination,)
+
+        if sequence in self.prefixes:
+            self._sequence = sequence
+            self._sequence_ns = time_ns
+            self._timer.start(int(1000 * self.chord_timeout))
+            self.sequence_signal.emit(sequence_text(sequence) + ', ...')
+            return True
+        elif sequence in self.bindings:
+            self.reset()
+            if self.bindings[sequence] in self.disabled_actions:
+                return False  # the key is left to the focused widget
+            self.activate(self.bindings[sequence], time_ns)
+            return True
+        return False
+
+    def continues(self, combination):
+        """
+        Check if a key combination continues the pending sequence
+        """
+        sequence = self._sequence + (combination,)
+        return bool(self._sequence) and (sequence in self.bindings or sequence in self.prefixes)
+
+    def timeout(self):
+        """
+        Trigger the action bound to the pending sequence, if any, and clear it
+        """
+        sequence, time_ns = self._sequence, self._sequence_ns
+        self.reset()
+        if sequence in self.bindings:
+            self.activate(self.bindings[sequence], time_ns)
+
+    def activate(self, action_id, time_ns):
+        if action_id not in self.disabled_actions:
+            self.activated_signal.emit(action_id, time_ns)
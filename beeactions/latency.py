@@ -0,0 +1,120 @@
+import json
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QTimer
+
+latency_stages = ['dispatch', 'queue', 'append', 'flush', 'durable']
+latency_descriptions = dict(dispatch='key press to log_data', queue='wait in the writer queue',
+                            append='append of a batch', flush='flush of the h5 file',
+                            durable='key press to event flushed on disk')
+
+
+class LatencyRecorder:
+    """
+    Record latencies (in ns) of the stages of the saving of an event in fixed size ring buffers.
+
+    Each stage should be recorded from a single thread.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *size*           int         number of latencies kept per stage
+    =============== =========== ==========================================================
+    """
+    def __init__(self, size=10000, stages=latency_stages):
+        self.size = size
+        self.stages = list(stages)
+        self._buffers = dict([(stage, np.zeros((size,), dtype=np.int64)) for stage in self.stages])
+        self._counts = dict([(stage, 0) for stage in self.stages])
+
+    def reset(self):
+        for stage in self.stages:
+            self._counts[stage] = 0
+
+    def record(self, stage, latency_ns):
+        buffer = self._buffers[stage]
+        buffer[self._counts[stage] % self.size] = latency_ns
+        self._counts[stage] += 1
+
+    def record_many(self, stage, latencies_ns):
+        latencies_ns = np.asarray(latencies_ns)[-self.size:]
+        count = self._counts[stage]
+        indexes = (count + np.arange(len(latencies_ns))) % self.size
+        self._buffers[stage][indexes] = latencies_ns
+        self._counts[stage] = count + len(latencies_ns)
+
+    def count(self, stage):
+        return self._counts[stage]
+
+    def values_ms(self, stage):
+        """
+        Get the recorded latencies of a stage in ms (the last *size* ones)
+        """
+        return self._buffers[stage][:min(self._counts[stage], self.size)] / 1e6
+
+    def percentiles(self, stage, q=(50, 95, 99)):
+        values = self.values_ms(stage)
+        if len(values) == 0:
+            return [np.nan for _ in q]
+        return np.percentile(values, q).tolist()
+
+    def summary(self):
+        """
+        Get the number of events, p50, p95, p99 and max latency (in ms) of each stage
+        """
+        summary = dict([])
+        for stage in self.stages:
+            values = self.values_ms(stage)
+            if len(values):
+                p50, p95, p99 = np.percentile(values, (50, 95, 99)).tolist()
+                summary[stage] = dict(count=self._counts[stage], p50=p50, p95=p95, p99=p99, max=float(values.max()))
+        return summary
+
+    def summary_json(self):
+        return json.dumps(self.summary())
+
+
+class LatencyViewer(QtWidgets.QWidget):
+    """
+    Histogram and percentiles of the latencies of a stage, refreshed every *interval* ms
+    """
+    def __init__(self, recorder, interval=500, parent=None):
+        super().__init__(parent)
+        self.recorder = recorder
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+
+        self.stage_combo = QtWidgets.QComboBox()
+        for stage in recorder.stages:
+            self.stage_combo.addItem(f'{stage}: {latency_descriptions.get(stage, "")}', stage)
+        self.stage_combo.currentIndexChanged.connect(self.update_view)
+        layout.addWidget(self.stage_combo)
+        self.percentile_label = QtWidgets.QLabel()
+        layout.addWidget(self.percentile_label)
+
+        self.plot = pg.PlotWidget()
+        self.plot.setLabel('bottom', 'Latency', units='ms')
+        self.plot.setLabel('left', 'Events')
+        self.plot.setMinimumHeight(150)
+        self.curve = self.plot.plot([0, 1], [0], stepMode=True, fillLevel=0, brush=(0, 0, 255, 80))
+        layout.addWidget(self.plot)
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.update_view)
+        self.timer.start(interval)
+
+    def update_view(self):
+        if not self.isVisible():
+            return
+        stage = self.stage_combo.currentData()
+        values = self.recorder.values_ms(stage)
+        if len(values) == 0:
+            self.percentile_label.setText('No data')
+            self.curve.setData([0, 1], [0], stepMode=True, fillLevel=0)
+            return
+        p50, p95, p99 = self.recorder.percentiles(stage)
+        self.percentile_label.setText(f'n: {self.recorder.count(stage)}, p50: {p50:.2f} ms, p95: {p95:.2f} ms, '
+                                      f'p99: {p99:.2f} ms')
+        hist, edges = np.histogram(values, bins=50)
+        self.curve.setData(edges, hist, stepMode=True, fillLevel=0)
@@ -0,0 +1,155 @@
+"""
+Persistence of the dock layouts (DockArea.saveState) in the layout directory.
+
+Layouts are saved as versioned json files: {"format": "beeactions_layout", "version": 1, "state": ...}. Files saved
+before as raw pickles are still loaded.
+"""
+import os
+import json
+import queue
+import pickle
+import logging
+import tempfile
+import threading
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+layout_format = 'beeactions_layout'
+layout_version = 1
+
+_STOP = object()
+
+
+def write_layout(path, state):
+    """
+    Write a layout state atomically: into a temporary file of the same directory, then renamed as path
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=name, suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(dict(format=layout_format, version=layout_version, state=state), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_layout(path):
+    """
+    Read a layout state from a json layout file, or from a pickle as saved by previous versions
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    try:
+        layout = json.loads(content.decode())
+    except (UnicodeDecodeError, ValueError):
+        return pickle.loads(content)
+    if not isinstance(layout, dict) or layout.get('format', None) != layout_format:
+        raise ValueError(f'{path} is not a layout file')
+    if layout['version'] > layout_version:
+        raise ValueError(f'{path} layout version {layout["version"]} is not supported')
+    return layout['state']
+
+
+class LayoutStore(QObject):
+    """
+    Save layout states from a worker thread, coalescing the changes of a layout until no other change happens for
+    *delay* seconds, so that moving or resizing docks never waits for the disk. The last saved or loaded state of each
+    file is kept in memory and reused while the file is not modified by someone else. Write errors are reported by
+    error_signal.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *delay*          float       quiet period (in s) after the last change before saving
+    =============== =========== ==========================================================
+    """
+    error_signal = pyqtSignal(str)
+
+    def __init__(self, delay=1.):
+        super().__init__()
+        self.delay = delay
+        self._states = dict([])  # path: [state, modification time of the file once written, None if pending]
+        self._pending = dict([])  # path: function returning the state
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='LayoutStore', daemon=True)
+        self._thread.start()
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.commit)
+
+    def schedule(self, path, get_state):
+        """
+        Save the state returned by get_state in path once the layout has not changed during the quiet period. The
+        state is only got when saved.
+        """
+        self._pending[path] = get_state
+        self._timer.start(int(1000 * self.delay))
+
+    def save(self, path, state):
+        """
+        Save state in path now: called from the UI thread, the file is written by the worker thread
+        """
+        self._pending.pop(path, None)
+        with self._lock:
+            self._states[path] = [state, None]
+        self._queue.put((path, state))
+
+    def commit(self):
+        """
+        Save the pending states
+        """
+        self._timer.stop()
+        pending, self._pending = self._pending, dict([])
+        for path, get_state in pending.items():
+            try:
+                self.save(path, get_state())
+            except Exception as e:
+                self.error_signal.emit(f'Layout {path} not saved: {str(e)}')
+
+    def load(self, path):
+        """
+        Get the layout state saved in path, from memory if the file has not been modified since saved or loaded
+        """
+        with self._lock:
+            entry = self._states.get(path, None)
+            if entry is not None and (entry[1] is None or entry[1] == os.stat(path).st_mtime_ns):
+                return entry[0]
+        state = read_layout(path)
+        with self._lock:
+            self._states[path] = [state, os.stat(path).st_mtime_ns]
+        return state
+
+    def flush(self):
+        """
+        Save the pending states and wait until they are written
+        """
+        self.commit()
+        self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                path, state = item
+                write_layout(path, state)
+                with self._lock:
+                    entry = self._states.get(path, None)
+                    if entry is not None and entry[0] is state:
+                        entry[1] = os.stat(path).st_mtime_ns
+            except Exception as e:
+                logging.exception(f'LayoutStore: {str(e)}')
+                self.error_signal.emit(f'Layout {item[0]} not saved: {str(e)}')
+            finally:
+                self._queue.task_done()
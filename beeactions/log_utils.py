@@ -0,0 +1,134 @@
+"""
+Logging of BeeActions: records are put in a queue by the logging thread (usually the UI thread) and written by a
+listener thread, so that logging, even at DEBUG level, never waits for the disk.
+
+Records are written as json lines ({"time", "level", "logger", "thread", "message"} and the fields of structured
+records, see log_event) in beeactions.jsonl of the logging directory. The file is rotated at each launch, when it
+exceeds *max_bytes* and when it is older than *rotate_interval*. At most *backup_count* rotated files are kept, and
+they are removed after *max_age_days*.
+"""
+import os
+import json
+import glob
+import time
+import queue
+import atexit
+import logging
+import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+log_name = 'beeactions.jsonl'
+logger = logging.getLogger('beeactions')
+
+_listener = None
+_file_handler = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as json lines, adding the fields of the data dict of structured records
+    """
+    def format(self, record):
+        line = dict(time=datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+                    level=record.levelname, logger=record.name, thread=record.threadName,
+                    message=record.getMessage())
+        if record.exc_info:
+            line['exception'] = self.formatException(record.exc_info)
+        data = getattr(record, 'data', None)
+        if data:
+            line.update(data)
+        return json.dumps(line, default=str)
+
+
+class RetentionFileHandler(RotatingFileHandler):
+    """
+    Rotating file handler also rotating files older than rotate_interval, and removing rotated files older than max_age
+
+    ================= =========== ==========================================================
+    **Parameters**     **Type**    **Description**
+    *filename*         str         path of the log file
+    *max_bytes*        int         size of the file triggering a rotation
+    *backup_count*     int         maximum number of rotated files
+    *rotate_interval*  float       maximum time (in s) a file is written to
+    *max_age*          float       time (in s) after which rotated files are removed
+    ================= =========== ==========================================================
+    """
+    def __init__(self, filename, max_bytes=5 * 1024 ** 2, backup_count=20, rotate_interval=86400.,
+                 max_age=30 * 86400.):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.rotate_interval = rotate_interval
+        self.max_age = max_age
+        self.rollover_at = time.time() + rotate_interval
+
+    def shouldRollover(self, record):
+        return record.created >= self.rollover_at or super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + self.rotate_interval
+        self.remove_old_files()
+
+    def remove_old_files(self):
+        limit = time.time() - self.max_age
+        for path in glob.glob(self.baseFilename + '.*'):
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def setup_logging(directory, level=logging.DEBUG, max_bytes=5 * 1024 ** 2, backup_count=20, rotate_interval=86400.,
+                  max_age_days=30):
+    """
+    Send the records of the root logger to a listener thread writing them in the json lines file of directory
+    """
+    global _listener, _file_handler
+    stop_logging()
+    _file_handler = RetentionFileHandler(os.path.join(directory, log_name), max_bytes, backup_count,
+                                         rotate_interval, max_age_days * 86400.)
+    _file_handler.setFormatter(JsonFormatter())
+    if os.path.isfile(_file_handler.baseFilename) and os.path.getsize(_file_handler.baseFilename) > 0:
+        _file_handler.doRollover()  # one file per launch
+    else:
+        _file_handler.remove_old_files()
+    for path in glob.glob(os.path.join(directory, 'bee_action_*.log')):  # files of previous versions
+        if os.path.getmtime(path) < time.time() - max_age_days * 86400.:
+            os.remove(path)
+
+    log_queue = queue.SimpleQueue()
+    for handler in logging.root.handlers[:]:
+        logging.root.removeHandler(handler)
+    logging.root.addHandler(QueueHandler(log_queue))
+    logging.root.setLevel(level)
+    _listener = QueueListener(log_queue, _file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """
+    Write the queued records and stop the listener thread
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        _file_handler.close()
+
+
+def log_file():
+    """
+    Path of the current log file, None if logging has not been set up
+    """
+    return _file_handler.baseFilename if _file_handler is not None else None
+
+
+def log_event(name, level=logging.INFO, **data):
+    """
+    Log a structured record: the event name as message, the keyword arguments as fields of the json line
+    """
+    if logger.isEnabledFor(level):
+        data['event'] = name
+        logger.log(level, name, extra=dict(data=data))
@@ -1,66 +1,120 @@
 import sys
 import os
+import time
 import logging
-import datetime
-import numpy as np
-from PyQt5 import QtGui, QtWidgets, QtCore
+from datetime import timedelta
+from collections import namedtuple
+from PyQt5 import QtWidgets, QtCore
 from PyQt5.QtCore import Qt, QObject, pyqtSlot, QThread, pyqtSignal, QSize, QTimer, QDateTime, QDate, QTime
 from pyqtgraph.dockarea import Dock
 
-from pymodaq.daq_utils.h5modules import H5Saver
 from pyqtgraph.parametertree import Parameter, ParameterTree
-from pymodaq.daq_utils import custom_parameter_tree as custom_tree
 
-from pymodaq.daq_utils.daq_utils import get_set_local_dir, getLineInfo
+from pymodaq.daq_utils.daq_utils import getLineInfo
 from pymodaq.daq_utils.gui_utils import DockArea, select_file
-from shortcut_manager import ShortCutManager, shortcut_path
+from beeactions.shortcut_manager import ShortCutManager, get_shortcut_path
 from pymodaq.daq_utils.chrono_timer import ChronoTimer
-import pickle
+from beeactions.paths import get_local_path
+from beeactions.log_utils import setup_logging, log_file, log_event
+from beeactions.presets import PresetIndex
+from beeactions.profiles import StorageProfile, storage_profiles, compression_libraries, get_profile
+from beeactions.layout_store import LayoutStore
+from beeactions.h5writer import H5Writer, Event
+from beeactions.bee_entry import BeeNumberEntry
+from beeactions.key_dispatcher import KeyDispatcher
+from beeactions.timestamps import EventClock
+from beeactions.latency import LatencyRecorder, LatencyViewer
+from beeactions.event_model import EventLogView
+from beeactions.statistics import LiveStatistics, StatisticsViewer
+from beeactions.settings_store import SettingsStore
+from beeactions.event_bus import EventBus, BusEvent
 
 list_actions = ['Eat', 'Landed', 'Attack']
+storage_modes = ['arrays', 'table']  # see storage.storage_modes, not imported here to keep PyTables out of startup
+profile_settings = ['chunk_rows', 'complib', 'complevel', 'flush_count', 'flush_interval']  # set by storage profiles
 
-local_path = get_set_local_dir()
-now = datetime.datetime.now()
 
-log_path = os.path.join(local_path, 'logging')
-if not os.path.isdir(log_path):
-    os.makedirs(log_path)
-
-layout_path = os.path.join(local_path, 'layout')
-if not os.path.isdir(layout_path):
-    os.makedirs(layout_path)
-
-for handler in logging.root.handlers[:]:
-    logging.root.removeHandler(handler)
-logging.basicConfig(filename=os.path.join(log_path, 'bee_action_{}.log'.format(now.strftime('%Y%m%d_%H_%M_%S'))), level=logging.DEBUG)
+class SessionAction(namedtuple('SessionAction', ['session', 'action', 'frame', 'key_ns'], defaults=[-1, None])):
+    """
+    Action of a session (and video frame index, if any, and monotonic time of its key press), waiting for its bee
+    number in the shared BeeNumberEntry
+    """
+    def __str__(self):
+        return f'{self.session.name}: {self.action}'
 
 
 class BeeActions(QObject):
+    """
+    Observation session: chrono, preset shortcuts, h5 file and scans, event log and statistics, with its own background
+    writer. The key dispatcher, bee number entry and preset index are shared by all the sessions of the SessionManager.
+
+    =============== ================ ==========================================================
+    **Parameters**   **Type**         **Description**
+    *dockarea*       DockArea         the dock area of this session
+    *manager*        SessionManager   the manager hosting this session
+    *name*           str              name of the session, used in the dock and journal names
+    =============== ================ ==========================================================
+    """
     log_signal = pyqtSignal(str)
 
-    def __init__(self, dockarea):
+    def __init__(self, dockarea, manager, name='Session01'):
         super().__init__()
         self.dockarea = dockarea
         self.dockarea.dock_signal.connect(self.save_layout_state_auto)
-        self.mainwindow = dockarea.parent()
+        self.manager = manager
+        self.name = name
+        self.mainwindow = manager.mainwindow
         self.chrono = ChronoTimer(dockarea)
+        self.clock = EventClock()  # not installed: the key press times are given by the key dispatcher
         self.author = 'Aurore Avargues'
-        self.h5saver = H5Saver()
-        self.h5saver.new_file_sig.connect(self.create_new_file)
+        self.h5saver = None
+        self.latency = LatencyRecorder()
+        self.statistics = LiveStatistics()
+        self.writer = H5Writer(latency=self.latency)
+        self.writer.status_signal.connect(self.show_writer_status)
+        self.bus = manager.bus
+        self.bus_subscriptions = [
+            self.bus.subscribe(f'{name} writer', self.write_events, maxsize=self.writer.queue_size, policy='block',
+                               block_timeout=None, session=name, backlog_size=100000),
+            self.bus.subscribe(f'{name} display', self.display_events, maxsize=100000, session=name, ui=True)]
+        self.bee_entry = manager.bee_entry
+        self.preset_index = manager.preset_index
         self.settings = None
         self.shortcut_file = None
-        self.shortcuts = []
+        self.shortcut_actions = []
+        self.shortcut_sequences = []
+        self.disabled_actions = set([])
         self.shortcut_manager = ShortCutManager(list_actions)
-        self.timestamp_array = None
-        self.action_array = None
-        self.bee_array = None
+        self.storage = None
+        self.journal = None
+        self.video = None
+        self.scan_video_mode = False  # time reference of the running scan, fixed at its start
+        self.settings_store = SettingsStore()
+        self._setting_profile = False
         self.setup_ui()
 
-    def setup_ui(self):
-        #creating the menubar
-        self.menubar = self.mainwindow.menuBar()
-        self.create_menu(self.menubar)
+    @property
+    def running(self):
+        return self.storage is not None and self.writer.running
 
+    def video_mode(self):
+        """
+        Check if the events are timed by the frames of the loaded video rather than by the chrono. While a scan is
+        running, this is the time reference chosen at its start: a change only applies to the next scan.
+        """
+        if self.running:
+            return self.scan_video_mode
+        return self.video is not None and self.video.loaded and \
+            self.settings.child('settings', 'time_reference').value() == 'video'
+
+    def keyboard_entry(self):
+        """
+        Check if the bee numbers of this session are typed on the keyboard (see BeeNumberEntry)
+        """
+        return self.settings.child('settings', 'save_bee_number').value() and \
+            self.settings.child('settings', 'bee_entry').value() == 'keyboard'
+
+    def setup_ui(self):
         #disconnect normal chrono/timer behaviour with the start button
         self.chrono.start_pb.disconnect()
         self.chrono.start_pb.clicked.connect(self.set_scan)
@@ -71,31 +125,69 @@ class BeeActions(QObject):
 
         self.dock_daq = Dock('Data Acquisition')
         self.dockarea.addDock(self.dock_daq, 'right')
-        self.logger_list = QtWidgets.QListWidget()
+        self.logger_list = EventLogView()
         self.logger_list.setMinimumWidth(300)
         self.dock_daq.addWidget(self.logger_list)
 
+        self.dock_statistics = Dock('Statistics')
+        self.dockarea.addDock(self.dock_statistics, 'right', self.dock_daq)
+        self.statistics_viewer = StatisticsViewer(self.statistics, time_func=self.clock.elapsed_ns)
+        self.dock_statistics.addWidget(self.statistics_viewer)
 
+        self.dock_latency = Dock('Latency')
+        self.dockarea.addDock(self.dock_latency, 'bottom', self.dock_daq)
+        self.latency_viewer = LatencyViewer(self.latency)
+        self.dock_latency.addWidget(self.latency_viewer)
 
         self.init_tree = ParameterTree()
         self.init_tree.setMinimumWidth(300)
         self.init_tree.setMinimumHeight(150)
         self.settings_dock.addWidget(self.init_tree)
-        self.settings_dock.addWidget(self.h5saver.settings_tree)
-        self.h5saver.settings.child(('save_type')).hide()
-        self.h5saver.settings.child(('save_2D')).hide()
-        self.h5saver.settings.child(('save_raw_only')).hide()
-        self.h5saver.settings.child(('do_save')).hide()
-        self.h5saver.settings.child(('custom_name')).hide()
-
 
         self.settings = Parameter.create(name='init_settings', type='group', children=[
             {'title': 'Loaded presets', 'name': 'loaded_files', 'type': 'group', 'children': [
                 {'title': 'Shortcut file', 'name': 'shortcut_file', 'type': 'str', 'value': '', 'readonly': True},
                 {'title': 'Layout file', 'name': 'layout_file', 'type': 'str', 'value': '', 'readonly': True},
+                {'title': 'Video file', 'name': 'video_file', 'type': 'str', 'value': '', 'readonly': True},
                 ]},
             {'title': 'Settings', 'name': 'settings', 'type': 'group', 'children': [
                 {'title': 'Save Bee number', 'name': 'save_bee_number', 'type': 'bool', 'value': True},
+                {'title': 'Bee number entry:', 'name': 'bee_entry', 'type': 'list', 'value': 'keyboard',
+                 'values': ['keyboard', 'dialog'],
+                 'tip': 'keyboard: type the bee number before or after the action shortcut, dialog: ask for it'},
+                {'title': 'Bee entry timeout (ms):', 'name': 'bee_entry_timeout', 'type': 'int', 'value': 1500,
+                 'min': 100},
+                {'title': 'Time reference:', 'name': 'time_reference', 'type': 'list', 'value': 'chrono',
+                 'values': ['chrono', 'video'],
+                 'tip': 'chrono: time of the key press, video: time and index of the displayed video frame'},
+                {'title': 'Storage', 'name': 'storage', 'type': 'group', 'children': [
+                    {'title': 'Storage mode:', 'name': 'storage_mode', 'type': 'list', 'value': 'arrays',
+                     'values': storage_modes},
+                    {'title': 'Profile:', 'name': 'profile', 'type': 'list', 'value': 'default',
+                     'values': list(storage_profiles) + ['custom'],
+                     'tip': 'Chunk size, compression and flush policy (see profiles), custom once modified'},
+                    {'title': 'Events per chunk:', 'name': 'chunk_rows', 'type': 'int', 'value': 4096, 'min': 1,
+                     'tip': 'Chunk size of the arrays or of the events table'},
+                    {'title': 'Compression:', 'name': 'complib', 'type': 'list', 'value': 'zlib',
+                     'values': compression_libraries},
+                    {'title': 'Compression level:', 'name': 'complevel', 'type': 'int', 'value': 5, 'min': 0,
+                     'max': 9},
+                    {'title': 'Index actions/bees:', 'name': 'index', 'type': 'bool', 'value': True,
+                     'tip': 'Index the action and bee columns of the events table (table mode only)'},
+                    ]},
+                {'title': 'Rate window (s):', 'name': 'rate_window', 'type': 'float', 'value': 60., 'min': 1.,
+                 'tip': 'Sliding window used to compute the action rates of the Statistics dock'},
+                {'title': 'Writer', 'name': 'writer', 'type': 'group', 'children': [
+                    {'title': 'Flush every (events):', 'name': 'flush_count', 'type': 'int', 'value': 50, 'min': 1},
+                    {'title': 'Flush interval (ms):', 'name': 'flush_interval', 'type': 'int', 'value': 1000,
+                     'min': 10},
+                    {'title': 'Queue size:', 'name': 'queue_size', 'type': 'int', 'value': 10000, 'min': 1},
+                    {'title': 'Queue depth:', 'name': 'queue_depth', 'type': 'int', 'value': 0, 'readonly': True},
+                    {'title': 'Last flush (ms):', 'name': 'last_flush', 'type': 'float', 'value': 0.,
+                     'readonly': True},
+                    {'title': 'Max flush (ms):', 'name': 'max_flush', 'type': 'float', 'value': 0.,
+                     'readonly': True},
+                    ]},
                 ]},
             {'title': 'Shortcuts', 'name': 'shortcuts', 'type': 'group', 'children': []},
             ])
@@ -122,6 +214,26 @@ class BeeActions(QObject):
         self.dataset_attributes = Parameter.create(name='Attributes', type='group', children=params_dataset)
         self.scan_attributes = Parameter.create(name='Attributes', type='group', children=params_scan)
 
+    def setup_h5saver(self):
+        """
+        Create the H5Saver (importing pymodaq h5modules and PyTables) and add its settings to the settings dock. The
+        files of each session but the first one are saved in a subdirectory named after the session.
+        """
+        if self.h5saver is not None:
+            return
+        from pymodaq.daq_utils.h5modules import H5Saver
+        self.h5saver = H5Saver()
+        self.h5saver.new_file_sig.connect(self.create_new_file)
+        if self.manager.sessions and self.manager.sessions[0] is not self:
+            base_path = self.h5saver.settings.child(('base_path')).value()
+            self.h5saver.settings.child(('base_path')).setValue(os.path.join(base_path, self.name))
+        self.settings_dock.addWidget(self.h5saver.settings_tree)
+        self.h5saver.settings.child(('save_type')).hide()
+        self.h5saver.settings.child(('save_2D')).hide()
+        self.h5saver.settings.child(('save_raw_only')).hide()
+        self.h5saver.settings.child(('do_save')).hide()
+        self.h5saver.settings.child(('custom_name')).hide()
+
     def parameter_tree_changed(self, param, changes):
         """
             | Check eventual changes in the changes list parameter.
@@ -146,47 +258,208 @@ class BeeActions(QObject):
             if change == 'childAdded':
                 pass
             elif change == 'value':
-                if param.name() in custom_tree.iter_children(self.settings.child(('shortcuts')), []):
-                    if param.parent().name() == 'shortcuts':
-                        param_index = custom_tree.iter_children(self.settings.child(('shortcuts')), []).index(param.name())
-                        action = self.shortcut_manager.shortcut_params.child(('actions')).children()[param_index].child(('action')).value()
-                        self.activate_shortcut(self.shortcuts[param_index], action, activate=param.value())
+                if param.name() in profile_settings and not self._setting_profile:
+                    self.settings.child('settings', 'storage', 'profile').setValue('custom')
+                if param.name() == 'bee_entry_timeout':
+                    self.bee_entry.timeout = param.value() / 1000
+                elif param.name() == 'rate_window':
+                    self.statistics.set_window(param.value())
+                elif param.name() == 'profile':
+                    if param.value() != 'custom':
+                        self.set_storage_profile(get_profile(param.value()))
+                elif param.name() == 'flush_count':
+                    self.writer.flush_count = param.value()
+                elif param.name() == 'flush_interval':
+                    self.writer.flush_interval = param.value() / 1000
+                elif param.name() == 'queue_size':
+                    self.writer.queue_size = param.value()
+                elif param.parent() is not None and param.parent().name() == 'shortcuts':
+                    param_index = self.settings.child(('shortcuts')).children().index(param)
+                    self.manager.set_action_enabled(self, param_index, param.value())
 
 
             elif change == 'parent':
                 pass
 
-    def activate_shortcut(self, shortcut, action='', activate=True):
-        if activate:
-            shortcut.activated.connect(
-                self.create_activated_slot(action))
+    def log_data(self, action='', key_ns=None):
+        frame = -1
+        if self.video_mode():
+            now = self.video.current_time_ns()
+            frame = self.video.current_frame
+            if key_ns is None:
+                key_ns = time.monotonic_ns()
         else:
-            try:
-                shortcut.activated.disconnect()
-            except:
-                pass
-
-    def create_activated_slot(self, action):
-        return lambda: self.log_data(action)
-
-    def log_data(self, action=''):
-        now = self.chrono.get_elapsed_time()
+            now = self.clock.event_time(key_ns)
+            key_ns = self.clock.start_ns + now
+            if self.clock.dispatch_ns is not None:
+                self.latency.record('dispatch', self.clock.dispatch_ns)
         if self.settings.child('settings', 'save_bee_number').value():
-            widget = QtWidgets.QWidget()
-            index, res = QtWidgets.QInputDialog.getInt(widget, 'Bee number', 'Pick a number for this bee!')
-            if res:
-                new_item = QtWidgets.QListWidgetItem(f'Elapsed time: {int(now)} s, Bee {index} did :{action}')
-                self.logger_list.insertItem(0, new_item)
-
-                self.h5saver.append(self.action_array, action)
-                self.h5saver.append(self.timestamp_array, np.array([now]))
-                self.h5saver.append(self.bee_array, np.array([index]))
+            if self.bee_entry.enabled and self.keyboard_entry():
+                self.bee_entry.action(now, SessionAction(self, action, frame, key_ns))
+            else:
+                widget = QtWidgets.QWidget()
+                index, res = QtWidgets.QInputDialog.getInt(widget, 'Bee number', 'Pick a number for this bee!')
+                if res:
+                    self.add_event(now, action, index, frame, key_ns)
         else:
-            new_item = QtWidgets.QListWidgetItem(f'Elapsed time: {int(now)} s:{action}')
-            self.logger_list.insertItem(0, new_item)
-            self.h5saver.append(self.action_array, action)
-            self.h5saver.append(self.timestamp_array, np.array([now]))
-        self.h5saver.flush()
+            self.add_event(now, action, frame=frame, key_ns=key_ns)
+
+    def add_event(self, now, action, bee=None, frame=-1, key_ns=None):
+        """
+        Save the event and publish it on the event bus, where it is got by the event log, the live statistics, the
+        background writer and the external subscribers. key_ns is the monotonic time of the key press (or of the
+        reception) of the event, from which its durable latency is measured.
+        """
+        start = time.perf_counter_ns()
+        self.save_event(now, action, bee, frame, key_ns)
+        log_event('event', logging.DEBUG, session=self.name, action=action, bee=-1 if bee is None else bee,
+                  frame=frame, timestamp_ns=now, handling_us=(time.perf_counter_ns() - start) / 1000)
+
+    def save_event(self, now, action, bee=None, frame=-1, key_ns=None):
+        """
+        Journal the event then publish it
+        """
+        if self.journal is not None:
+            self.journal.append(now, self.storage.action_codes[action], -1 if bee is None else bee, frame)
+        wall_ns = None if frame >= 0 or self.clock.start_wall_ns is None else self.clock.wall_ns(now)
+        self.bus.publish(BusEvent(self.name, now, action, bee, frame, wall_ns, key_ns))
+
+    def write_events(self, events):
+        """
+        Queue the published events to the background writer (from the delivery thread of the bus)
+        """
+        for event in events:
+            self.writer.put(Event(event.timestamp, event.action, event.bee, event.frame, event.key_ns))
+
+    def display_events(self, events):
+        """
+        Display the published events and update the live statistics (from the UI thread)
+        """
+        for event in events:
+            self.logger_list.add_event(event.timestamp, event.action, -1 if event.bee is None else event.bee)
+            self.statistics.add_event(event.timestamp, event.action, event.bee)
+
+    def add_external_events(self, events):
+        """
+        Merge into the running scan events received by the ingestion server (see ingest.IngestServer), timed by their
+        wall clock time (or time of reception) or by the video. Events of actions not in the preset or before the start
+        of the scan are rejected.
+
+        Returns
+        -------
+        int: the number of events added
+        """
+        if not self.running:
+            return 0
+        added = 0
+        for wall_ns, action, bee, received_ns in events:
+            if action not in self.storage.action_codes:
+                continue
+            frame = -1
+            if self.video_mode():
+                now = self.video.current_time_ns()
+                frame = self.video.current_frame
+            elif wall_ns is None:
+                now = self.clock.elapsed_ns(received_ns)
+            else:
+                now = self.clock.from_wall_ns(wall_ns)
+            if now is None or now < 0:
+                continue
+            self.add_event(now, action, bee if self.storage.save_bee else None, frame, received_ns)
+            added += 1
+        return added
+
+    def open_video(self):
+        """
+        Open a video file in the Video dock, the logged events being then timed by its frames
+        """
+        try:
+            from beeactions.video import has_cv2, video_extensions
+            if not has_cv2:
+                mssg = QtWidgets.QMessageBox()
+                mssg.setText('OpenCV (cv2) has to be installed to annotate videos')
+                mssg.exec()
+                return
+            if self.running:
+                mssg = QtWidgets.QMessageBox()
+                mssg.setText('A video cannot be opened while a scan is running, stop it first')
+                mssg.exec()
+                return
+            path, _ = QtWidgets.QFileDialog.getOpenFileName(
+                None, 'Open a video', '', 'Videos ({})'.format(' '.join([f'*.{ext}' for ext in video_extensions])))
+            if path == '':
+                return
+            if self.video is None:
+                from beeactions.video import VideoPlayer
+                self.dock_video = Dock('Video')
+                self.dockarea.addDock(self.dock_video, 'left', self.dock_daq)
+                self.video = VideoPlayer()
+                self.dock_video.addWidget(self.video)
+            self.video.open(path)
+            self.settings.child('loaded_files', 'video_file').setValue(path)
+            self.settings.child('settings', 'time_reference').setValue('video')
+        except Exception as e:
+            self.update_status(getLineInfo() + str(e))
+
+    def get_preset_actions(self):
+        """
+        Get the distinct action names of the loaded preset, the index of an action being its code
+        """
+        actions = []
+        for child in self.shortcut_manager.shortcut_params.child(('actions')).children():
+            if child.child(('action')).value() not in actions:
+                actions.append(child.child(('action')).value())
+        return actions
+
+    def start_journal(self):
+        """
+        Create the journal file of the current scan storage
+        """
+        from beeactions.journal import EventJournal, JOURNAL_EXT
+        h5_file = self.h5saver.h5_file.filename
+        scan_group = self.storage.scan_group
+        path = os.path.join(get_local_path('journal'), '{}_{}_{}{}'.format(
+            self.name, os.path.splitext(os.path.split(h5_file)[1])[0], scan_group._v_name, JOURNAL_EXT))
+        self.journal = EventJournal.create(path, h5_file, scan_group._v_pathname, self.storage.actions,
+                                           self.storage.offsets())
+
+    def show_writer_status(self, status):
+        """
+        Display the queue depth and flush timings emitted by the background writer
+        """
+        self.settings.child('settings', 'writer', 'queue_depth').setValue(status['queue_depth'])
+        self.settings.child('settings', 'writer', 'last_flush').setValue(status['last_flush_ms'])
+        self.settings.child('settings', 'writer', 'max_flush').setValue(status['max_flush_ms'])
+        logging.debug(f'H5Writer status: {status}')
+
+    def set_storage_profile(self, profile):
+        """
+        Set the storage settings (chunks, compression and flush policy) to the values of a profiles.StorageProfile
+        """
+        self._setting_profile = True
+        try:
+            storage_settings = self.settings.child('settings', 'storage')
+            storage_settings.child(('chunk_rows')).setValue(profile.chunk_rows)
+            storage_settings.child(('complib')).setValue(profile.complib)
+            storage_settings.child(('complevel')).setValue(profile.complevel)
+            self.settings.child('settings', 'writer', 'flush_count').setValue(profile.flush_count)
+            self.settings.child('settings', 'writer', 'flush_interval').setValue(int(1000 * profile.flush_interval))
+            storage_settings.child(('profile')).setValue(profile.name)
+        finally:
+            self._setting_profile = False
+
+    def storage_profile(self):
+        """
+        Get the StorageProfile of the current storage settings
+        """
+        storage_settings = self.settings.child('settings', 'storage')
+        writer_settings = self.settings.child('settings', 'writer')
+        return StorageProfile(storage_settings.child(('profile')).value(),
+                              storage_settings.child(('chunk_rows')).value(),
+                              storage_settings.child(('complib')).value(),
+                              storage_settings.child(('complevel')).value(),
+                              writer_settings.child(('flush_count')).value(),
+                              writer_settings.child(('flush_interval')).value() / 1000)
 
     def create_shortcuts(self):
         pass
@@ -203,33 +476,55 @@ class BeeActions(QObject):
         """
         try:
             if self.shortcut_file is not None:
+                self.setup_h5saver()
 
                 # set the filename and path
                 res = self.create_new_file(False)
                 if not res:
                     return
 
-                #create the arrays within the current scan group
-                self.timestamp_array = self.h5saver.add_array(self.h5saver.current_scan_group, 'time_axis', 'data',
-                                       scan_type='scan1D', enlargeable=True, array_to_save=np.array([0., ]),
-                                       data_shape=(1,), title='Timestamps',
-                                                metadata=dict(units='seconds'))
-
-                self.action_array = self.h5saver.add_string_array(self.h5saver.current_scan_group, 'actions',
-                                            title='Actions', metadata=dict([]))
-                if self.settings.child('settings', 'save_bee_number').value():
-                    self.bee_array = self.h5saver.add_array(self.h5saver.current_scan_group, 'bees', 'data',
-                                           scan_type='scan1D', enlargeable=True, array_to_save=np.array([0, ]),
-                                            title='Bees', data_shape=(1, ))
+                #create the arrays or table within the current scan group
+                from beeactions.storage import create_storage
+                storage_settings = self.settings.child('settings', 'storage')
+                self.scan_video_mode = self.video_mode()
+                kwargs = dict([])
+                if storage_settings.child(('storage_mode')).value() == 'table':
+                    kwargs = dict(index=storage_settings.child(('index')).value())
+                self.storage = create_storage(storage_settings.child(('storage_mode')).value(), self.h5saver,
+                                              self.h5saver.current_scan_group, self.get_preset_actions(),
+                                              self.settings.child('settings', 'save_bee_number').value(),
+                                              save_frame=self.video_mode(), profile=self.storage_profile(),
+                                              **kwargs)
+                self.start_journal()
+                self.writer.start(self.storage)
+                self.manager.update_bee_entry()
+                self.manager.update_catalog_directories()  # the rescans skip the file of the running scan
 
                 current_filename = self.h5saver.settings.child(('current_scan_name')).value()
                 self.init_tree.setEnabled(False)
                 self.h5saver.settings_tree.setEnabled(False)
-                self.logger_list.clear()
+                self.logger_list.clear(self.storage.actions, self.storage.save_bee)
+                self.statistics.clear(self.storage.actions)
 
                 self.h5saver.current_scan_group._v_attrs['scan_done'] = False
                 # if all metadat steps have been validated, start the chrono
+                self.clock.start()
+                self.latency.reset()
+                self.chrono.duration = timedelta()
                 self.chrono.start()
+                for key, value in self.clock.anchor_attributes().items():
+                    self.h5saver.current_scan_group._v_attrs[key] = value
+                if self.video_mode():
+                    self.h5saver.current_scan_group._v_attrs['time_reference'] = 'video'
+                    self.h5saver.current_scan_group._v_attrs['video_file'] = self.video.decoder.path
+                    self.h5saver.current_scan_group._v_attrs['video_fps'] = self.video.decoder.fps
+                    self.statistics_viewer.time_func = self.video.current_time_ns
+                else:
+                    self.h5saver.current_scan_group._v_attrs['time_reference'] = 'chrono'
+                    self.statistics_viewer.time_func = self.clock.elapsed_ns
+                log_event('scan_start', session=self.name, h5_file=self.h5saver.h5_file.filename,
+                          scan=self.h5saver.current_scan_group._v_pathname, storage_mode=self.storage.mode,
+                          time_reference=self.h5saver.current_scan_group._v_attrs['time_reference'])
 
                 return True
             else:
@@ -242,11 +537,95 @@ class BeeActions(QObject):
         except Exception as e:
             self.update_status(getLineInfo() + str(e))
 
+    def resume_scan(self):
+        """
+        Resume the last scan of the h5 file if it has not been stopped (after a crash for instance): its events are
+        appended to its arrays or table, the chrono restarts from its last event and the log view shows its last
+        events. Only the footer of the scan and its last events are read (see storage.resume_storage).
+        """
+        try:
+            if self.shortcut_file is None:
+                mssg = QtWidgets.QMessageBox()
+                mssg.setText('You have to load a shortcut file configuration before resuming a scan')
+                mssg.exec()
+                return False
+            if self.running:
+                return False
+            self.setup_h5saver()
+            self.h5saver.init_file(update_h5=False)
+            scan_group = self.h5saver.current_scan_group
+            from beeactions.storage import is_unfinished, resume_storage
+            if scan_group is None or not is_unfinished(scan_group):
+                self.update_status(f'{self.name}: no unfinished scan to resume in {self.h5saver.h5_file.filename}')
+                return False
+
+            self.scan_video_mode = self.video_mode()
+            self.storage, tail = resume_storage(self.h5saver, scan_group, self.get_preset_actions())
+            self.start_journal()
+            self.writer.start(self.storage)
+            self.manager.update_bee_entry()
+            self.manager.update_catalog_directories()
+            self.init_tree.setEnabled(False)
+            self.h5saver.settings_tree.setEnabled(False)
+
+            names = self.storage.actions + ['']
+            self.logger_list.clear(self.storage.actions, self.storage.save_bee)
+            for time_ns, code, bee in zip(tail['timestamp'].tolist(), tail['action'].tolist(), tail['bee'].tolist()):
+                self.logger_list.add_event(time_ns, names[code], bee)
+            self.statistics.restore(self.storage.actions, self.storage.action_counts, self.storage.bee_counts, tail)
+
+            attrs = scan_group._v_attrs
+            offset_ns = self.storage.last_timestamp
+            user_attrs = attrs._f_list('user')
+            self.clock.start(offset_ns, int(attrs['start_wall_ns']) if 'start_wall_ns' in user_attrs else None)
+            self.latency.reset()
+            self.chrono.duration = timedelta(microseconds=offset_ns // 1000)
+            self.chrono.start()
+            # piecewise mapping of the event times to the wall clock (see timestamps.to_wall_ns)
+            for key, value in (('resumed_at_ns', offset_ns), ('resumed_wall_ns', self.clock.anchor_wall_ns)):
+                attrs[key] = (list(attrs[key]) if key in user_attrs else []) + [value]
+            if self.video_mode():
+                self.statistics_viewer.time_func = self.video.current_time_ns
+            else:
+                self.statistics_viewer.time_func = self.clock.elapsed_ns
+            log_event('scan_resume', session=self.name, h5_file=self.h5saver.h5_file.filename,
+                      scan=scan_group._v_pathname, storage_mode=self.storage.mode, n_events=self.storage.n_events,
+                      last_timestamp_ns=offset_ns)
+            self.update_status(f'{self.name}: {scan_group._v_name} resumed with {self.storage.n_events} events')
+            return True
+
+        except Exception as e:
+            self.update_status(getLineInfo() + str(e))
+
+    def commit_bee_entry(self):
+        """
+        Save now the action of this session waiting for its bee number, if any
+        """
+        action = self.bee_entry.pending_action()
+        if action is not None and action.session is self:
+            self.bee_entry.commit()
+
     def stop_daq(self):
+        if self.storage is None:
+            return
+        self.commit_bee_entry()
+        self.bus.flush(self.name)
+        self.writer.stop()
+        self.manager.update_bee_entry()
         self.h5saver.current_scan_group._v_attrs['scan_done'] = True
+        self.h5saver.current_scan_group._v_attrs['latency_summary'] = self.latency.summary_json()
+        if self.clock.key_timestamp_offset() is not None:
+            self.h5saver.current_scan_group._v_attrs['key_timestamp_offset_ns'] = self.clock.key_timestamp_offset()
+        log_event('scan_stop', session=self.name, h5_file=self.h5saver.h5_file.filename,
+                  scan=self.h5saver.current_scan_group._v_pathname, writer=self.writer.stats(),
+                  latency=self.latency.summary())
         self.init_tree.setEnabled(True)
         self.h5saver.settings_tree.setEnabled(True)
         self.h5saver.flush()
+        if self.journal is not None:
+            self.journal.close(remove=True)
+            self.journal = None
+        self.manager.index_scan(self.h5saver.current_scan_group)
 
     def update_file_settings(self, new_file=False):
         try:
@@ -334,6 +713,8 @@ class BeeActions(QObject):
 
     def save_metadata(self, node, type_info='dataset_info'):
         """
+        Save the dataset or scan attributes as attributes of node, and the snapshot of the settings in the settings
+        store of the file (see settings_store.SettingsStore)
         """
 
         attr = node._v_attrs
@@ -349,76 +730,23 @@ class BeeActions(QObject):
             else:
                 attr[child.name()] = child.value()
         if type_info == 'dataset_info':
-            #save contents of given parameter object into an xml string under the attribute settings
-            settings_str = b'<All_settings title="All Settings" type="group">'
-            settings_str += custom_tree.parameter_to_xml_string(params)
-            settings_str += custom_tree.parameter_to_xml_string(self.settings)
+            trees = [self.settings]
             if hasattr(self.shortcut_manager, 'shortcut_params'):
-                settings_str += custom_tree.parameter_to_xml_string(self.shortcut_manager.shortcut_params)
-            settings_str += b'</All_settings>'
-
-            attr.settings = settings_str
-
-
-        elif type_info=='scan_info':
-            settings_str = b'<All_settings title="All Settings" type="group">' + \
-                           custom_tree.parameter_to_xml_string(params) + \
-                           custom_tree.parameter_to_xml_string(self.settings) + \
-                           custom_tree.parameter_to_xml_string(self.h5saver.settings) + b'</All_settings>'
-
-            attr.settings = settings_str
-
-
-
-    def show_log(self):
-        import webbrowser
-        webbrowser.open(logging.getLoggerClass().root.handlers[0].baseFilename)
+                trees.append(self.shortcut_manager.shortcut_params)
+        else:
+            trees = [self.settings, self.h5saver.settings]
+        self.settings_store.save(node, trees)
 
     def show_file(self):
-        self.h5saver.flush()
-        self.h5saver.show_file_content()
-
-    def create_menu(self, menubar):
-        menubar.clear()
-
-        # %% create Settings menu
-        self.file_menu = menubar.addMenu('File')
-        self.file_menu.addAction('Show log file', self.show_log)
-        self.file_menu.addAction('Show data file', self.show_file)
-
-        self.file_menu.addSeparator()
-        quit_action = self.file_menu.addAction('Quit')
-        quit_action.triggered.connect(self.quit_fun)
-
-        self.settings_menu = menubar.addMenu('Settings')
-        docked_menu = self.settings_menu.addMenu('Docked windows')
-        action_load = docked_menu.addAction('Load Layout')
-        action_save = docked_menu.addAction('Save Layout')
-
-        action_load.triggered.connect(self.load_layout_state)
-        action_save.triggered.connect(self.save_layout_state)
-        docked_menu.addSeparator()
-
-        self.preset_menu = menubar.addMenu('Preset Shortcuts')
-        action_new_preset = self.preset_menu.addAction('New preset')
-        # action.triggered.connect(lambda: self.show_file_attributes(type_info='preset'))
-        action_new_preset.triggered.connect(self.create_preset)
-        action_modify_preset = self.preset_menu.addAction('Modify preset')
-        action_modify_preset.triggered.connect(self.modify_shortcuts)
-        self.preset_menu.addSeparator()
-        load_preset = self.preset_menu.addMenu('Load presets')
-
-        slots = dict([])
-        for ind_file, file in enumerate(os.listdir(shortcut_path)):
-            if file.endswith(".xml"):
-                (filesplited, ext) = os.path.splitext(file)
-                slots[filesplited] = load_preset.addAction(filesplited)
-                slots[filesplited].triggered.connect(
-                    self.create_menu_slot(os.path.join(shortcut_path, file)))
+        if self.h5saver is None:
+            return
+        with self.writer.lock:
+            self.h5saver.flush()
+            self.h5saver.show_file_content()
 
     def modify_shortcuts(self):
         try:
-            path = select_file(start_path=shortcut_path, save=False, ext='xml')
+            path = select_file(start_path=get_shortcut_path(), save=False, ext='xml')
             if path != '':
                 self.shortcut_manager.set_file_preset(str(path))
 
@@ -426,77 +754,90 @@ class BeeActions(QObject):
                 mssg.setText(f'You have to restart the application to take the modifications into account! '
                              f'Quitting the application...')
                 mssg.exec()
-                self.quit_fun()
+                self.manager.quit_fun()
             else:  # cancel
                 pass
         except Exception as e:
             self.update_status(getLineInfo() + str(e))
 
-    def create_menu_slot(self, filename):
-        return lambda: self.set_shortcut_mode(filename)
-
     def set_shortcut_mode(self, filename):
         #TODO: apply shortcuts to this widget
         tail, fileext = os.path.split(filename)
         file, ext = os.path.splitext(fileext)
         if ext == '.xml':
+            if self.running:
+                # the actions of the running scan (storage, journal) are fixed at its start
+                mssg = QtWidgets.QMessageBox()
+                mssg.setText('A preset cannot be loaded while a scan is running, stop it first')
+                mssg.exec()
+                return
             self.shortcut_file = filename
-            self.shortcut_manager.set_file_preset(filename, show=False)
+            preset = self.preset_index.get(filename)
+            self.shortcut_manager.set_file_preset(filename, show=False, children=preset.children)
             self.settings.child('loaded_files', 'shortcut_file').setValue(filename)
             self.author = self.shortcut_manager.shortcut_params.child(('author')).value()
+            saving_options = self.shortcut_manager.shortcut_params.child(('saving_options'))
+            if 'storage_profile' in saving_options.names:
+                self.set_storage_profile(get_profile(saving_options.child(('storage_profile')).value()))
             self.dataset_attributes.child('dataset_info', 'author').setValue(self.author)
             self.scan_attributes.child('scan_info', 'author').setValue(self.author)
 
-            path = os.path.join(layout_path, file + '.dock')
-            if os.path.isfile(path):
-                self.load_layout_state(path)
+            for path in (self.layout_path(), self.layout_path(session=False)):  # layouts saved before by preset only
+                if os.path.isfile(path):
+                    self.load_layout_state(path)
+                    break
 
-            #remove existing shorcuts
-            while len(self.shortcuts):
-                self.shortcuts.pop(0)
+            #replace the existing shortcuts by the ones of the preset (action id: index in the preset)
+            actions = self.shortcut_manager.shortcut_params.child(('actions')).children()
+            self.shortcut_actions = [shortcut.child(('action')).value() for shortcut in actions]
+            self.shortcut_sequences = [shortcut.child(('shortcut')).value() for shortcut in actions]
+            self.disabled_actions = set([])
+            self.manager.update_bindings()
 
-            for ind, shortcut in enumerate(self.shortcut_manager.shortcut_params.child(('actions')).children()):
-                stc = QtWidgets.QShortcut(QtGui.QKeySequence(shortcut.child(('shortcut')).value()), self.dockarea)
+            self.settings.child(('shortcuts')).clearChildren()
+            for ind, shortcut in enumerate(actions):
                 self.settings.child(('shortcuts')).addChild(
                     {'title': f"Shortcut{ind:02d}: {shortcut.child(('action')).value()} {shortcut.child(('shortcut')).value()}:",
                      'name': f'shortcut{ind:02d}', 'type': 'led_push', 'value': True})
 
-                self.shortcuts.append(stc)
-                self.activate_shortcut(stc, shortcut.child(('action')).value(), activate=True)
-
 
 
     def create_preset(self):
         try:
             self.shortcut_manager.set_new_preset()
-            self.create_menu(self.menubar)
+            self.preset_index.refresh()
         except Exception as e:
             self.update_status(getLineInfo() + str(e))
 
     def save_layout_state(self, file = None):
         """
-            Save the current layout state in the select_file obtained pathname file.
-            Once done dump the pickle.
+            Save the current layout state in the select_file obtained pathname file (see layout_store.LayoutStore).
 
             See Also
             --------
             utils.select_file
         """
         try:
-            dockstate = self.dockarea.saveState()
             if file is None:
                 file = select_file(start_path=None, save=True, ext='dock')
-            if file is not None:
-                with open(str(file), 'wb') as f:
-                    pickle.dump(dockstate, f, pickle.HIGHEST_PROTOCOL)
-        except: pass
+            if file is not None and str(file) != '':
+                self.manager.layout_store.save(str(file), self.dockarea.saveState())
+        except Exception as e:
+            self.update_status(getLineInfo() + str(e))
+
+    def layout_path(self, session=True):
+        """
+        Path of the layout automatically saved with the loaded preset, by session so that sessions using the same
+        preset keep their own layout
+        """
+        file = os.path.splitext(os.path.split(self.shortcut_file)[1])[0]
+        if session:
+            file = f'{file}_{self.name}'
+        return os.path.join(get_local_path('layout'), file + '.dock')
 
     def save_layout_state_auto(self):
         if self.shortcut_file is not None:
-            file = os.path.split(self.shortcut_file)[1]
-            file = os.path.splitext(file)[0]
-            path = os.path.join(layout_path, file+'.dock')
-            self.save_layout_state(path)
+            self.manager.layout_store.schedule(self.layout_path(), self.dockarea.saveState)
 
     def load_layout_state(self, file=None):
         """
@@ -509,13 +850,416 @@ class BeeActions(QObject):
         try:
             if file is None:
                 file = select_file(save=False, ext='dock')
-            if file is not None:
-                with open(str(file), 'rb') as f:
-                    dockstate = pickle.load(f)
-                    self.dockarea.restoreState(dockstate)
-            file = os.path.split(file)[1]
-            self.settings.child('loaded_files', 'layout_file').setValue(file)
-        except: pass
+            if file is not None and str(file) != '':
+                self.dockarea.restoreState(self.manager.layout_store.load(str(file)))
+                self.settings.child('loaded_files', 'layout_file').setValue(os.path.split(str(file))[1])
+        except Exception as e:
+            self.update_status(getLineInfo() + str(e))
+
+    def close(self):
+        """
+        Stop the scan of this session, writing the queued events, and close its journal
+        """
+        try:
+            self.commit_bee_entry()
+            self.bus.flush(self.name)
+            self.writer.stop()
+            for subscription in self.bus_subscriptions:
+                self.bus.unsubscribe(subscription)
+            self.manager.layout_store.commit()  # get the pending layout state while the docks exist
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            if self.video is not None:
+                self.video.close_video()
+        except Exception as e:
+            self.update_status(getLineInfo() + str(e))
+
+    def update_status(self, txt, wait_time=0, log_type=None):
+        """
+            Show the txt message in the status bar with a delay of wait_time ms and log it as a structured record.
+
+            =============== =========== =======================
+            **Parameters**    **Type**    **Description**
+            *txt*             string      The message to show
+            *wait_time*       int         the delay of showing
+            *log_type*        string      the type of the log ('info' or 'error', default: 'error' if called
+                                          while handling an exception)
+            =============== =========== =======================
+        """
+        try:
+            if log_type is None:
+                log_type = 'error' if sys.exc_info()[0] is not None else 'info'
+            self.log_signal.emit(txt)
+            log_event('status', logging.ERROR if log_type == 'error' else logging.INFO, session=self.name,
+                      status=txt, log_type=log_type)
+
+        except Exception as e:
+            pass
+
+
+
+class SessionManager(QObject):
+    """
+    Host of several independent observation sessions (see BeeActions) in one main window, each within its own dock.
+
+    The sessions share the key dispatcher (the shortcuts of all the loaded presets are dispatched to their session),
+    the bee number entry, the preset index and the HDF5 stack, loaded once the window has been painted. The menus act
+    on the current session, selected from the Sessions menu.
+    """
+    def __init__(self, dockarea):
+        super().__init__()
+        self.dockarea = dockarea
+        self.mainwindow = dockarea.parent()
+        self.sessions = []
+        self.current = None
+        self.bindings = []
+        self.h5_loaded = False
+        self._session_index = 0
+
+        self.bee_entry = BeeNumberEntry()
+        self.bee_entry.event_signal.connect(self.add_entry_event)
+        self.dispatcher = KeyDispatcher()
+        self.dispatcher.activated_signal.connect(self.dispatch_action)
+        self.dispatcher.set_enabled(True)
+        self.bee_entry.set_dispatcher(self.dispatcher)
+        self.preset_index = PresetIndex(get_shortcut_path(), os.path.join(get_local_path('cache'), 'preset_index.pkl'))
+        self.preset_index.changed_signal.connect(self.update_preset_menu)
+        self.layout_store = LayoutStore()
+        self.layout_store.error_signal.connect(lambda txt: self.update_status(txt, log_type='error'))
+        self.catalog = None
+        self.catalog_scanner = None
+        self.ingest_server = None
+        self.ingest_session = None  # the session the ingested events are merged into
+        self.bus = EventBus()
+        self.bus.error_signal.connect(lambda txt: self.update_status(txt, log_type='error'))
+        self.bus.start()
+        self.bus_server = None
+
+        self.pending_label = QtWidgets.QLabel()
+        self.mainwindow.statusBar().addPermanentWidget(self.pending_label)
+        self.bee_entry.pending_signal.connect(self.pending_label.setText)
+        self.dispatcher.sequence_signal.connect(self.pending_label.setText)
+
+        self.menubar = self.mainwindow.menuBar()
+        self.create_menu(self.menubar)
+        self.new_session()
+        # the HDF5 stack is only loaded once the window has been painted
+        self.mainwindow.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if obj is self.mainwindow and event.type() == QtCore.QEvent.Paint:
+            self.mainwindow.removeEventFilter(self)
+            QTimer.singleShot(0, self.setup_deferred)
+        return False
+
+    def setup_deferred(self):
+        """
+        Load what is not needed to display the window (the HDF5 stack) and replay the pending journals
+        """
+        try:
+            for session in self.sessions:
+                session.setup_h5saver()
+            self.h5_loaded = True
+            self.recover_journals()
+            self.setup_catalog()
+        except Exception as e:
+            self.update_status(getLineInfo() + str(e))
+
+    def recover_journals(self):
+        """
+        Replay in their h5 file the journals of the scans that have not been properly stopped
+        """
+        journal_path = get_local_path('journal')
+        if not any([file.endswith('.bjl') for file in os.listdir(journal_path)]):
+            return
+        from beeactions.journal import replay_journals
+        for path, recovered in replay_journals(journal_path):
+            self.update_status(f'Journal {path} replayed: {recovered} events recovered')
+
+    def setup_catalog(self):
+        """
+        Open the catalog of the h5 files and start the background rescan of the data directories
+        """
+        from beeactions.catalog import Catalog, CatalogScanner
+        self.catalog = Catalog()
+        self.catalog_scanner = CatalogScanner(self.catalog.path)
+        self.catalog_scanner.scanned_signal.connect(
+            lambda indexed, removed: self.update_status(f'Catalog: {indexed} files indexed, {removed} removed'))
+        self.catalog_scanner.error_signal.connect(lambda txt: self.update_status(txt, log_type='error'))
+        self.update_catalog_directories()
+        self.catalog_scanner.start()
+
+    def update_catalog_directories(self):
+        if self.catalog_scanner is not None:
+            self.catalog_scanner.set_directories(sorted(set([
+                session.h5saver.settings.child(('base_path')).value() for session in self.sessions
+                if session.h5saver is not None])))
+            self.catalog_scanner.set_open_files([
+                session.h5saver.h5_file.filename for session in self.sessions
+                if session.h5saver is not None and session.h5saver.h5_file is not None and
+                session.h5saver.h5_file.isopen])
+
+    def rescan_catalog(self):
+        if self.catalog_scanner is not None:
+            self.update_catalog_directories()
+            self.catalog_scanner.rescan()
+
+    def index_scan(self, scan_group):
+        """
+        Update the catalog with a stopped scan
+        """
+        if self.catalog is None:
+            return
+        try:
+            self.catalog.index_scan(scan_group)
+        except Exception as e:
+            self.update_status(getLineInfo() + str(e))
+
+    def show_catalog(self):
+        if self.catalog is None:
+            self.update_status('The catalog is opened once the HDF5 modules are loaded')
+            return
+        from beeactions.catalog import CatalogDialog
+        dialog = CatalogDialog(self.catalog, self.current.shortcut_actions, parent=self.mainwindow)
+        dialog.exec()
+
+    def set_ingest_enabled(self, enabled=True, address=None):
+        """
+        Start or stop the server merging the events of automated sources into the running scan of the current session
+        (see ingest). The server stays bound to this session until it is stopped.
+        """
+        from beeactions.ingest import IngestServer, default_address
+        try:
+            if enabled:
+                if self.ingest_server is None:
+                    self.ingest_server = IngestServer(self.ingest_events, address or default_address)
+                    self.ingest_server.error_signal.connect(lambda txt: self.update_status(txt, log_type='error'))
+                elif address is not None:
+                    self.ingest_server.address = address
+                if not self.ingest_server.running:
+                    self.ingest_session = self.current
+                self.ingest_server.start()
+                self.update_status(f'Ingestion server listening on {self.ingest_server.address} for '
+                                   f'{self.ingest_session.name}')
+            elif self.ingest_server is not None and self.ingest_server.running:
+                self.ingest_server.stop()
+                self.ingest_session = None
+                log_event('ingest_stop', **self.ingest_server.stats())
+                self.update_status('Ingestion server stopped')
+        except Exception as e:
+            self.update_status(getLineInfo() + str(e))
+        self.ingest_action.setChecked(self.ingest_server is not None and self.ingest_server.running)
+
+    def set_bus_server_enabled(self, enabled=True, address=None):
+        """
+        Start or stop the server streaming the published events to external subscribers (see event_bus)
+        """
+        from beeactions.event_bus import BusServer, default_address
+        try:
+            if enabled:
+                if self.bus_server is None:
+                    self.bus_server = BusServer(self.bus, address or default_address)
+                elif address is not None:
+                    self.bus_server.address = address
+                self.bus_server.start()
+                self.update_status(f'Event bus server listening on {self.bus_server.address}')
+            elif self.bus_server is not None and self.bus_server.running:
+                self.bus_server.stop()
+                self.update_status('Event bus server stopped')
+        except Exception as e:
+            self.update_status(getLineInfo() + str(e))
+        self.bus_server_action.setChecked(self.bus_server is not None and self.bus_server.running)
+
+    def ingest_events(self, events):
+        """
+        Merge received events into the running scan of the session the ingestion server is bound to
+        """
+        if self.ingest_session is None:
+            return 0
+        return self.ingest_session.add_external_events(events)
+
+    def new_session(self):
+        """
+        Add a session in its own dock and make it the current session
+        """
+        self._session_index += 1
+        name = f'Session{self._session_index:02d}'
+        dock = Dock(name)
+        self.dockarea.addDock(dock, 'right' if self.sessions else 'top')
+        area = DockArea()
+        dock.addWidget(area)
+        session = BeeActions(area, self, name)
+        session.dock = dock
+        session.log_signal.connect(self.show_status)
+        if self.h5_loaded:
+            session.setup_h5saver()
+        self.sessions.append(session)
+        self.update_catalog_directories()
+
+        action = self.session_menu.addAction(name)
+        action.setCheckable(True)
+        self.session_group.addAction(action)
+        action.triggered.connect(self.create_session_slot(session))
+        session.menu_action = action
+        self.set_current(session)
+        return session
+
+    def create_session_slot(self, session):
+        return lambda: self.set_current(session)
+
+    def set_current(self, session):
+        self.current = session
+        session.menu_action.setChecked(True)
+        self.mainwindow.setWindowTitle(f'BeeAction - {session.name}')
+
+    def close_session(self):
+        """
+        Close the current session, unless it is the only one or a scan is running
+        """
+        session = self.current
+        if len(self.sessions) == 1 or session.running:
+            mssg = QtWidgets.QMessageBox()
+            mssg.setText('The only session or a session with a running scan cannot be closed')
+            mssg.exec()
+            return
+        if session is self.ingest_session:
+            self.set_ingest_enabled(False)
+        session.close()
+        self.sessions.remove(session)
+        self.session_group.removeAction(session.menu_action)
+        self.session_menu.removeAction(session.menu_action)
+        session.dock.close()
+        self.update_bindings()
+        self.update_catalog_directories()
+        self.set_current(self.sessions[-1])
+
+    def update_bindings(self):
+        """
+        Bind the shortcuts of the presets loaded in all the sessions, a shortcut used in several sessions being only
+        bound to the first one
+        """
+        self.bindings = []
+        sequences = []
+        for session in self.sessions:
+            for action_id, sequence in enumerate(session.shortcut_sequences):
+                self.bindings.append((session, action_id))
+                sequences.append(sequence)
+        conflicts = self.dispatcher.set_bindings(sequences)
+        for ind in conflicts:
+            session, action_id = self.bindings[ind]
+            self.update_status(f'{session.name}: shortcut {sequences[ind]} of {session.shortcut_actions[action_id]} '
+                               f'is already used by another action')
+        for ind, (session, action_id) in enumerate(self.bindings):
+            if action_id in session.disabled_actions:
+                self.dispatcher.set_action_enabled(ind, False)
+        self.bee_entry.set_reserved_keys(self.dispatcher.first_keys())
+
+    def set_action_enabled(self, session, action_id, enabled=True):
+        if enabled:
+            session.disabled_actions.discard(action_id)
+        else:
+            session.disabled_actions.add(action_id)
+        if (session, action_id) in self.bindings:
+            self.dispatcher.set_action_enabled(self.bindings.index((session, action_id)), enabled)
+
+    def dispatch_action(self, action_id, key_ns):
+        session, session_action_id = self.bindings[action_id]
+        session.log_data(session.shortcut_actions[session_action_id], key_ns)
+
+    def add_entry_event(self, now, session_action, bee):
+        session_action.session.add_event(now, session_action.action, bee, session_action.frame, session_action.key_ns)
+
+    def update_bee_entry(self):
+        """
+        Capture the bee numbers typed on the keyboard if a running session uses the keyboard entry
+        """
+        self.bee_entry.set_enabled(any([session.running and session.keyboard_entry() for session in self.sessions]))
+
+    def show_log(self, directory=False):
+        import webbrowser
+        if directory:
+            webbrowser.open(get_local_path('logging'))
+        elif log_file() is not None:
+            webbrowser.open(log_file())
+
+    def create_menu(self, menubar):
+        menubar.clear()
+
+        # %% create Settings menu
+        self.file_menu = menubar.addMenu('File')
+        self.file_menu.addAction('Show log file', self.show_log)
+        self.file_menu.addAction('Show log directory', lambda: self.show_log(directory=True))
+        self.file_menu.addAction('Show data file', lambda: self.current.show_file())
+        self.file_menu.addAction('Resume last scan', lambda: self.current.resume_scan())
+        self.file_menu.addAction('Open video...', lambda: self.current.open_video())
+        self.file_menu.addSeparator()
+        self.file_menu.addAction('Search catalog...', self.show_catalog)
+        self.file_menu.addAction('Rescan data directories', self.rescan_catalog)
+        self.ingest_action = self.file_menu.addAction('Ingestion server')
+        self.ingest_action.setCheckable(True)
+        self.ingest_action.triggered.connect(self.set_ingest_enabled)
+        self.bus_server_action = self.file_menu.addAction('Event bus server')
+        self.bus_server_action.setCheckable(True)
+        self.bus_server_action.triggered.connect(self.set_bus_server_enabled)
+
+        self.file_menu.addSeparator()
+        quit_action = self.file_menu.addAction('Quit')
+        quit_action.triggered.connect(self.quit_fun)
+
+        self.session_menu = menubar.addMenu('Sessions')
+        self.session_menu.addAction('New session', self.new_session)
+        self.session_menu.addAction('Close session', self.close_session)
+        self.session_menu.addSeparator()
+        self.session_group = QtWidgets.QActionGroup(self.session_menu)
+
+        self.settings_menu = menubar.addMenu('Settings')
+        docked_menu = self.settings_menu.addMenu('Docked windows')
+        action_load = docked_menu.addAction('Load Layout')
+        action_save = docked_menu.addAction('Save Layout')
+
+        action_load.triggered.connect(lambda: self.current.load_layout_state())
+        action_save.triggered.connect(lambda: self.current.save_layout_state())
+        docked_menu.addSeparator()
+
+        self.preset_menu = menubar.addMenu('Preset Shortcuts')
+        action_new_preset = self.preset_menu.addAction('New preset')
+        # action.triggered.connect(lambda: self.show_file_attributes(type_info='preset'))
+        action_new_preset.triggered.connect(lambda: self.current.create_preset())
+        action_modify_preset = self.preset_menu.addAction('Modify preset')
+        action_modify_preset.triggered.connect(lambda: self.current.modify_shortcuts())
+        self.preset_menu.addSeparator()
+        self.load_preset_menu = self.preset_menu.addMenu('Load presets')
+        self.load_preset_menu.setToolTipsVisible(True)
+        self.preset_actions = dict([])
+        self.update_preset_menu(list(self.preset_index.presets.values()), [])
+
+    def update_preset_menu(self, updated, removed):
+        """
+        Update only the entries of the Load presets menu of the updated (PresetInfo list) and removed (paths) presets
+        """
+        for path in removed:
+            action = self.preset_actions.pop(path, None)
+            if action is not None:
+                self.load_preset_menu.removeAction(action)
+        for info in updated:
+            if info.path not in self.preset_actions:
+                action = QtWidgets.QAction(info.name, self.load_preset_menu)
+                action.triggered.connect(self.create_menu_slot(info.path))
+                names = self.preset_index.names()
+                index = names.index((info.name, info.path))
+                before = None
+                for name, path in names[index + 1:]:
+                    if path in self.preset_actions:
+                        before = self.preset_actions[path]
+                        break
+                self.load_preset_menu.insertAction(before, action)
+                self.preset_actions[info.path] = action
+            self.preset_actions[info.path].setToolTip(
+                f'{info.author}: ' + ', '.join([f'{action} ({shortcut})' for action, shortcut in info.actions]))
+
+    def create_menu_slot(self, filename):
+        return lambda: self.current.set_shortcut_mode(filename)
 
     def quit_fun(self):
         """
@@ -526,7 +1270,22 @@ class BeeActions(QObject):
             quit_fun
         """
         try:
+            self.dispatcher.set_enabled(False)
+            self.bee_entry.set_enabled(False)
+            for session in self.sessions:
+                session.close()
+            self.layout_store.close()
+            self.set_ingest_enabled(False)
+            self.set_bus_server_enabled(False)
+            log_event('bus_stop', **self.bus.stats())
+            self.bus.stop()
+            if self.catalog_scanner is not None:
+                self.catalog_scanner.stop()
+                self.catalog.close()
+
             areas = self.dockarea.tempAreas[:]
+            for session in self.sessions:
+                areas.extend(session.dockarea.tempAreas)
             for area in areas:
                 area.win.close()
                 QtWidgets.QApplication.processEvents()
@@ -539,32 +1298,35 @@ class BeeActions(QObject):
         except Exception as e:
             pass
 
-    def update_status(self, txt):
-        """
-            Show the txt message in the status bar with a delay of wait_time ms.
-
-            =============== =========== =======================
-            **Parameters**    **Type**    **Description**
-            *txt*             string      The message to show
-            *wait_time*       int         the delay of showing
-            *log_type*        string      the type of the log
-            =============== =========== =======================
-        """
-        try:
-            self.log_signal.emit(txt)
-            logging.info(txt)
+    def show_status(self, txt):
+        self.mainwindow.statusBar().showMessage(txt, 10000)
 
-        except Exception as e:
-            pass
+    def update_status(self, txt, log_type=None):
+        if log_type is None:
+            log_type = 'error' if sys.exc_info()[0] is not None else 'info'
+        self.show_status(txt)
+        log_event('status', logging.ERROR if log_type == 'error' else logging.INFO, status=txt, log_type=log_type)
 
 
 if __name__ == '__main__':
-    app = QtWidgets.QApplication(sys.argv)
+    import argparse
+    parser = argparse.ArgumentParser(prog='python -m beeactions.main')
+    parser.add_argument('--ingest', nargs='?', const='', default=None, metavar='ADDRESS',
+                        help='start the ingestion server of automated event sources (host:port or Unix socket path)')
+    parser.add_argument('--bus', nargs='?', const='', default=None, metavar='ADDRESS',
+                        help='start the server streaming the logged events (host:port or Unix socket path)')
+    options, qt_args = parser.parse_known_args()
+    setup_logging(get_local_path('logging'))
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
     win = QtWidgets.QMainWindow()
     win.setVisible(False)
     area = DockArea()
     win.setCentralWidget(area)
     win.setWindowTitle('BeeAction')
-    prog = BeeActions(area)
+    prog = SessionManager(area)
+    if options.ingest is not None:
+        prog.set_ingest_enabled(True, options.ingest or None)
+    if options.bus is not None:
+        prog.set_bus_server_enabled(True, options.bus or None)
     win.show()
     sys.exit(app.exec_())
\ No newline at end of file
@@ -0,0 +1,23 @@
+"""
+Local directories used by BeeActions (presets, layouts, logs, journals...). They are located within the pymodaq
+local directory and created on first use rather than when importing modules.
+"""
+import os
+
+_paths = dict([])
+
+
+def get_local_path(name=None):
+    """
+    Get the path of the BeeActions local directory called name (the pymodaq local directory if name is None),
+    creating it if needed
+    """
+    if None not in _paths:
+        from pymodaq.daq_utils.daq_utils import get_set_local_dir
+        _paths[None] = get_set_local_dir()
+    if name not in _paths:
+        path = os.path.join(_paths[None], name)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        _paths[name] = path
+    return _paths[name]
@@ -0,0 +1,152 @@
+import os
+import pickle
+import logging
+from collections import namedtuple
+
+from PyQt5.QtCore import QObject, pyqtSignal, QFileSystemWatcher
+
+
+PresetInfo = namedtuple('PresetInfo', ['name', 'path', 'mtime', 'author', 'actions', 'children'])
+PresetInfo.__doc__ = """
+Parsed preset file: name (file name without extension), path, modification time, author, list of (action, shortcut)
+and the parameter children parsed from the xml file (None if not parsed yet)
+"""
+
+index_version = 1
+
+
+def find_child(children, name):
+    for child in children:
+        if child['name'] == name:
+            return child
+    return None
+
+
+def parse_preset(path, mtime=None):
+    """
+    Parse a preset xml file into a PresetInfo
+    """
+    from pymodaq.daq_utils import custom_parameter_tree as custom_tree
+    if mtime is None:
+        mtime = os.stat(path).st_mtime_ns
+    children = custom_tree.XML_file_to_parameter(path)
+    author = find_child(children, 'author')
+    actions = []
+    group = find_child(children, 'actions')
+    if group is not None:
+        for child in group.get('children', []):
+            action = find_child(child.get('children', []), 'action')
+            shortcut = find_child(child.get('children', []), 'shortcut')
+            actions.append((action['value'] if action is not None else '',
+                            shortcut['value'] if shortcut is not None else ''))
+    return PresetInfo(os.path.splitext(os.path.split(path)[1])[0], path, mtime,
+                      author['value'] if author is not None else '', actions, children)
+
+
+class PresetIndex(QObject):
+    """
+    Index of the preset files of a directory, keyed by path and modification time.
+
+    The parsed content of each preset (author, actions and shortcuts, parameter children) is cached in memory and
+    persisted in the local cache directory, so that a preset is parsed again only if its file has been modified. A
+    QFileSystemWatcher keeps the index up to date: only the added, modified or removed presets are refreshed and
+    reported by changed_signal.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *directory*      str         the directory holding the preset xml files
+    *cache_file*     str         file where the index is persisted (None to not persist it)
+    =============== =========== ==========================================================
+    """
+    changed_signal = pyqtSignal(list, list)  # updated presets (PresetInfo), removed paths
+
+    def __init__(self, directory, cache_file=None):
+        super().__init__()
+        self.directory = directory
+        self.cache_file = cache_file
+        self.presets = dict([])
+        self.load_cache()
+        self.watcher = QFileSystemWatcher()
+        self.watcher.addPath(directory)
+        self.watcher.directoryChanged.connect(self.refresh)
+        self.watcher.fileChanged.connect(self.refresh)
+        self.refresh()
+
+    def load_cache(self):
+        if self.cache_file is None or not os.path.isfile(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'rb') as f:
+                version, presets = pickle.load(f)
+            if version == index_version:
+                self.presets = dict([(path, PresetInfo(*info)) for path, info in presets.items()])
+        except Exception as e:
+            logging.warning(f'Preset index cache {self.cache_file} ignored: {str(e)}')
+
+    def save_cache(self):
+        if self.cache_file is None:
+            return
+        try:
+            with open(self.cache_file, 'wb') as f:
+                pickle.dump((index_version, dict([(path, tuple(info)) for path, info in self.presets.items()])), f,
+                            pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logging.warning(f'Preset index cache {self.cache_file} not saved: {str(e)}')
+
+    def scan(self):
+        """
+        Get the paths and modification times of the preset files of the directory
+        """
+        files = dict([])
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.xml') and entry.is_file():
+                    files[entry.path] = entry.stat().st_mtime_ns
+        return files
+
+    def refresh(self, *args):
+        """
+        Update the index with the presets added, modified or removed since the last refresh (only these presets are
+        parsed) and emit changed_signal if any
+        """
+        files = self.scan()
+        removed = [path for path in self.presets if path not in files]
+        updated = []
+        for path in removed:
+            self.presets.pop(path)
+        for path, mtime in files.items():
+            if path not in self.presets or self.presets[path].mtime != mtime:
+                try:
+                    self.presets[path] = parse_preset(path, mtime)
+                except Exception as e:
+                    logging.warning(f'Preset {path} could not be parsed: {str(e)}')
+                    self.presets[path] = PresetInfo(os.path.splitext(os.path.split(path)[1])[0], path, mtime, '',
+                                                    [], None)
+                updated.append(self.presets[path])
+        watched = set(self.watcher.files())
+        new_files = [path for path in files if path not in watched]
+        if new_files:
+            self.watcher.addPaths(new_files)
+        if updated or removed:
+            self.save_cache()
+            self.changed_signal.emit(updated, removed)
+
+    def get(self, path):
+        """
+        Get the PresetInfo of a preset file, parsing the file only if it is not indexed or has been modified
+        """
+        path = os.path.join(self.directory, path) if not os.path.isabs(path) else path
+        mtime = os.stat(path).st_mtime_ns
+        info = self.presets.get(path, None)
+        if info is None or info.mtime != mtime or info.children is None:
+            info = parse_preset(path, mtime)
+            self.presets[path] = info
+            self.save_cache()
+        return info
+
+    def names(self):
+        """
+        Get the sorted (name, path) of the indexed presets
+        """
+        return sorted([(info.name, path) for path, info in self.presets.items()])
+
@@ -0,0 +1,44 @@
+"""
+Storage profiles: chunk size and compression of the nodes created for each scan, and flush policy of the writer.
+
+A profile is selected in the 'saving_options' of a preset (storage_profile) or in the Storage settings of a session,
+where its values can then be modified (the profile becomes 'custom').
+"""
+import logging
+from collections import OrderedDict, namedtuple
+
+StorageProfile = namedtuple('StorageProfile', ['name', 'chunk_rows', 'complib', 'complevel', 'flush_count',
+                                               'flush_interval'])
+StorageProfile.__doc__ = """
+Storage profile: name, number of events per chunk, compression library (one of compression_libraries) and level (0 for
+no compression), number of events and maximum time (in s) between two flushes
+"""
+
+compression_libraries = ['zlib', 'blosc:lz4', 'blosc:zstd', 'blosc:blosclz']
+
+storage_profiles = OrderedDict([
+    ('default', StorageProfile('default', 4096, 'zlib', 5, 50, 1.)),
+    ('durable', StorageProfile('durable', 512, 'zlib', 1, 1, 0.1)),
+    ('fast', StorageProfile('fast', 16384, 'blosc:lz4', 1, 500, 5.)),
+    ('compact', StorageProfile('compact', 16384, 'blosc:zstd', 9, 200, 2.)),
+])
+
+
+def get_profile(name):
+    """
+    Get a storage profile by name, the default profile if it does not exist
+    """
+    return storage_profiles.get(name, storage_profiles['default'])
+
+
+def get_filters(profile):
+    """
+    Get the PyTables filters of a profile. Blosc compressors fall back to zlib if PyTables has not been built with
+    blosc.
+    """
+    import tables
+    complib = profile.complib
+    if complib.startswith('blosc') and tables.which_lib_version('blosc') is None:
+        logging.warning(f'blosc is not available, {profile.name} profile compressed with zlib')
+        complib = 'zlib'
+    return tables.Filters(complevel=profile.complevel, complib=complib, shuffle=profile.complevel > 0)
@@ -0,0 +1,95 @@
+"""
+Content addressed store of the settings snapshots saved with the datasets and scans of the h5 files.
+
+The settings trees (init settings, shortcut preset, H5Saver settings) are serialized as xml once, then only when they
+have been modified: a tree is serialized again only after one of its parameters changed. Each distinct snapshot is
+saved once per file, as an uint8 array of the Settings_store group named after the hash of its content, and the
+dataset/scan groups only hold this hash in their 'settings_hash' attribute. Status values updated while logging
+(writer monitoring, current scan name) are not tracked: the snapshot holds their value at the time it was serialized.
+
+Files written before hold the xml string in the 'settings' attribute of each group, read_settings reads both.
+"""
+import hashlib
+
+import numpy as np
+
+store_group = 'Settings_store'
+volatile_settings = set(['queue_depth', 'last_flush', 'max_flush', 'current_scan_name', 'current_scan_path'])
+
+
+def settings_hash(xml):
+    return hashlib.blake2b(xml, digest_size=16).hexdigest()
+
+
+def read_settings(node):
+    """
+    Get the xml settings (bytes) saved with a dataset or scan group, None if there are none
+    """
+    attrs = node._v_attrs
+    names = attrs._f_list('user')
+    if 'settings_hash' in names:
+        return node._v_file.get_node(f'/{store_group}/settings_{attrs["settings_hash"]}').read().tobytes()
+    elif 'settings' in names:
+        settings = attrs['settings']
+        return settings if isinstance(settings, bytes) else str(settings).encode()
+    return None
+
+
+class SettingsStore:
+    """
+    Cache of the xml serialization of settings trees, saving each distinct snapshot once per h5 file
+    """
+    def __init__(self):
+        self._trees = dict([])  # id of the tree: [tree, xml or None if modified since serialized]
+
+    def track(self, tree):
+        if id(tree) not in self._trees:
+            self._trees[id(tree)] = [tree, None]
+            tree.sigTreeStateChanged.connect(self.tree_changed)
+
+    def tree_changed(self, tree, changes):
+        for param, change, data in changes:
+            if change == 'value' and param.name() in volatile_settings:
+                continue
+            self._trees[id(tree)][1] = None
+            return
+
+    def serialize(self, tree):
+        """
+        Get the xml string of a tree, serialized only if it has been modified since the last call
+        """
+        from pymodaq.daq_utils import custom_parameter_tree as custom_tree
+        self.track(tree)
+        entry = self._trees[id(tree)]
+        if entry[1] is None:
+            entry[1] = custom_tree.parameter_to_xml_string(tree)
+        return entry[1]
+
+    def snapshot(self, trees):
+        """
+        Get the hash and the xml string of the snapshot of a list of trees
+        """
+        xml = b'<All_settings title="All Settings" type="group">' + \
+              b''.join([self.serialize(tree) for tree in trees]) + b'</All_settings>'
+        return settings_hash(xml), xml
+
+    def save(self, node, trees):
+        """
+        Save the snapshot of trees in the store of the node file (if not already there) and its hash in the node
+        settings_hash attribute
+
+        Returns
+        -------
+        str: the hash of the snapshot
+        """
+        hash_str, xml = self.snapshot(trees)
+        h5file = node._v_file
+        if f'/{store_group}' in h5file:
+            group = h5file.get_node(f'/{store_group}')
+        else:
+            group = h5file.create_group('/', store_group, 'Settings snapshots, named after their hash')
+        name = f'settings_{hash_str}'
+        if name not in group:
+            h5file.create_array(group, name, obj=np.frombuffer(xml, np.uint8))
+        node._v_attrs['settings_hash'] = hash_str
+        return hash_str
@@ -8,16 +8,17 @@ import pyqtgraph.parametertree.parameterTypes as pTypes
 from pyqtgraph.parametertree import Parameter, ParameterTree
 import pymodaq.daq_utils.custom_parameter_tree as custom_tree  # to be placed after importing Parameter
 from pyqtgraph.parametertree.Parameter import registerParameterType
-from pymodaq.daq_utils.h5modules import H5Saver
-from pymodaq.daq_utils.daq_utils import get_set_local_dir
 from pymodaq.daq_utils.gui_utils import DockArea, select_file
-#check if preset_mode directory exists on the drive
+from beeactions.paths import get_local_path
+from beeactions.profiles import storage_profiles
+from beeactions.key_dispatcher import key_combination, sequence_text, modifier_keys
 
-local_path = get_set_local_dir()
 
-shortcut_path = os.path.join(local_path, 'preset_shortcuts')
-if not os.path.isdir(shortcut_path):
-    os.makedirs(shortcut_path)
+def get_shortcut_path():
+    """
+    Get the directory of the preset files, created on first use
+    """
+    return get_local_path('preset_shortcuts')
 
 
 class ScalableGroupShortCut(pTypes.GroupParameter):
@@ -69,19 +70,33 @@ class ShortcutBox(QtWidgets.QDialog):
 
         hor_layout.addWidget(label)
         hor_layout.addWidget(self.label)
+        self.combinations = []
 
         buttonBox = QtWidgets.QDialogButtonBox()
         buttonBox.addButton(QtWidgets.QDialogButtonBox.Ok)
         buttonBox.addButton(QtWidgets.QDialogButtonBox.Cancel)
+        clear_button = buttonBox.addButton('Clear', QtWidgets.QDialogButtonBox.ResetRole)
         layout.addWidget(self.label)
+        layout.addWidget(QtWidgets.QLabel('Key combinations with modifiers and sequences of up to 4 keys are recorded'))
         layout.addWidget(buttonBox)
 
         buttonBox.accepted.connect(self.accept)
         buttonBox.rejected.connect(self.reject)
+        clear_button.clicked.connect(self.clear)
+        for button in buttonBox.buttons():
+            button.setFocusPolicy(Qt.NoFocus)
+
+    def clear(self):
+        self.combinations = []
+        self.label.setText('')
 
     def keyPressEvent(self, event):
-        keyseq = QtGui.QKeySequence(event.key())
-        self.label.setText(keyseq.toString())
+        if event.isAutoRepeat() or event.key() in modifier_keys or event.key() == Qt.Key_unknown:
+            return
+        if len(self.combinations) == 4:
+            self.combinations = []
+        self.combinations.append(key_combination(event))
+        self.label.setText(sequence_text(self.combinations))
 
 
 
@@ -107,18 +122,22 @@ class ShortCutManager(QObject):
                 self.set_new_preset()
 
             elif msgBox.clickedButton() == modify_button:
-                path = select_file(start_path=shortcut_path,save=False, ext='xml')
+                path = select_file(start_path=get_shortcut_path(),save=False, ext='xml')
                 if path != '':
                     self.set_file_preset(str(path))
             else: #cancel
                 pass
 
     def set_new_preset(self):
+        from pymodaq.daq_utils.h5modules import H5Saver  # heavy import only needed when creating a preset
         param = [
                 {'title': 'Filename:', 'name': 'filename', 'type': 'str', 'value': 'preset_default'},
                 {'title': 'Author:', 'name': 'author', 'type': 'str', 'value': 'Aurore Avargues'},
-                {'title': 'Saving options:', 'name': 'saving_options', 'type': 'group', 'children': H5Saver.params},
-                
+                {'title': 'Saving options:', 'name': 'saving_options', 'type': 'group', 'children': H5Saver.params + [
+                    {'title': 'Storage profile:', 'name': 'storage_profile', 'type': 'list', 'value': 'default',
+                     'values': list(storage_profiles),
+                     'tip': 'Chunk size, compression and flush policy of the scans (see profiles)'}]},
+
                 ]
         params_action = [{'title': 'Actions:', 'name': 'actions', 'type': 'groupshortcut', 'addList': self.list_actions}]  # PresetScalableGroupMove(name="Moves")]
         self.shortcut_params = Parameter.create(title='Preset', name='Preset', type='group', children=param+params_action)
@@ -160,11 +179,12 @@ class ShortCutManager(QObject):
 
             elif change == 'parent':pass
 
-    def set_file_preset(self, filename, show=True):
+    def set_file_preset(self, filename, show=True, children=None):
         """
-
+        Load the preset file filename, children being its already parsed content if any (see presets.PresetIndex)
         """
-        children = custom_tree.XML_file_to_parameter(filename)
+        if children is None:
+            children = custom_tree.XML_file_to_parameter(filename)
         self.shortcut_params = Parameter.create(title='Shortcuts:', name='shortcuts', type='group', children=children)
         if show:
             self.show_preset()
@@ -195,7 +215,7 @@ class ShortCutManager(QObject):
 
         if res == dialog.Accepted:
             # save preset parameters in a xml file
-            custom_tree.parameter_to_xml_file(self.shortcut_params, os.path.join(shortcut_path,
+            custom_tree.parameter_to_xml_file(self.shortcut_params, os.path.join(get_shortcut_path(),
                                                                                self.shortcut_params.child(
                                                                                    ('filename')).value()))
 
@@ -0,0 +1,152 @@
+import heapq
+from collections import deque
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QTimer
+
+
+class LiveStatistics:
+    """
+    Statistics of the events of the current scan updated in constant time at each event: number of events per action,
+    number of events per action within a sliding time window and number of events per bee.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *window*         float       length (in s) of the sliding window used to compute rates
+    =============== =========== ==========================================================
+    """
+    def __init__(self, window=60.):
+        self.window_ns = int(window * 1e9)
+        self.clear()
+
+    def clear(self, actions=[]):
+        self.action_names = list(actions)
+        self.action_codes = dict([(action, code) for code, action in enumerate(self.action_names)])
+        self.counts = [0 for action in self.action_names]
+        self.window_counts = [0 for action in self.action_names]
+        self._window = deque([])
+        self.bee_counts = dict([])
+        self.n_events = 0
+        self.last_time = 0
+
+    def restore(self, actions, counts, bee_counts, tail):
+        """
+        Restore the statistics of a resumed scan from its totals (number of events per action and per bee) and its last
+        events (structured array with timestamp and action code fields), used to fill the sliding window
+        """
+        self.clear(actions)
+        self.counts = [int(count) for count in counts]
+        self.bee_counts = dict(bee_counts)
+        self.n_events = sum(self.counts)
+        for time, code in zip(tail['timestamp'].tolist(), tail['action'].tolist()):
+            if code >= 0:
+                self.window_counts[code] += 1
+                self._window.append((time, code))
+                self.last_time = max(self.last_time, time)
+        self.prune(self.last_time)
+
+    def set_window(self, window):
+        self.window_ns = int(window * 1e9)
+        self.prune(self.last_time)
+
+    def add_event(self, time, action, bee=-1):
+        """
+        Add an event at time (in ns since the start of the scan)
+        """
+        if action not in self.action_codes:
+            self.action_codes[action] = len(self.action_names)
+            self.action_names.append(action)
+            self.counts.append(0)
+            self.window_counts.append(0)
+        code = self.action_codes[action]
+        self.counts[code] += 1
+        self.window_counts[code] += 1
+        self._window.append((time, code))
+        if bee is not None and bee >= 0:
+            self.bee_counts[bee] = self.bee_counts.get(bee, 0) + 1
+        self.n_events += 1
+        self.last_time = max(self.last_time, time)
+        self.prune(self.last_time)
+
+    def prune(self, now):
+        """
+        Remove from the sliding window the events older than now - window (now in ns)
+        """
+        while self._window and self._window[0][0] < now - self.window_ns:
+            time, code = self._window.popleft()
+            self.window_counts[code] -= 1
+
+    def rates(self, now=None):
+        """
+        Get the rate (events per minute) of each action over the sliding window ending at now (in ns)
+        """
+        if now is not None:
+            self.prune(now)
+        return [60e9 * count / self.window_ns for count in self.window_counts]
+
+    def top_bees(self, n=10):
+        """
+        Get the (bee, number of events) of the n most active bees
+        """
+        return heapq.nlargest(n, self.bee_counts.items(), key=lambda item: item[1])
+
+
+class StatisticsViewer(QtWidgets.QWidget):
+    """
+    Bar plots of the per action counts and rates and of the most active bees. The plots are redrawn at most every
+    *interval* ms and only if new events have been added.
+    """
+    def __init__(self, statistics, time_func=None, interval=1000, top=10, parent=None):
+        super().__init__(parent)
+        self.statistics = statistics
+        self.time_func = time_func
+        self.top = top
+        self._drawn_events = -1
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+
+        self.summary_label = QtWidgets.QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.action_plot = pg.PlotWidget(title='Events per action (count, rate/min)')
+        self.action_plot.setMinimumHeight(150)
+        self.count_bars = pg.BarGraphItem(x=[], height=[], width=0.4, brush='b')
+        self.rate_bars = pg.BarGraphItem(x=[], height=[], width=0.4, brush='r')
+        self.action_plot.addItem(self.count_bars)
+        self.action_plot.addItem(self.rate_bars)
+        layout.addWidget(self.action_plot)
+
+        self.bee_plot = pg.PlotWidget(title=f'Top {top} bees')
+        self.bee_plot.setMinimumHeight(150)
+        self.bee_bars = pg.BarGraphItem(x=[], height=[], width=0.8, brush='g')
+        self.bee_plot.addItem(self.bee_bars)
+        layout.addWidget(self.bee_plot)
+
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.update_view)
+        self.timer.start(interval)
+
+    def update_view(self, force=False):
+        if not self.isVisible():
+            return
+        stats = self.statistics
+        now = self.time_func() if self.time_func is not None else stats.last_time
+        rates = stats.rates(now)
+        if stats.n_events == self._drawn_events and not force and not any(rates):
+            return
+        self._drawn_events = stats.n_events
+
+        x = np.arange(len(stats.action_names))
+        self.count_bars.setOpts(x=x - 0.2, height=stats.counts, width=0.4)
+        self.rate_bars.setOpts(x=x + 0.2, height=rates, width=0.4)
+        self.action_plot.getAxis('bottom').setTicks([list(enumerate(stats.action_names))])
+
+        top_bees = stats.top_bees(self.top)
+        self.bee_bars.setOpts(x=np.arange(len(top_bees)), height=[count for bee, count in top_bees], width=0.8)
+        self.bee_plot.getAxis('bottom').setTicks([[(ind, str(bee)) for ind, (bee, count) in enumerate(top_bees)]])
+
+        self.summary_label.setText(f'{stats.n_events} events, ' +
+                                   ', '.join([f'{action}: {count} ({rate:.1f}/min)' for action, count, rate in
+                                              zip(stats.action_names, stats.counts, rates)]))
@@ -0,0 +1,639 @@
+"""
+Storage of the logged events within the scan groups of the h5 file.
+
+Two storage modes are available:
+
+* arrays: three parallel enlargeable arrays (time_axis, actions and bees) created with the H5Saver
+* table: a single table per scan whose rows are (timestamp, action code, bee). The action and bee columns can be
+  indexed for fast queries.
+
+Timestamps are int64 nanoseconds since the start of the scan (or since the start of the video when annotating a
+recorded video). Files written before saved them as float seconds (units attribute 'seconds'), they are converted to
+ns when read. When annotating a video, the frame index of each event is saved in a frames array parallel to the
+time_axis array, whatever the storage mode.
+
+In both modes actions are saved as small integer codes, the code to name table (the actions of the loaded preset)
+being saved once per scan in the 'actions' attribute of the actions array or of the events table. Files written
+before, where the actions array is a string array holding the action name of each event, are still readable.
+
+A footer summarizing the events of the scan (attributes n_events, last_timestamp_ns, action_counts and bee_counts of
+the scan group) is updated at each flush, so that an unfinished scan can be resumed (see resume_storage) without
+reading all its events.
+"""
+import pickle
+
+import numpy as np
+import tables
+
+storage_modes = ['arrays', 'table']
+scan_arrays = ['time_axis', 'actions', 'bees']
+event_dtype = np.dtype([('timestamp', '<i8'), ('action', '<i2'), ('bee', '<i4')])
+
+
+class EventRow(tables.IsDescription):
+    timestamp = tables.Int64Col(pos=0)
+    action = tables.Int16Col(pos=1)
+    bee = tables.Int32Col(pos=2, dflt=-1)
+
+
+def get_scan_array(group, name):
+    """
+    Get the array called name (case insensitive, as H5Saver capitalizes array names) within the scan group
+    """
+    for node in group._f_iter_nodes():
+        if node._v_name.lower() == name:
+            return node
+    return None
+
+
+def encode_string(array, string):
+    """
+    Convert a string into a row of the VLArray array, following H5Saver string arrays convention (pickled string
+    saved as uint8) unless the array has been created with a string atom
+    """
+    if isinstance(array.atom, tables.VLStringAtom):
+        return string.encode()
+    elif isinstance(array.atom, tables.VLUnicodeAtom):
+        return string
+    return np.frombuffer(pickle.dumps(string), np.uint8)
+
+
+def decode_string(array, row):
+    """
+    Convert back a row of the VLArray array into a string
+    """
+    if isinstance(array.atom, tables.VLStringAtom):
+        return row.decode()
+    elif isinstance(array.atom, tables.VLUnicodeAtom):
+        return row
+    return pickle.loads(row.tobytes())
+
+
+def append_rows(array, values):
+    """
+    Append values to an enlargeable array, updating its shape attribute as H5Saver.append does
+    """
+    array.append(values)
+    if 'shape' in array._v_attrs:
+        shape = list(array._v_attrs['shape'])
+        shape[0] += len(values)
+        array._v_attrs['shape'] = tuple(shape)
+
+
+def rechunk(array, chunk_rows, filters=None):
+    """
+    Replace an empty enlargeable array by a copy (with the same attributes) having chunks of chunk_rows rows and the
+    given filters, as H5Saver.add_array does not set them
+    """
+    name = array._v_name
+    parent = array._v_parent
+    copy = array.copy(parent, f'{name}_rechunked', filters=filters if filters is not None else array.filters,
+                      chunkshape=(chunk_rows,) + tuple(array.shape[1:]))
+    array._f_remove()
+    copy._f_rename(name)
+    return copy
+
+
+class ActionCategorical:
+    """
+    Categorical view of the actions of a scan: an array of action codes together with the action names
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *codes*          ndarray     the action code of each event, -1 if unknown
+    *categories*     list        the action names, the code of an action is its index in it
+    =============== =========== ==========================================================
+    """
+    def __init__(self, codes, categories):
+        self.codes = np.asarray(codes)
+        self.categories = list(categories)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, item):
+        if np.isscalar(item) or isinstance(item, (int, np.integer)):
+            code = self.codes[item]
+            return self.categories[code] if code >= 0 else ''
+        return ActionCategorical(self.codes[item], self.categories)
+
+    def __repr__(self):
+        return f'ActionCategorical({len(self)} events, categories={self.categories})'
+
+    def names(self):
+        """
+        Get the action name of each event as an array of strings
+        """
+        return np.array(self.categories + [''])[self.codes]
+
+    def counts(self):
+        """
+        Get the number of events of each action
+        """
+        counts = np.bincount(self.codes[self.codes >= 0], minlength=len(self.categories))
+        return dict(zip(self.categories, counts.tolist()))
+
+    def mask(self, action):
+        """
+        Get the boolean mask of the events of the given action
+        """
+        if action not in self.categories:
+            return np.zeros((len(self),), dtype=bool)
+        return self.codes == self.categories.index(action)
+
+    def to_pandas(self):
+        """
+        Convert into a pandas.Categorical (pandas needs to be installed)
+        """
+        import pandas as pd
+        return pd.Categorical.from_codes(self.codes, categories=self.categories)
+
+
+class ScanStorage:
+    """
+    Base class of the event storages of a scan
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *h5saver*        H5Saver     the saver holding the h5 file
+    *scan_group*     group       the scan group where to store the events
+    *actions*        list        action names, the code of an action is its index in it
+    *save_bee*       bool        if True, bee numbers are saved
+    *save_frame*     bool        if True, video frame indexes are saved in a frames array
+    *resume*         bool        if True, the nodes already in scan_group are opened to append events
+    *profile*        namedtuple  StorageProfile setting the chunks and compression of the nodes (see profiles)
+    =============== =========== ==========================================================
+    """
+    mode = ''
+
+    def __init__(self, h5saver, scan_group, actions, save_bee=True, save_frame=False, resume=False, profile=None):
+        self.h5saver = h5saver
+        self.scan_group = scan_group
+        self.profile = profile
+        self.actions = list(actions)
+        self.action_codes = dict([(action, code) for code, action in enumerate(self.actions)])
+        self.save_bee = save_bee
+        if resume:
+            self.frame_array = get_scan_array(scan_group, 'frames')
+        elif save_frame:
+            self.frame_array = self.add_array('frames', title='Frames', array_type=np.int64,
+                                              metadata=dict(units='frame'))
+        else:
+            self.frame_array = None
+        self.n_events = 0
+        self.last_timestamp = 0
+        self.action_counts = np.zeros((len(self.actions),), dtype=np.int64)
+        self.bee_counts = dict([])
+
+    def filters(self):
+        """
+        Get the filters of the nodes, from the profile if any, else the ones of the H5Saver
+        """
+        if self.profile is not None:
+            from beeactions.profiles import get_filters
+            return get_filters(self.profile)
+        return self.h5saver.filters
+
+    def add_array(self, name, **kwargs):
+        """
+        Add an enlargeable array of one value per event to the scan group, chunked and compressed following the profile
+        """
+        array = self.h5saver.add_array(self.scan_group, name, 'data', scan_type='scan1D', enlargeable=True,
+                                       data_shape=(1,), **kwargs)
+        if self.profile is not None:
+            array = rechunk(array, self.profile.chunk_rows, self.filters())
+        return array
+
+    def frame_offsets(self):
+        return dict(frames=self.frame_array.nrows) if self.frame_array is not None else dict([])
+
+    def write_frames(self, events):
+        if self.frame_array is not None:
+            append_rows(self.frame_array, np.array([event.frame for event in events], dtype=np.int64))
+
+    def offsets(self):
+        """
+        Number of rows of each node of the storage, used to know from where to replay a journal
+        """
+        raise NotImplementedError
+
+    def write(self, events):
+        """
+        Write a batch of events (list of Event)
+        """
+        raise NotImplementedError
+
+    def nodes(self):
+        """
+        Get the nodes of the storage, having one row per event
+        """
+        raise NotImplementedError
+
+    def read_rows(self, start, stop):
+        """
+        Read the events from row start to row stop as a structured array of dtype event_dtype
+        """
+        raise NotImplementedError
+
+    def set_actions_attribute(self):
+        raise NotImplementedError
+
+    def add_actions(self, actions):
+        """
+        Append to the actions of the storage the given actions it does not have yet
+        """
+        new_actions = [action for action in actions if action not in self.action_codes]
+        if new_actions:
+            for action in new_actions:
+                self.action_codes[action] = len(self.actions)
+                self.actions.append(action)
+            self.action_counts = np.concatenate((self.action_counts, np.zeros((len(new_actions),), dtype=np.int64)))
+            self.set_actions_attribute()
+
+    def count_events(self, timestamps, codes, bees=None):
+        """
+        Update the summary of the events of the scan with a batch of events
+        """
+        if len(timestamps) == 0:
+            return
+        codes = np.asarray(codes)
+        self.n_events += len(timestamps)
+        self.last_timestamp = max(self.last_timestamp, int(np.max(timestamps)))
+        self.action_counts += np.bincount(codes[codes >= 0], minlength=len(self.actions))[:len(self.actions)]
+        if bees is not None:
+            bees = np.asarray(bees)
+            numbers, counts = np.unique(bees[bees >= 0], return_counts=True)
+            for bee, count in zip(numbers.tolist(), counts.tolist()):
+                self.bee_counts[bee] = self.bee_counts.get(bee, 0) + count
+
+    def write_footer(self):
+        """
+        Save the summary of the events of the scan as attributes of the scan group
+        """
+        attrs = self.scan_group._v_attrs
+        attrs['n_events'] = self.n_events
+        attrs['last_timestamp_ns'] = self.last_timestamp
+        attrs['action_counts'] = self.action_counts
+        attrs['bee_counts'] = np.array([list(self.bee_counts.keys()), list(self.bee_counts.values())],
+                                       dtype=np.int64).reshape((2, -1))
+
+    def read_footer(self, tail_size=1000, chunk_size=65536):
+        """
+        Restore the summary of the events from the footer of the scan. Only the events written after the last footer
+        update are read (all of them if the scan has no footer). Nodes longer than the others (interrupted write) are
+        truncated.
+
+        Returns
+        -------
+        ndarray: the tail_size last events, as a structured array of dtype event_dtype
+        """
+        nodes = self.nodes()
+        n_rows = min([node.nrows for node in nodes])
+        for node in nodes:
+            if node.nrows > n_rows:
+                node.truncate(n_rows)
+                if 'shape' in node._v_attrs:
+                    node._v_attrs['shape'] = (n_rows,) + tuple(node._v_attrs['shape'])[1:]
+
+        attrs = self.scan_group._v_attrs
+        if 'n_events' in attrs._f_list('user') and attrs['n_events'] <= n_rows:
+            self.n_events = int(attrs['n_events'])
+            self.last_timestamp = int(attrs['last_timestamp_ns'])
+            counts = np.asarray(attrs['action_counts'], dtype=np.int64)
+            self.action_counts[:len(counts)] = counts
+            bee_counts = np.asarray(attrs['bee_counts'], dtype=np.int64).reshape((2, -1))
+            self.bee_counts = dict(zip(bee_counts[0].tolist(), bee_counts[1].tolist()))
+        for start in range(self.n_events, n_rows, chunk_size):
+            events = self.read_rows(start, min(n_rows, start + chunk_size))
+            self.count_events(events['timestamp'], events['action'], events['bee'] if self.save_bee else None)
+        return self.read_rows(max(0, n_rows - tail_size), n_rows)
+
+
+class ArrayStorage(ScanStorage):
+    mode = 'arrays'
+
+    def __init__(self, h5saver, scan_group, actions, save_bee=True, save_frame=False, resume=False, profile=None):
+        super().__init__(h5saver, scan_group, actions, save_bee, save_frame, resume, profile)
+        if resume:
+            self.timestamp_array = get_scan_array(scan_group, 'time_axis')
+            self.action_array = get_scan_array(scan_group, 'actions')
+            self.bee_array = get_scan_array(scan_group, 'bees') if save_bee else None
+            return
+
+        self.timestamp_array = self.add_array('time_axis', title='Timestamps', array_type=np.int64,
+                                              metadata=dict(units='ns'))
+        self.action_array = self.add_array('actions', title='Actions', array_type=np.int16,
+                                           metadata=dict(actions=self.actions, encoding='codes'))
+        if save_bee:
+            self.bee_array = self.add_array('bees', title='Bees', array_to_save=np.array([0, ]))
+        else:
+            self.bee_array = None
+
+    def offsets(self):
+        offsets = dict(time_axis=self.timestamp_array.nrows, actions=self.action_array.nrows)
+        if self.bee_array is not None:
+            offsets['bees'] = self.bee_array.nrows
+        offsets.update(self.frame_offsets())
+        return offsets
+
+    def nodes(self):
+        return [node for node in (self.timestamp_array, self.action_array, self.bee_array, self.frame_array)
+                if node is not None]
+
+    def set_actions_attribute(self):
+        self.action_array._v_attrs['actions'] = self.actions
+
+    def read_rows(self, start, stop):
+        events = np.full((max(0, stop - start),), -1, dtype=event_dtype)
+        events['timestamp'] = to_ns(self.timestamp_array.read(start, stop), self.timestamp_array).reshape((-1,))
+        events['action'] = self.action_array.read(start, stop).reshape((-1,))
+        if self.bee_array is not None:
+            events['bee'] = self.bee_array.read(start, stop).reshape((-1,))
+        return events
+
+    def write(self, events):
+        timestamps = np.array([event.timestamp for event in events], dtype=np.int64)
+        codes = np.array([self.action_codes[event.action] for event in events], dtype=np.int16)
+        append_rows(self.timestamp_array, timestamps)
+        append_rows(self.action_array, codes)
+        if self.bee_array is not None:
+            bees = np.array([-1 if event.bee is None else event.bee for event in events], dtype=np.int64)
+            append_rows(self.bee_array, bees)
+        else:
+            bees = None
+        self.write_frames(events)
+        self.count_events(timestamps, codes, bees)
+
+
+class TableStorage(ScanStorage):
+    """
+    Store the events of a scan in a single table
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *chunk_rows*     int         number of events per chunk of the table (if no profile is given)
+    *index*          bool        if True, the action and bee columns are indexed
+    =============== =========== ==========================================================
+    """
+    mode = 'table'
+
+    def __init__(self, h5saver, scan_group, actions, save_bee=True, save_frame=False, resume=False, profile=None,
+                 chunk_rows=4096, index=True):
+        super().__init__(h5saver, scan_group, actions, save_bee, save_frame, resume, profile)
+        if resume:
+            self.table = scan_group.events
+            return
+        if profile is not None:
+            chunk_rows = profile.chunk_rows
+        self.table = h5saver.h5_file.create_table(scan_group, 'events', EventRow, title='Events',
+                                                  filters=self.filters(), chunkshape=(chunk_rows,))
+        attrs = self.table._v_attrs
+        attrs['type'] = 'events'
+        attrs['actions'] = self.actions
+        attrs['units'] = 'ns'
+        attrs['save_bee'] = save_bee
+        if index:
+            self.table.cols.action.create_index()
+            if save_bee:
+                self.table.cols.bee.create_index()
+
+    def offsets(self):
+        offsets = dict(events=self.table.nrows)
+        offsets.update(self.frame_offsets())
+        return offsets
+
+    def nodes(self):
+        return [node for node in (self.table, self.frame_array) if node is not None]
+
+    def set_actions_attribute(self):
+        self.table._v_attrs['actions'] = self.actions
+
+    def read_rows(self, start, stop):
+        return _table_events(self.table.read(start, stop), self.table)
+
+    def write(self, events):
+        rows = np.empty((len(events),), dtype=event_dtype)
+        rows['timestamp'] = [event.timestamp for event in events]
+        rows['action'] = [self.action_codes[event.action] for event in events]
+        rows['bee'] = [-1 if event.bee is None else event.bee for event in events]
+        self.table.append(rows)
+        self.write_frames(events)
+        self.count_events(rows['timestamp'], rows['action'], rows['bee'] if self.save_bee else None)
+
+
+def create_storage(mode, h5saver, scan_group, actions, save_bee=True, save_frame=False, profile=None, **kwargs):
+    """
+    Create the event storage of the given mode (one of storage_modes) within the scan group, its nodes being chunked
+    and compressed following profile (a profiles.StorageProfile) if given
+    """
+    if mode == 'table':
+        return TableStorage(h5saver, scan_group, actions, save_bee, save_frame, profile=profile, **kwargs)
+    elif mode == 'arrays':
+        return ArrayStorage(h5saver, scan_group, actions, save_bee, save_frame, profile=profile)
+    raise ValueError(f'Invalid storage mode: {mode}')
+
+
+def is_unfinished(scan_group):
+    """
+    Check if a scan group holds events but has not been stopped (scan_done attribute False)
+    """
+    attrs = scan_group._v_attrs
+    return 'scan_done' in attrs._f_list('user') and not attrs['scan_done'] and \
+        ('events' in scan_group or get_scan_array(scan_group, 'time_axis') is not None)
+
+
+def resume_storage(h5saver, scan_group, actions=()):
+    """
+    Reopen the storage of an unfinished scan to append events, whatever its storage mode. Actions not saved yet in
+    the scan are added to its actions. The summary of the events is restored from the scan footer (see
+    ScanStorage.read_footer).
+
+    Returns
+    -------
+    ScanStorage: the storage, ready to write events
+    ndarray: the last events of the scan, as a structured array of dtype event_dtype
+    """
+    if 'events' in scan_group:
+        table = scan_group.events
+        storage = TableStorage(h5saver, scan_group, table._v_attrs['actions'], bool(table._v_attrs['save_bee']),
+                               resume=True)
+    else:
+        action_array = get_scan_array(scan_group, 'actions')
+        if action_array is None or isinstance(action_array, tables.VLArray):
+            raise ValueError(f'Scan {scan_group._v_pathname} has been saved by a previous version and cannot be '
+                             f'resumed')
+        storage = ArrayStorage(h5saver, scan_group, action_array._v_attrs['actions'],
+                               get_scan_array(scan_group, 'bees') is not None, resume=True)
+    storage.add_actions(actions)
+    tail = storage.read_footer()
+    return storage, tail
+
+
+def to_ns(timestamps, node):
+    """
+    Convert the timestamps read from node into int64 ns according to its units attribute
+    """
+    if 'units' in node._v_attrs and node._v_attrs['units'] == 'seconds':
+        return np.rint(np.asarray(timestamps) * 1e9).astype(np.int64)
+    return np.asarray(timestamps, dtype=np.int64)
+
+
+def read_actions(scan_group):
+    """
+    Read the actions of all the events of a scan as a categorical view, whatever its storage mode. Action names of
+    files saved as string arrays are converted into codes.
+
+    Returns
+    -------
+    ActionCategorical
+    """
+    if 'events' in scan_group:
+        table = scan_group.events
+        return ActionCategorical(table.col('action'), table._v_attrs['actions'])
+
+    action_array = get_scan_array(scan_group, 'actions')
+    if isinstance(action_array, tables.VLArray):
+        names = [decode_string(action_array, row) for row in action_array.read()]
+        categories, codes = np.unique(names, return_inverse=True)
+        return ActionCategorical(codes.astype(np.int16), categories.tolist())
+    return ActionCategorical(action_array.read().astype(np.int16), action_array._v_attrs['actions'])
+
+
+def read_frames(scan_group):
+    """
+    Read the video frame index of each event of a scan
+
+    Returns
+    -------
+    ndarray: int64 frame indexes, None if the scan was not annotated from a video
+    """
+    frame_array = get_scan_array(scan_group, 'frames')
+    if frame_array is None:
+        return None
+    return frame_array.read().astype(np.int64).reshape((-1,))
+
+
+def _table_events(rows, table):
+    events = np.empty((len(rows),), dtype=event_dtype)
+    events['timestamp'] = to_ns(rows['timestamp'], table)
+    events['action'] = rows['action']
+    events['bee'] = rows['bee']
+    return events
+
+
+def read_events(scan_group):
+    """
+    Read all the events of a scan, whatever its storage mode
+
+    Returns
+    -------
+    ndarray: structured array of dtype event_dtype, bee is -1 when not saved
+    list of str: the action names, action codes being indexes in it
+    """
+    if 'events' in scan_group:
+        table = scan_group.events
+        events = table.read()
+        if events.dtype != event_dtype:
+            events = _table_events(events, table)
+        return events, list(table._v_attrs['actions'])
+
+    time_array = get_scan_array(scan_group, 'time_axis')
+    timestamps = to_ns(time_array.read(), time_array)
+    events = np.full((len(timestamps),), -1, dtype=event_dtype)
+    events['timestamp'] = timestamps
+    bee_array = get_scan_array(scan_group, 'bees')
+    if bee_array is not None:
+        bees = bee_array.read()
+        events['bee'][:len(bees)] = bees
+    actions = read_actions(scan_group)
+    events['action'][:len(actions)] = actions.codes
+    return events, actions.categories
+
+
+def iter_events(scan_group, chunk_size=65536):
+    """
+    Iterate over the events of a scan by chunks of at most chunk_size events, so that memory stays bounded whatever
+    the number of events
+
+    Yields
+    ------
+    ndarray: structured array of dtype event_dtype
+    list of str: the action names, action codes being indexes in it. For files saved with string arrays, new names
+                 are appended as they are found so that codes are the same for all chunks.
+    """
+    if 'events' in scan_group:
+        table = scan_group.events
+        actions = list(table._v_attrs['actions'])
+        for start in range(0, table.nrows, chunk_size):
+            yield _table_events(table.read(start, start + chunk_size), table), actions
+        return
+
+    time_array = get_scan_array(scan_group, 'time_axis')
+    bee_array = get_scan_array(scan_group, 'bees')
+    action_array = get_scan_array(scan_group, 'actions')
+    string_actions = isinstance(action_array, tables.VLArray)
+    actions = [] if string_actions else list(action_array._v_attrs['actions'])
+    action_codes = dict([(action, code) for code, action in enumerate(actions)])
+    for start in range(0, time_array.nrows, chunk_size):
+        stop = min(start + chunk_size, time_array.nrows)
+        events = np.full((stop - start,), -1, dtype=event_dtype)
+        events['timestamp'] = to_ns(time_array.read(start, stop), time_array)
+        if bee_array is not None:
+            bees = bee_array.read(start, stop)
+            events['bee'][:len(bees)] = bees
+        if string_actions:
+            codes = []
+            for row in action_array.read(start, stop):
+                name = decode_string(action_array, row)
+                if name not in action_codes:
+                    action_codes[name] = len(actions)
+                    actions.append(name)
+                codes.append(action_codes[name])
+        else:
+            codes = action_array.read(start, stop)
+        events['action'][:len(codes)] = codes
+        yield events, actions
+
+
+def query_events(scan_group, action=None, bee=None):
+    """
+    Get the events of a scan done by a given bee and/or of a given action. With the table storage the selection is
+    done by PyTables, using the column indexes if any.
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *scan_group*     group       the scan group holding the events
+    *action*         str         the action name to select, None for all
+    *bee*            int         the bee number to select, None for all
+    =============== =========== ==========================================================
+
+    Returns
+    -------
+    ndarray: structured array of dtype event_dtype
+    """
+    if 'events' in scan_group:
+        table = scan_group.events
+        conditions = []
+        condvars = dict([])
+        if action is not None:
+            actions = list(table._v_attrs['actions'])
+            if action not in actions:
+                return np.empty((0,), dtype=event_dtype)
+            conditions.append('(action == code)')
+            condvars['code'] = np.int16(actions.index(action))
+        if bee is not None:
+            conditions.append('(bee == bee_id)')
+            condvars['bee_id'] = np.int32(bee)
+        if not conditions:
+            return _table_events(table.read(), table)
+        return _table_events(table.read_where(' & '.join(conditions), condvars), table)
+
+    events, actions = read_events(scan_group)
+    mask = np.ones((len(events),), dtype=bool)
+    if action is not None:
+        if action not in actions:
+            return events[:0]
+        mask &= events['action'] == actions.index(action)
+    if bee is not None:
+        mask &= events['bee'] == bee
+    return events[mask]
@@ -0,0 +1,137 @@
+import time
+import datetime
+
+import numpy as np
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QObject, QEvent
+
+
+class EventClock(QObject):
+    """
+    Nanosecond clock of the logged events.
+
+    Installed as an application event filter, it captures a monotonic time (time.monotonic_ns) and the QKeyEvent
+    timestamp as soon as a key press is dispatched (at the ShortcutOverride event, before any shortcut is activated),
+    so that the time of an event does not depend on the delays of the signal/slot path. Event times are int64
+    nanoseconds relative to the start of the scan, the wall clock time of the start being kept as an anchor.
+
+    The QKeyEvent timestamps (ms, clock of the window system) are mapped on the monotonic clock by the smallest
+    difference between the two times of a key press (the key press delivered the fastest), saved at the end of a scan
+    as the offset from the QKeyEvent timestamps to the wall clock (see key_timestamp_offset).
+
+    When a scan is resumed, the event times continue from its last event while the wall clock went on: the event time
+    of the resume (resumed_at_ns scan attribute) is anchored to the wall clock time of the resume (resumed_wall_ns),
+    so that the mapping of event times to wall clock times is piecewise (see to_wall_ns).
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *max_age*        float       maximum delay (in s) between a captured key press and its use
+    =============== =========== ==========================================================
+    """
+    def __init__(self, max_age=0.5):
+        super().__init__()
+        self.max_age_ns = int(max_age * 1e9)
+        self.start_ns = None
+        self.start_wall_ns = None
+        self.anchor_ns = 0
+        self.anchor_wall_ns = None
+        self.key_ns = None
+        self.key_timestamp = None
+        self.timestamp_offset_ns = None  # monotonic time minus QKeyEvent timestamp, smallest one
+        self.dispatch_ns = None
+
+    def install(self):
+        QtWidgets.QApplication.instance().installEventFilter(self)
+
+    def start(self, offset_ns=0, start_wall_ns=None):
+        """
+        Set the time origin of the events (start of the scan), offset_ns before now when resuming a scan. The event
+        time offset_ns is anchored to the wall clock time of now, start_wall_ns being the wall clock time of the
+        original start of a resumed scan.
+        """
+        self.start_ns = time.monotonic_ns() - offset_ns
+        self.anchor_ns = offset_ns
+        self.anchor_wall_ns = time.time_ns()
+        self.start_wall_ns = start_wall_ns if start_wall_ns is not None else self.anchor_wall_ns - offset_ns
+        self.key_ns = None
+
+    def wall_ns(self, time_ns):
+        """
+        Get the wall clock time (ns since the epoch) of an event time of the running scan (since its start or resume)
+        """
+        return self.anchor_wall_ns + time_ns - self.anchor_ns
+
+    def from_wall_ns(self, wall_ns):
+        """
+        Get the event time of a wall clock time (ns since the epoch), None if it is before the start or resume of the
+        scan
+        """
+        if wall_ns < self.anchor_wall_ns:
+            return None
+        return self.anchor_ns + wall_ns - self.anchor_wall_ns
+
+    def elapsed_ns(self, time_ns=None):
+        """
+        Get the time in ns elapsed since the start of the scan, at time_ns (monotonic) or now
+        """
+        if time_ns is None:
+            time_ns = time.monotonic_ns()
+        return time_ns - self.start_ns if self.start_ns is not None else 0
+
+    def eventFilter(self, obj, event):
+        if event.type() in (QEvent.ShortcutOverride, QEvent.KeyPress) and not event.isAutoRepeat():
+            if event.timestamp() != self.key_timestamp:  # key events are sent to each widget of the focus chain
+                self.key_ns = time.monotonic_ns()
+                self.key_timestamp = event.timestamp()
+                offset = self.key_ns - self.key_timestamp * 1000000
+                if self.timestamp_offset_ns is None or offset < self.timestamp_offset_ns:
+                    self.timestamp_offset_ns = offset
+        return False
+
+    def event_time(self, key_ns=None):
+        """
+        Get the time of the key press that triggered the current event (or now if there is no recent key press) in
+        ns since the start of the scan. The captured key press is consumed and the delay between the key press and
+        this call is kept in dispatch_ns (None if there is no recent key press). key_ns is the monotonic time of the
+        key press if it is already known (see key_dispatcher.KeyDispatcher), otherwise the captured one is used.
+        """
+        now_ns = time.monotonic_ns()
+        if key_ns is None:
+            key_ns = self.key_ns
+        self.key_ns = None
+        if key_ns is not None and now_ns - key_ns <= self.max_age_ns:
+            self.dispatch_ns = now_ns - key_ns
+            return self.elapsed_ns(key_ns)
+        self.dispatch_ns = None
+        return self.elapsed_ns(now_ns)
+
+    def key_timestamp_offset(self):
+        """
+        Get the offset (in ns) to add to a QKeyEvent timestamp (converted from ms to ns) to get the wall clock time of
+        the key press, None if no key press has been captured or the clock is not started
+        """
+        if self.timestamp_offset_ns is None or self.start_ns is None:
+            return None
+        return self.timestamp_offset_ns + self.wall_ns(0) - self.start_ns
+
+    def anchor_attributes(self):
+        """
+        Get the scan attributes anchoring the event times to the wall clock
+        """
+        return dict(time_units='ns', start_wall_ns=self.start_wall_ns,
+                    start_time=datetime.datetime.fromtimestamp(self.start_wall_ns / 1e9).isoformat())
+
+
+def to_wall_ns(timestamps, start_wall_ns, resumed_at_ns=(), resumed_wall_ns=()):
+    """
+    Convert event times of a scan (ns since its start) into wall clock times (ns since the epoch), from the scan
+    attributes start_wall_ns, resumed_at_ns and resumed_wall_ns: an event after the i-th resume of the scan (timestamp
+    above resumed_at_ns[i]) happened at resumed_wall_ns[i] + timestamp - resumed_at_ns[i], an event before any resume
+    at start_wall_ns + timestamp.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    anchors = np.concatenate(([0], np.asarray(resumed_at_ns, dtype=np.int64)))
+    walls = np.concatenate(([start_wall_ns], np.asarray(resumed_wall_ns, dtype=np.int64)))
+    segments = np.searchsorted(anchors, timestamps, side='left') - 1
+    segments = np.maximum(segments, 0)
+    return walls[segments] + timestamps - anchors[segments]
@@ -0,0 +1,349 @@
+"""
+Annotation of recorded videos: a video player dock whose current frame gives the time of the logged events.
+
+Frames are decoded by a background thread into an LRU cache (bounded in memory) and the frames around the requested
+one are prefetched, so that stepping forward and backward or scrubbing is served from the cache. Decoding needs
+OpenCV (cv2).
+"""
+import logging
+import threading
+from collections import OrderedDict
+
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+
+try:
+    import cv2
+    has_cv2 = True
+except ImportError:
+    has_cv2 = False
+
+video_extensions = ['mp4', 'avi', 'mov', 'mkv', 'mpg', 'mpeg', 'wmv', 'm4v']
+
+
+class FrameCache:
+    """
+    Least recently used cache of decoded frames, bounded by the memory used by the frames
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *max_bytes*      int         maximum memory (in bytes) used by the cached frames
+    =============== =========== ==========================================================
+    """
+    def __init__(self, max_bytes=512 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._frames = OrderedDict([])
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __contains__(self, index):
+        return index in self._frames
+
+    def get(self, index):
+        with self._lock:
+            frame = self._frames.get(index, None)
+            if frame is not None:
+                self._frames.move_to_end(index)
+            return frame
+
+    def put(self, index, frame):
+        with self._lock:
+            if index in self._frames:
+                self._frames.move_to_end(index)
+                return
+            self._frames[index] = frame
+            self.nbytes += frame.nbytes
+            while self.nbytes > self.max_bytes and len(self._frames) > 1:
+                old_index, old_frame = self._frames.popitem(last=False)
+                self.nbytes -= old_frame.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = 0
+
+
+class VideoDecoder(QObject):
+    """
+    Decode the frames of a video file from a worker thread.
+
+    Only the last requested frame is decoded (older requests are dropped when scrubbing) and emitted with
+    frame_signal. When a frame is not cached, decoding starts *prefetch_back* frames before it (unless it is just
+    ahead of the decoder position), then the *prefetch* next frames are decoded into the cache while no other frame
+    is requested. The presentation time of every decoded frame is kept (see time_ns).
+
+    =============== =========== ==========================================================
+    **Parameters**   **Type**    **Description**
+    *cache*          FrameCache  the cache of the decoded frames
+    *prefetch*       int         number of frames decoded after the requested one
+    *prefetch_back*  int         number of frames decoded before the requested one
+    =============== =========== ==========================================================
+    """
+    frame_signal = pyqtSignal(int, object)
+
+    def __init__(self, cache=None, prefetch=60, prefetch_back=30):
+        super().__init__()
+        if not has_cv2:
+            raise ImportError('OpenCV (cv2) is needed to read videos')
+        self.cache = cache if cache is not None else FrameCache()
+        self.prefetch = prefetch
+        self.prefetch_back = prefetch_back
+        self.path = None
+        self.n_frames = 0
+        self.fps = 0.
+        self.size = (0, 0)
+        self._pts_ns = dict([])
+        self._capture = None
+        self._position = 0  # index of the next frame read by the capture
+        self._request = None
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stop = False
+
+    def open(self, path):
+        """
+        Open a video file and start the decoding thread
+        """
+        self.close()
+        capture = cv2.VideoCapture(path)
+        if not capture.isOpened():
+            raise IOError(f'Cannot open the video {path}')
+        self._capture = capture
+        self.path = path
+        self.n_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 25.
+        self.size = (int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self._pts_ns = dict([])
+        self._position = 0
+        self._request = None
+        self._stop = False
+        self.cache.clear()
+        self._thread = threading.Thread(target=self._run, name='VideoDecoder', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            with self._condition:
+                self._stop = True
+                self._condition.notify()
+            self._thread.join()
+            self._thread = None
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def request(self, index):
+        """
+        Ask for the frame index, emitted with frame_signal from the cache or once decoded
+        """
+        index = min(max(0, index), max(0, self.n_frames - 1))
+        frame = self.cache.get(index)
+        if frame is not None:
+            self.frame_signal.emit(index, frame)
+        with self._condition:
+            self._request = (index, frame is None)
+            self._condition.notify()
+
+    def time_ns(self, index):
+        """
+        Get the presentation time (in ns since the start of the video) of the frame index
+        """
+        if index in self._pts_ns:
+            return self._pts_ns[index]
+        return int(round(index * 1e9 / self.fps))
+
+    def _read(self, index):
+        """
+        Decode the frame index, seeking only if it is not the next frame of the capture
+        """
+        if index != self._position:
+            self._capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+            self._position = index
+        ok, frame = self._capture.read()
+        if not ok:
+            return None
+        pts_ms = self._capture.get(cv2.CAP_PROP_POS_MSEC)
+        if pts_ms > 0 or index == 0:
+            self._pts_ns[index] = int(round(pts_ms * 1e6))
+        self._position = index + 1
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        self.cache.put(index, frame)
+        return frame
+
+    def _new_request(self):
+        with self._condition:
+            return self._request is not None or self._stop
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._request is None and not self._stop:
+                    self._condition.wait()
+                if self._stop:
+                    return
+                index, emit = self._request
+                self._request = None
+            try:
+                frame = self.cache.get(index)
+                if emit and frame is None:
+                    if 0 <= self._position <= index <= self._position + self.prefetch:
+                        first = self._position  # reading forward is cheaper than seeking
+                    else:
+                        # seek before the frame so that stepping back is then served from the cache
+                        first = max(0, index - self.prefetch_back)
+                    for ind in range(first, index + 1):
+                        if ind < index and self._new_request():
+                            break
+                        frame = self._read(ind)
+                if emit and frame is not None:
+                    self.frame_signal.emit(index, frame)
+                for ind in range(index + 1, min(self.n_frames, index + 1 + self.prefetch)):
+                    if self._new_request():
+                        break
+                    if ind not in self.cache:
+                        self._read(ind)
+            except Exception as e:
+                logging.exception(f'VideoDecoder: {str(e)}')
+
+
+class VideoPlayer(QtWidgets.QWidget):
+    """
+    Video player used to annotate a recorded video: play/pause, frame stepping, scrubbing and playback speed. The
+    current frame index and its presentation time are used as the time of the logged events.
+    """
+    frame_changed_signal = pyqtSignal(int)
+
+    def __init__(self, parent=None, cache_mb=512):
+        super().__init__(parent)
+        self.decoder = VideoDecoder(FrameCache(cache_mb * 1024 ** 2))
+        self.decoder.frame_signal.connect(self.show_frame)
+        self.current_frame = 0
+        self._requested = None
+        self._image = None
+
+        layout = QtWidgets.QVBoxLayout()
+        self.setLayout(layout)
+        self.image_label = QtWidgets.QLabel()
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.image_label.setMinimumSize(320, 240)
+        self.image_label.setSizePolicy(QtWidgets.QSizePolicy.Ignored, QtWidgets.QSizePolicy.Ignored)
+        layout.addWidget(self.image_label)
+
+        self.slider = QtWidgets.QSlider(Qt.Horizontal)
+        self.slider.setFocusPolicy(Qt.NoFocus)
+        layout.addWidget(self.slider)
+
+        controls = QtWidgets.QHBoxLayout()
+        self.buttons = dict([])
+        for name, step in (('<<', -10), ('<', -1), ('Play', None), ('>', 1), ('>>', 10)):
+            button = QtWidgets.QPushButton(name)
+            button.setFocusPolicy(Qt.NoFocus)
+            if step is None:
+                button.setCheckable(True)
+                button.toggled.connect(self.play)
+            else:
+                button.clicked.connect(self.create_step_slot(step))
+            controls.addWidget(button)
+            self.buttons[name] = button
+        controls.addWidget(QtWidgets.QLabel('Speed:'))
+        self.speed_spin = QtWidgets.QDoubleSpinBox()
+        self.speed_spin.setRange(0.05, 8.)
+        self.speed_spin.setSingleStep(0.25)
+        self.speed_spin.setValue(1.)
+        self.speed_spin.valueChanged.connect(self.set_speed)
+        controls.addWidget(self.speed_spin)
+        self.position_label = QtWidgets.QLabel()
+        controls.addWidget(self.position_label)
+        layout.addLayout(controls)
+
+        self.slider.valueChanged.connect(self.seek)
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.next_frame)
+
+    @property
+    def loaded(self):
+        return self.decoder.path is not None
+
+    def open(self, path):
+        self.play(False)
+        self.decoder.open(path)
+        self.current_frame = 0
+        self._requested = None
+        self.slider.blockSignals(True)
+        self.slider.setRange(0, max(0, self.decoder.n_frames - 1))
+        self.slider.setValue(0)
+        self.slider.blockSignals(False)
+        self.set_speed(self.speed_spin.value())
+        self.seek(0)
+
+    def close_video(self):
+        self.play(False)
+        self.decoder.close()
+        self.decoder.path = None
+
+    def create_step_slot(self, step):
+        return lambda: self.step(step)
+
+    def step(self, step=1):
+        self.seek((self._requested if self._requested is not None else self.current_frame) + step)
+
+    def seek(self, index):
+        if not self.loaded:
+            return
+        index = min(max(0, index), max(0, self.decoder.n_frames - 1))
+        self._requested = index
+        self.decoder.request(index)
+
+    def set_speed(self, speed):
+        if self.decoder.fps:
+            self.timer.setInterval(max(1, int(1000 / (self.decoder.fps * speed))))
+
+    def play(self, play=True):
+        self.buttons['Play'].blockSignals(True)
+        self.buttons['Play'].setChecked(play)
+        self.buttons['Play'].setText('Pause' if play else 'Play')
+        self.buttons['Play'].blockSignals(False)
+        if play and self.loaded:
+            self.timer.start()
+        else:
+            self.timer.stop()
+
+    def next_frame(self):
+        if self._requested is not None and self._requested != self.current_frame:
+            return  # the previous frame is still being decoded: drop this one rather than lagging behind
+        if self.current_frame >= self.decoder.n_frames - 1:
+            self.play(False)
+            return
+        self.seek(self.current_frame + 1)
+
+    def show_frame(self, index, frame):
+        if self._requested is not None and index != self._requested:
+            return
+        self.current_frame = index
+        height, width = frame.shape[:2]
+        self._image = QtGui.QImage(frame.data, width, height, frame.strides[0], QtGui.QImage.Format_RGB888)
+        self.image_label.setPixmap(QtGui.QPixmap.fromImage(self._image).scaled(
+            self.image_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+        self.slider.blockSignals(True)
+        self.slider.setValue(index)
+        self.slider.blockSignals(False)
+        self.position_label.setText(f'Frame {index}/{self.decoder.n_frames - 1}, '
+                                    f'{self.current_time_ns() / 1e9:.3f} s')
+        self.frame_changed_signal.emit(index)
+
+    def current_time_ns(self):
+        """
+        Presentation time (in ns since the start of the video) of the displayed frame
+        """
+        return self.decoder.time_ns(self.current_frame)
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Right:
+            self.step(1)
+        elif event.key() == Qt.Key_Left:
+            self.step(-1)
+        else:
+            super().keyPressEvent(event)
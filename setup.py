@@ -83,6 +83,10 @@ setup(
     install_requires=[
         'pymodaq>=2.0',
         ],
+    extras_require={
+        'video': ['opencv-python'],  # annotation of recorded videos
+        'parquet': ['pyarrow'],  # export of the scans to Parquet files
+        },
     include_package_data=True,
     **setupOpts
 )
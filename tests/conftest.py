@@ -0,0 +1,78 @@
+"""
+Fixtures of the tests: h5 files and scans using only PyTables (no H5Saver), and the QApplication
+"""
+import os
+
+import numpy as np
+import tables
+import pytest
+
+
+@pytest.fixture
+def h5file(tmp_path):
+    h5file = tables.open_file(str(tmp_path / 'scans.h5'), 'w')
+    yield h5file
+    if h5file.isopen:
+        h5file.close()
+
+
+class Saver:
+    """
+    The part of H5Saver used by the table storage: the h5 file and its filters
+    """
+    def __init__(self, h5file):
+        self.h5_file = h5file
+        self.filters = tables.Filters(complevel=5, complib='zlib')
+
+
+@pytest.fixture
+def saver(h5file):
+    return Saver(h5file)
+
+
+@pytest.fixture
+def make_array_scan(h5file):
+    """
+    Factory creating a scan group laid out as the arrays storage mode does (capitalized enlargeable arrays, as
+    H5Saver names them)
+    """
+    def make_array_scan(name='Scan000', actions=('Eat', 'Landed'), save_bee=True, save_frame=False):
+        scan_group = h5file.create_group('/', name)
+        scan_group._v_attrs['scan_done'] = False
+        time_axis = h5file.create_earray(scan_group, 'Time_axis', tables.Int64Atom(), (0,))
+        time_axis._v_attrs['units'] = 'ns'
+        action_array = h5file.create_earray(scan_group, 'Actions', tables.Int16Atom(), (0,))
+        action_array._v_attrs['actions'] = list(actions)
+        action_array._v_attrs['encoding'] = 'codes'
+        if save_bee:
+            h5file.create_earray(scan_group, 'Bees', tables.Int64Atom(), (0,))
+        if save_frame:
+            h5file.create_earray(scan_group, 'Frames', tables.Int64Atom(), (0,))
+        return scan_group
+    return make_array_scan
+
+
+@pytest.fixture
+def append_array_events():
+    """
+    Append events to the arrays of a scan made by make_array_scan, without updating its footer
+    """
+    def append_array_events(scan_group, timestamps, codes, bees=None):
+        scan_group.Time_axis.append(np.asarray(timestamps, dtype=np.int64))
+        scan_group.Actions.append(np.asarray(codes, dtype=np.int16))
+        if bees is not None:
+            scan_group.Bees.append(np.asarray(bees, dtype=np.int64))
+    return append_array_events
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """
+    QApplication of the tests of the Qt objects, offscreen unless another platform is set
+    """
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5 import QtWidgets
+    app = QtWidgets.QApplication.instance()
+    if app is None:
+        app = QtWidgets.QApplication([])
+    return app
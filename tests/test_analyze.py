@@ -0,0 +1,58 @@
+import numpy as np
+
+from beeactions.analyze import transition_matrix, bout_metrics, analyze_scan, iter_scan_groups
+from beeactions.h5writer import Event
+from beeactions.storage import create_storage
+
+
+def test_transition_matrix():
+    times = np.array([0., 1., 2., 3., 4., 5.])
+    codes = np.array([0, 0, 1, 1, 2, 0])
+    bees = np.array([1, 2, 1, 2, 1, -1])  # bee 1: 0 -> 1 -> 2, bee 2: 0 -> 1, no bee: ignored
+    matrix = transition_matrix(times, codes, bees, 3)
+    assert matrix.tolist() == [[0, 2, 0], [0, 0, 1], [0, 0, 0]]
+
+
+def test_transition_matrix_sorts_by_time():
+    times = np.array([2., 0., 1.])
+    codes = np.array([2, 0, 1])
+    bees = np.array([1, 1, 1])
+    assert transition_matrix(times, codes, bees, 3).tolist() == [[0, 1, 0], [0, 0, 1], [0, 0, 0]]
+
+
+def test_transition_matrix_without_transitions():
+    assert transition_matrix(np.array([0.]), np.array([1]), np.array([1]), 2).tolist() == [[0, 0], [0, 0]]
+    assert transition_matrix(np.array([]), np.array([], dtype=int), np.array([], dtype=int), 2).sum() == 0
+
+
+def test_bout_metrics():
+    # bee 1: bouts [0, 1, 2] and [10, 11], bee 2: bout [0.5], bee -1 ignored
+    times = np.array([0., 0.5, 1., 2., 10., 11., 3.])
+    bees = np.array([1, 2, 1, 1, 1, 1, -1])
+    metrics = bout_metrics(times, bees, bout_gap=5.)
+    assert metrics['n_bouts'] == 3
+    assert metrics['bees'] == 2
+    assert metrics['duration']['p50'] == 1.
+    assert metrics['interval']['p50'] == 8.  # from the end of the first bout of bee 1 to the start of the next one
+
+
+def test_bout_metrics_without_bees():
+    metrics = bout_metrics(np.array([1., 2.]), np.array([-1, -1]), bout_gap=5.)
+    assert metrics['n_bouts'] == 0
+    assert metrics['bees'] == 0
+    assert metrics['duration']['p50'] is None
+
+
+def test_analyze_scan(h5file, saver):
+    scan_group = h5file.create_group('/', 'Scan000')
+    create_storage('table', saver, scan_group, ['Eat', 'Landed']).write(
+        [Event(0, 'Eat', 1), Event(1000000000, 'Landed', 1), Event(3000000000, 'Eat', None)])
+    assert [group._v_pathname for group in iter_scan_groups(h5file)] == ['/Scan000']
+
+    metrics = analyze_scan(scan_group, per_bee=True)
+    assert metrics['n_events'] == 3
+    assert metrics['duration'] == 3.
+    assert metrics['action_counts'] == dict(Eat=2, Landed=1)
+    assert metrics['first_latency'] == dict(Eat=0., Landed=1.)
+    assert metrics['transitions'] == [[0, 1], [0, 0]]
+    assert metrics['bee_transitions'] == {'1': [[0, 1], [0, 0]]}
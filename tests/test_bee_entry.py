@@ -0,0 +1,76 @@
+import pytest
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt
+from PyQt5.QtTest import QTest
+
+from beeactions.bee_entry import BeeNumberEntry
+from beeactions.key_dispatcher import KeyDispatcher
+
+
+@pytest.fixture
+def entry(qapp):
+    entry = BeeNumberEntry(timeout=0.05)
+    entry.events = []
+    entry.event_signal.connect(lambda now, action, bee: entry.events.append((now, action, bee)))
+    entry.set_enabled()
+    entry.widget = QtWidgets.QWidget()
+    yield entry
+    entry.set_enabled(False)
+
+
+def type_keys(entry, *keys):
+    for key in keys:
+        QTest.keyClick(entry.widget, key)
+
+
+def test_digits_before_action(entry):
+    type_keys(entry, Qt.Key_1, Qt.Key_2)
+    entry.action(10, 'Eat')
+    assert entry.events == [(10, 'Eat', 12)]
+    assert entry.pending_action() is None
+
+
+def test_digits_after_action_committed_by_enter(entry):
+    entry.action(10, 'Eat')
+    assert entry.pending_action() == 'Eat'
+    type_keys(entry, Qt.Key_4, Qt.Key_2, Qt.Key_Backspace, Qt.Key_7)
+    assert entry.events == []
+    type_keys(entry, Qt.Key_Return)
+    assert entry.events == [(10, 'Eat', 47)]  # time of the action, not of the commit
+
+
+def test_pending_action_committed_by_next_action(entry):
+    entry.action(10, 'Eat')
+    type_keys(entry, Qt.Key_3)
+    entry.action(20, 'Landed')
+    assert entry.events == [(10, 'Eat', 3)]
+    assert entry.pending_action() == 'Landed'
+
+
+def test_pending_action_committed_at_timeout(entry):
+    entry.action(10, 'Eat')
+    type_keys(entry, Qt.Key_5)
+    QTest.qWait(200)
+    entry.action(20, 'Landed')
+    QTest.qWait(200)
+    assert entry.events == [(10, 'Eat', 5), (20, 'Landed', -1)]
+
+
+def test_digits_without_action_expire(entry):
+    type_keys(entry, Qt.Key_1)
+    QTest.qWait(200)
+    entry.action(10, 'Eat')
+    assert entry.pending_action() == 'Eat'
+    type_keys(entry, Qt.Key_1, Qt.Key_2, Qt.Key_Escape, Qt.Key_3, Qt.Key_Enter)
+    assert entry.events == [(10, 'Eat', 3)]
+
+
+def test_reserved_keys_and_chords_are_not_captured(entry):
+    entry.set_reserved_keys([Qt.Key_9])
+    dispatcher = KeyDispatcher()
+    dispatcher.set_bindings(['G, 1'])
+    entry.set_dispatcher(dispatcher)
+    dispatcher.key_press(Qt.Key_G, 0)
+    type_keys(entry, Qt.Key_9, Qt.Key_1, Qt.Key_2)
+    entry.action(10, 'Eat')
+    assert entry.events == [(10, 'Eat', 2)]
@@ -0,0 +1,94 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+import tables
+
+from beeactions.catalog import Catalog, summarize_file
+from beeactions.h5writer import Event
+from beeactions.storage import create_storage
+
+
+def write_scans(path, author, sample, scans):
+    """
+    Write a h5 file holding a dataset of author and sample with scans: dict of scan name and list of events
+    """
+    with tables.open_file(str(path), 'w') as h5file:
+        dataset = h5file.create_group('/', 'Raw_datas')
+        dataset._v_attrs['type'] = 'dataset'
+        dataset._v_attrs['author'] = author
+        dataset._v_attrs['sample'] = sample
+        for name, events in scans.items():
+            scan_group = h5file.create_group(dataset, name)
+            scan_group._v_attrs['author'] = author
+            scan_group._v_attrs['scan_done'] = True
+            saver = SimpleNamespace(h5_file=h5file, filters=tables.Filters(complevel=5, complib='zlib'))
+            storage = create_storage('table', saver, scan_group, ['Eat', 'Landed', 'Attack'], index=False)
+            storage.write(events)
+            storage.write_footer()
+    return os.path.abspath(str(path))
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = Catalog(str(tmp_path / 'catalog.sqlite'))
+    yield catalog
+    catalog.close()
+
+
+@pytest.fixture
+def files(tmp_path, catalog):
+    (tmp_path / 'data').mkdir()
+    files = [write_scans(tmp_path / 'data' / 'ada.h5', 'Ada Lovelace', 'hive_1',
+                         dict(Scan000=[Event(10, 'Attack', 3), Event(20, 'Attack', 4), Event(30, 'Eat', 3)],
+                              Scan001=[Event(10, 'Landed', 5)])),
+             write_scans(tmp_path / 'data' / 'bob.h5', 'Bob', 'hive1',
+                         dict(Scan000=[Event(1000000000, 'Attack', 5)]))]
+    for path in files:
+        catalog.update(summarize_file(path))
+    return files
+
+
+def test_query_by_attributes(catalog, files):
+    ada, bob = files
+    assert [(scan['file'], scan['path']) for scan in catalog.query_scans()] == \
+        [(ada, '/Raw_datas/Scan000'), (ada, '/Raw_datas/Scan001'), (bob, '/Raw_datas/Scan000')]
+    assert [scan['file'] for scan in catalog.query_scans(author='lovelace')] == [ada, ada]  # substring, no case
+    assert [scan['file'] for scan in catalog.query_scans(sample='hive_')] == [ada, ada]  # _ is not a wildcard
+    assert [scan['file'] for scan in catalog.query_scans(file='bob')] == [bob]
+    assert catalog.query_scans(author='Eve') == []
+    assert len(catalog.query_scans(limit=1)) == 1
+
+
+def test_query_by_counts(catalog, files):
+    ada, bob = files
+    scans = catalog.query_scans(action='Attack')
+    assert [(scan['file'], scan['count']) for scan in scans] == [(ada, 2), (bob, 1)]
+    assert [scan['file'] for scan in catalog.query_scans(action='Attack', min_count=2)] == [ada]
+    assert catalog.query_scans(action='Attack', author='Bob')[0]['duration_s'] == 1.
+    assert [scan['path'] for scan in catalog.query_scans(bee=5, author='Ada')] == ['/Raw_datas/Scan001']
+    assert catalog.query_scans()[0]['count'] is None
+    assert catalog.scan_counts(ada, '/Raw_datas/Scan000') == (dict(Eat=1, Landed=0, Attack=2), {3: 2, 4: 1})
+
+
+def test_index_scan(catalog, files, saver):
+    h5file = saver.h5_file  # not in the catalog yet: the whole file is indexed
+    scan_group = h5file.create_group('/', 'Scan000')
+    scan_group._v_attrs['author'] = 'Eve'
+    create_storage('table', saver, scan_group, ['Eat']).write([Event(10, 'Eat', 1)])
+    catalog.index_scan(scan_group)
+    assert [scan['n_events'] for scan in catalog.query_scans(author='Eve')] == [1]
+
+    scan_group._v_attrs['author'] = 'Eve 2'
+    catalog.index_scan(scan_group)
+    assert [scan['author'] for scan in catalog.query_scans(file=h5file.filename)] == ['Eve 2']
+
+
+def test_rescan(tmp_path, catalog, files):
+    ada, bob = files
+    os.remove(bob)
+    carl = write_scans(tmp_path / 'data' / 'carl.h5', 'Carl', 'hive2', dict(Scan000=[]))
+    running = write_scans(tmp_path / 'data' / 'running.h5', 'Dan', 'hive2', dict(Scan000=[]))
+    assert catalog.rescan([str(tmp_path / 'data')], workers=1, exclude=[running]) == (1, 1)
+    assert sorted(set([scan['file'] for scan in catalog.query_scans()])) == [ada, carl]
+    assert catalog.rescan([str(tmp_path / 'data')], workers=1, exclude=[running]) == (0, 0)  # not modified
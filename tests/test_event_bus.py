@@ -0,0 +1,124 @@
+import json
+import time
+import socket
+
+import pytest
+
+from beeactions.event_bus import EventBus, BusEvent, BusServer, Subscription, to_json_line
+
+
+@pytest.fixture
+def bus(qapp):
+    bus = EventBus()
+    bus.start()
+    yield bus
+    bus.stop()
+
+
+def publish(bus, n, session='Session00'):
+    for ind in range(n):
+        bus.publish(BusEvent(session, ind, 'Eat', ind))
+
+
+def wait_for(condition, timeout=5.):
+    start = time.perf_counter()
+    while not condition() and time.perf_counter() - start < timeout:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_drop_policy(bus):
+    subscription = bus.subscribe('slow', maxsize=2, policy='drop')
+    publish(bus, 5)
+    bus.flush()
+    assert [event.timestamp for event in subscription.get(timeout=0)] == [0, 1]  # the last events are dropped
+    assert subscription.n_dropped == 3
+    assert bus.stats()['n_published'] == 5
+
+
+def test_session_filter(bus):
+    subscription = bus.subscribe('session', session='Session01')
+    publish(bus, 2, 'Session00')
+    publish(bus, 1, 'Session01')
+    bus.flush()
+    assert [event.session for event in subscription.get(timeout=0)] == ['Session01']
+
+
+def test_block_policy_delivers_all_events(bus):
+    subscription = bus.subscribe('writer', maxsize=1, policy='block', backlog_size=100)
+    publish(bus, 20)
+    bus.flush()
+    timestamps = []
+    while len(timestamps) < 20:
+        events = subscription.get(timeout=1.)
+        assert events
+        timestamps.extend([event.timestamp for event in events])
+    assert timestamps == list(range(20))
+    assert subscription.n_dropped == 0
+    assert not subscription.overflowed
+
+
+def test_block_policy_timeout(bus):
+    subscription = bus.subscribe('stuck', maxsize=1, policy='block', block_timeout=0.05, backlog_size=100)
+    publish(bus, 3)
+    assert wait_for(lambda: subscription.n_dropped == 2)  # the first event fills the queue, never read
+    assert not subscription.overflowed
+
+
+def test_block_policy_backlog_overflow(bus):
+    subscription = bus.subscribe('stuck', maxsize=1, policy='block', block_timeout=None, backlog_size=2)
+    publish(bus, 10)
+    assert wait_for(lambda: subscription.overflowed)
+    assert subscription.n_dropped >= 6  # at most one event queued, one waiting for room and two in the backlog
+    bus.unsubscribe(subscription)  # the feeder thread stops waiting for room once closed
+    assert bus.subscriptions() == []
+    assert subscription.n_dropped + subscription.n_delivered == 10
+
+
+def test_callback_delivery_and_flush(bus):
+    received = []
+    bus.subscribe('display', callback=received.extend, maxsize=1, policy='block', backlog_size=100)
+    publish(bus, 50)
+    bus.flush()
+    assert [event.timestamp for event in received] == list(range(50))
+
+
+def test_ui_callback_errors(bus):
+    errors = []
+    bus.error_signal.connect(errors.append)
+
+    def callback(events):
+        raise RuntimeError('display closed')
+    bus.subscribe('display', callback=callback, ui=True)
+    publish(bus, 1)
+    bus.flush()
+    assert errors == ['display: 1 events not handled: display closed']
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        Subscription('bad', policy='wait')
+
+
+def test_to_json_line():
+    assert json.loads(to_json_line(BusEvent('Session00', 10, 'Eat', None, wall_ns=1000, key_ns=5))) == \
+        dict(session='Session00', timestamp_ns=10, wall_ns=1000, action='Eat', bee=-1, frame=-1)
+
+
+@pytest.mark.parametrize('line, subscription', [(b'SUBSCRIBE\n', ('drop', 1000, None)),
+                                                (b'subscribe block 10 Session01\n', ('block', 10, 'Session01'))])
+def test_read_subscription(line, subscription):
+    server, client = socket.socketpair()
+    with server, client:
+        client.sendall(line)
+        assert BusServer(None).read_subscription(server) == subscription
+
+
+@pytest.mark.parametrize('line', [b'LISTEN\n', b'SUBSCRIBE wait\n', b'SUBSCRIBE block 0\n',
+                                  b'SUBSCRIBE drop 1000000\n', b'SUBSCRIBE drop ten\n', b'\n'])
+def test_read_invalid_subscription(line):
+    server, client = socket.socketpair()
+    with server, client:
+        client.sendall(line)
+        with pytest.raises(ValueError):
+            BusServer(None).read_subscription(server)
@@ -0,0 +1,90 @@
+import os
+import csv
+import json
+
+import pytest
+
+from beeactions.export import export_file, output_names, CSVExporter
+from beeactions.h5writer import Event
+from beeactions.storage import create_storage
+
+
+@pytest.fixture
+def h5_path(h5file, saver):
+    """
+    h5 file with two scans of events, the first one holding a dataset attribute
+    """
+    dataset = h5file.create_group('/', 'Raw_datas')
+    dataset._v_attrs['type'] = 'dataset'
+    dataset._v_attrs['author'] = 'Ada'
+    for name, events in (('Scan000', [Event(10, 'Eat', 3), Event(20, 'Landed', None)]),
+                         ('Scan001', [Event(5, 'Landed', 7)])):
+        scan_group = h5file.create_group(dataset, name)
+        scan_group._v_attrs['sample'] = name.lower()
+        scan_group._v_attrs['settings'] = '<xml/>'
+        create_storage('table', saver, scan_group, ['Eat', 'Landed']).write(events)
+    h5_path = h5file.filename
+    h5file.close()
+    return h5_path
+
+
+def test_export_csv_round_trip(h5_path, tmp_path):
+    result = export_file(h5_path, str(tmp_path / 'out'), formats=('csv',), chunk_size=1)
+    assert 'error' not in result
+    assert result['n_scans'] == 2
+    assert result['n_events'] == 3
+    assert result['outputs'] == [str(tmp_path / 'out' / 'scans.csv')]
+
+    with open(tmp_path / 'out' / 'scans.csv', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows == [['scan', 'timestamp_ns', 'time_s', 'action_code', 'action', 'bee'],
+                    ['/Raw_datas/Scan000', '10', '1e-08', '0', 'Eat', '3'],
+                    ['/Raw_datas/Scan000', '20', '2e-08', '1', 'Landed', '-1'],
+                    ['/Raw_datas/Scan001', '5', '5e-09', '1', 'Landed', '7']]
+
+    with open(tmp_path / 'out' / 'scans.json') as f:
+        metadata = json.load(f)
+    assert metadata['h5_file'] == h5_path
+    assert metadata['datasets']['/Raw_datas']['author'] == 'Ada'
+    assert metadata['scans']['/Raw_datas/Scan001']['sample'] == 'scan001'
+    assert 'settings' not in metadata['scans']['/Raw_datas/Scan000']  # only exported with settings=True
+
+
+def test_export_parquet(h5_path, tmp_path):
+    pq = pytest.importorskip('pyarrow.parquet')
+    result = export_file(h5_path, str(tmp_path), formats=('parquet',), name=os.path.join('sub', 'day1'))
+    assert result['outputs'] == [str(tmp_path / 'sub' / 'day1.parquet')]
+    table = pq.read_table(str(tmp_path / 'sub' / 'day1.parquet'))
+    assert table.column('timestamp_ns').to_pylist() == [10, 20, 5]
+    assert table.column('action').to_pylist() == ['Eat', 'Landed', 'Landed']
+    assert json.loads(table.schema.metadata[b'beeactions'])['datasets']['/Raw_datas']['author'] == 'Ada'
+
+
+def test_export_error_removes_outputs(h5_path, tmp_path, monkeypatch):
+    def write(self, data):
+        raise IOError('disk full')
+    monkeypatch.setattr(CSVExporter, 'write', write)
+    result = export_file(h5_path, str(tmp_path / 'out'), formats=('csv',))
+    assert result == dict(file=h5_path, error='disk full')
+    assert os.listdir(tmp_path / 'out') == []
+
+
+def test_export_unreadable_file(tmp_path):
+    path = str(tmp_path / 'broken.h5')
+    with open(path, 'wb') as f:
+        f.write(b'not a h5 file')
+    assert 'error' in export_file(path, str(tmp_path / 'out'), formats=('csv',))
+
+
+def test_output_names_collisions(tmp_path):
+    for directory in ('a', 'b', os.path.join('a', 'sub')):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / 'scans.h5').touch()
+    (tmp_path / 'a' / 'notes.txt').touch()
+    (tmp_path / 'scans_1.h5').touch()
+    inputs = [str(tmp_path / 'a'), str(tmp_path / 'b'), str(tmp_path / 'b' / 'scans.h5'), str(tmp_path / 'scans_1.h5')]
+    assert output_names(inputs) == [(str(tmp_path / 'a' / 'scans.h5'), 'scans'),
+                                    (str(tmp_path / 'a' / 'sub' / 'scans.h5'), os.path.join('sub', 'scans')),
+                                    (str(tmp_path / 'b' / 'scans.h5'), 'scans_1'),
+                                    (str(tmp_path / 'b' / 'scans.h5'), 'scans_2'),
+                                    (str(tmp_path / 'scans_1.h5'), 'scans_1_1')]
@@ -0,0 +1,39 @@
+import socket
+
+import pytest
+
+from beeactions.ingest import IngestEvent, parse_line, format_event, parse_address
+
+
+def test_parse_line():
+    assert parse_line(b'1700000000000000000\tLanded\t12', 5) == IngestEvent(1700000000000000000, 'Landed', 12, 5)
+    assert parse_line(b'1700000000000000000\tLanded\r', 5) == IngestEvent(1700000000000000000, 'Landed', -1, 5)
+
+
+def test_parse_line_empty_fields():
+    assert parse_line(b'\tLanded\t', 5) == IngestEvent(None, 'Landed', -1, 5)  # time of reception, no bee
+    assert parse_line(b' \tLanded\t-1', 5) == IngestEvent(None, 'Landed', -1, 5)
+
+
+def test_parse_line_comments_and_empty_lines():
+    assert parse_line(b'', 5) is None
+    assert parse_line(b' \r', 5) is None
+    assert parse_line(b'# tracker v2', 5) is None
+
+
+@pytest.mark.parametrize('line', [b'Landed', b'10\t\t3', b'10\tLanded\t3\textra', b'ten\tLanded\t3',
+                                  b'10\tLanded\tthree', b'\xff\tLanded'])
+def test_parse_invalid_line(line):
+    with pytest.raises(ValueError):
+        parse_line(line, 5)
+
+
+def test_format_event_round_trip():
+    line = format_event('Eat', 7, 1700000000000000000)
+    assert parse_line(line.rstrip(b'\n'), 5) == IngestEvent(1700000000000000000, 'Eat', 7, 5)
+    assert parse_line(format_event('Eat').rstrip(b'\n'), 5) == IngestEvent(None, 'Eat', -1, 5)
+
+
+def test_parse_address():
+    assert parse_address('127.0.0.1:50777') == (socket.AF_INET, ('127.0.0.1', 50777))
+    assert parse_address(':50777') == (socket.AF_INET, ('127.0.0.1', 50777))
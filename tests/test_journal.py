@@ -0,0 +1,159 @@
+import os
+
+import numpy as np
+import tables
+
+from beeactions.journal import EventJournal, read_journal, replay_journal, replay_journals, record_dtype, JOURNAL_EXT
+
+actions = ['Eat', 'Landed']
+
+
+def write_journal(path, h5_path, scan_path, events, offsets=dict([])):
+    journal = EventJournal.create(str(path), h5_path, scan_path, actions, offsets)
+    for event in events:
+        journal.append(*event)
+    journal.close()
+    return str(path)
+
+
+def test_read_journal(tmp_path):
+    path = write_journal(tmp_path / f'scan{JOURNAL_EXT}', 'scans.h5', '/Scan000',
+                         [(10, 0, 3, -1), (20, 1, -1, -1), (30, 1, 7, 12)])
+    header, records = read_journal(path)
+    assert header['h5_file'] == 'scans.h5'
+    assert header['scan_path'] == '/Scan000'
+    assert header['actions'] == actions
+    assert records.dtype == record_dtype
+    assert records['timestamp'].tolist() == [10, 20, 30]
+    assert records['action'].tolist() == [0, 1, 1]
+    assert records['bee'].tolist() == [3, -1, 7]
+    assert records['frame'].tolist() == [-1, -1, 12]
+
+
+def test_read_journal_drops_truncated_record(tmp_path):
+    path = write_journal(tmp_path / f'scan{JOURNAL_EXT}', 'scans.h5', '/Scan000', [(10, 0, 3, -1), (20, 1, 4, -1)])
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 5)  # crash in the middle of the last write
+    header, records = read_journal(path)
+    assert records['timestamp'].tolist() == [10]
+
+
+def test_replay_appends_missing_events(h5file, tmp_path, make_array_scan, append_array_events):
+    scan_group = make_array_scan(actions=actions)
+    append_array_events(scan_group, [1, 2], [0, 0], [1, 1])  # saved before the journal was started
+    offsets = dict(time_axis=2, actions=2, bees=2)
+    append_array_events(scan_group, [10], [0], [3])  # only the first journal event reached the h5 file
+    h5_path = h5file.filename
+    h5file.close()
+
+    path = write_journal(tmp_path / f'scan{JOURNAL_EXT}', h5_path, '/Scan000',
+                         [(10, 0, 3, -1), (20, 1, 4, -1), (30, 1, 5, -1)], offsets)
+    assert replay_journal(path) == 2
+    with tables.open_file(h5_path, 'r') as h5file:
+        scan_group = h5file.root.Scan000
+        assert scan_group.Time_axis.read().tolist() == [1, 2, 10, 20, 30]
+        assert scan_group.Actions.read().tolist() == [0, 0, 0, 1, 1]
+        assert scan_group.Bees.read().tolist() == [1, 1, 3, 4, 5]
+        assert scan_group._v_attrs['recovered_events'] == 2
+
+
+def test_replay_completes_arrays_left_out_of_sync(h5file, tmp_path, make_array_scan):
+    scan_group = make_array_scan(actions=actions)
+    scan_group.Time_axis.append(np.array([10, 20], dtype=np.int64))  # crash between the appends of an event
+    scan_group.Actions.append(np.array([0], dtype=np.int16))
+    h5_path = h5file.filename
+    h5file.close()
+
+    path = write_journal(tmp_path / f'scan{JOURNAL_EXT}', h5_path, '/Scan000', [(10, 0, 3, -1), (20, 1, 4, -1)])
+    assert replay_journal(path) == 2
+    with tables.open_file(h5_path, 'r') as h5file:
+        scan_group = h5file.root.Scan000
+        assert scan_group.Time_axis.read().tolist() == [10, 20]
+        assert scan_group.Actions.read().tolist() == [0, 1]
+        assert scan_group.Bees.read().tolist() == [3, 4]
+
+
+def test_replay_frames(h5file, tmp_path, make_array_scan):
+    make_array_scan(actions=actions, save_frame=True)
+    h5_path = h5file.filename
+    h5file.close()
+
+    path = write_journal(tmp_path / f'scan{JOURNAL_EXT}', h5_path, '/Scan000', [(10, 0, 3, 250), (20, 1, 4, 500)])
+    assert replay_journal(path) == 2
+    with tables.open_file(h5_path, 'r') as h5file:
+        assert h5file.root.Scan000.Frames.read().tolist() == [250, 500]
+
+
+def test_replay_skips_stopped_scan(h5file, tmp_path, make_array_scan):
+    scan_group = make_array_scan(actions=actions)
+    scan_group._v_attrs['scan_done'] = True
+    h5_path = h5file.filename
+    h5file.close()
+
+    path = write_journal(tmp_path / f'scan{JOURNAL_EXT}', h5_path, '/Scan000', [(10, 0, 3, -1)])
+    assert replay_journal(path) == 0
+    with tables.open_file(h5_path, 'r') as h5file:
+        assert h5file.root.Scan000.Time_axis.nrows == 0
+
+
+def test_replay_into_recovered_file(tmp_path):
+    h5_path = str(tmp_path / 'lost.h5')
+    with open(h5_path, 'wb') as f:
+        f.write(b'not a h5 file')
+    path = write_journal(tmp_path / f'scan{JOURNAL_EXT}', h5_path, '/Raw_datas/Scan000',
+                         [(10, 0, 3, -1), (20, 1, 4, -1)])
+    assert replay_journal(path) == 2
+    with tables.open_file(str(tmp_path / 'lost_Raw_datas_Scan000_recovered.h5'), 'r') as h5file:
+        assert h5file.root.time_axis.read().tolist() == [10, 20]
+        assert h5file.root.actions._v_attrs['actions'] == actions
+        assert h5file.root._v_attrs['scan_path'] == '/Raw_datas/Scan000'
+
+
+def test_replay_journals_removes_replayed(h5file, tmp_path, make_array_scan):
+    make_array_scan(actions=actions)
+    h5_path = h5file.filename
+    h5file.close()
+    journal_dir = tmp_path / 'journals'
+    journal_dir.mkdir()
+    path = write_journal(journal_dir / f'scan{JOURNAL_EXT}', h5_path, '/Scan000', [(10, 0, 3, -1)])
+
+    assert replay_journals(str(journal_dir)) == [(path, 1)]
+    assert not os.path.exists(path)
+
+
+def test_replay_into_table(h5file, saver, tmp_path):
+    from beeactions.storage import create_storage
+    from beeactions.h5writer import Event
+    scan_group = h5file.create_group('/', 'Scan000')
+    scan_group._v_attrs['scan_done'] = False
+    storage = create_storage('table', saver, scan_group, actions)
+    storage.write([Event(1, 'Eat', 1)])
+    offsets = storage.offsets()
+    storage.write([Event(10, 'Eat', 3)])
+    h5_path = h5file.filename
+    h5file.close()
+
+    path = write_journal(tmp_path / f'scan{JOURNAL_EXT}', h5_path, '/Scan000',
+                         [(10, 0, 3, -1), (20, 1, -1, -1), (30, 1, 5, -1)], offsets)
+    assert replay_journal(path) == 2
+    with tables.open_file(h5_path, 'r') as h5file:
+        table = h5file.root.Scan000.events
+        assert table.col('timestamp').tolist() == [1, 10, 20, 30]
+        assert table.col('action').tolist() == [0, 0, 1, 1]
+        assert table.col('bee').tolist() == [1, 3, -1, 5]
+
+
+def test_replay_journals_skips_journals_in_use(h5file, tmp_path, make_array_scan):
+    make_array_scan(actions=actions)
+    h5_path = h5file.filename
+    h5file.close()
+    journal_dir = tmp_path / 'journals'
+    journal_dir.mkdir()
+    path = str(journal_dir / f'scan{JOURNAL_EXT}')
+    journal = EventJournal.create(path, h5_path, '/Scan000', actions)  # scan running in another instance
+    journal.append(10, 0, 3)
+
+    assert replay_journals(str(journal_dir)) == []
+    assert os.path.exists(path)
+    journal.close()
+    assert replay_journals(str(journal_dir)) == [(path, 1)]
@@ -0,0 +1,97 @@
+import pytest
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt
+from PyQt5.QtTest import QTest
+
+from beeactions.key_dispatcher import KeyDispatcher, parse_sequence
+
+
+@pytest.fixture
+def dispatcher(qapp):
+    dispatcher = KeyDispatcher(chord_timeout=0.05)
+    dispatcher.activated = []
+    dispatcher.activated_signal.connect(lambda action_id, time_ns: dispatcher.activated.append((action_id, time_ns)))
+    yield dispatcher
+    dispatcher.set_enabled(False)
+
+
+def test_single_keys(dispatcher):
+    assert dispatcher.set_bindings(['E', 'Ctrl+L', '']) == []
+    assert dispatcher.key_press(Qt.Key_E, 10)
+    assert dispatcher.key_press(Qt.Key_L | int(Qt.ControlModifier), 20)
+    assert not dispatcher.key_press(Qt.Key_L, 30)  # not bound without the modifier
+    assert dispatcher.activated == [(0, 10), (1, 20)]
+
+
+def test_conflicting_sequences(dispatcher):
+    assert dispatcher.set_bindings(['E', 'L', 'E']) == [2]
+    assert dispatcher.bindings[parse_sequence('E')] == 0
+
+
+def test_chord(dispatcher):
+    dispatcher.set_bindings(['G, 1', 'G, 2'])
+    assert dispatcher.key_press(Qt.Key_G, 10)
+    assert dispatcher.continues(Qt.Key_2)
+    assert not dispatcher.continues(Qt.Key_3)
+    assert dispatcher.activated == []
+    assert dispatcher.key_press(Qt.Key_2, 20)
+    assert dispatcher.activated == [(1, 20)]  # time of the key completing the sequence
+    assert not dispatcher.continues(Qt.Key_1)
+
+
+def test_broken_chord_starts_new_sequence(dispatcher):
+    dispatcher.set_bindings(['G, 1', 'E'])
+    dispatcher.key_press(Qt.Key_G, 10)
+    assert dispatcher.key_press(Qt.Key_E, 20)
+    assert dispatcher.activated == [(1, 20)]
+    assert not dispatcher.key_press(Qt.Key_1, 30)
+
+
+def test_bound_prefix_triggered_at_timeout(dispatcher):
+    dispatcher.set_bindings(['G', 'G, 1'])
+    assert dispatcher.key_press(Qt.Key_G, 10)
+    assert dispatcher.activated == []
+    QTest.qWait(200)
+    assert dispatcher.activated == [(0, 10)]  # time of the key press, not of the timeout
+
+
+def test_bound_prefix_triggered_by_other_key(dispatcher):
+    dispatcher.set_bindings(['G', 'G, 1', 'E'])
+    dispatcher.key_press(Qt.Key_G, 10)
+    dispatcher.key_press(Qt.Key_E, 20)
+    assert dispatcher.activated == [(0, 10), (2, 20)]
+
+
+def test_unbound_prefix_timeout(dispatcher):
+    dispatcher.set_bindings(['G, 1'])
+    dispatcher.key_press(Qt.Key_G, 10)
+    QTest.qWait(200)
+    assert dispatcher.activated == []
+    assert not dispatcher.key_press(Qt.Key_1, 20)
+
+
+def test_disabled_actions(dispatcher):
+    dispatcher.set_bindings(['E', 'G', 'G, 1'])
+    dispatcher.set_action_enabled(0, False)
+    assert not dispatcher.key_press(Qt.Key_E, 10)  # left to the focused widget
+    dispatcher.set_action_enabled(1, False)
+    dispatcher.key_press(Qt.Key_G, 20)
+    dispatcher.timeout()
+    assert dispatcher.activated == []
+    dispatcher.set_action_enabled(0)
+    assert dispatcher.key_press(Qt.Key_E, 30)
+    assert dispatcher.activated == [(0, 30)]
+
+
+def test_event_filter(dispatcher, monkeypatch):
+    dispatcher.set_bindings(['E'])
+    dispatcher.set_enabled()
+    widget = QtWidgets.QWidget()
+    line_edit = QtWidgets.QLineEdit()
+    QTest.keyClick(widget, Qt.Key_E)
+    assert [action_id for action_id, time_ns in dispatcher.activated] == [0]
+
+    monkeypatch.setattr(dispatcher, 'is_blocked', lambda: True)  # as when a text widget has the focus
+    QTest.keyClick(line_edit, Qt.Key_E)
+    assert len(dispatcher.activated) == 1
+    assert line_edit.text() == 'e'
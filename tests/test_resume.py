@@ -0,0 +1,123 @@
+import numpy as np
+import tables
+import pytest
+
+from beeactions.h5writer import Event
+from beeactions.storage import create_storage, resume_storage, is_unfinished, read_events
+
+actions = ['Eat', 'Landed']
+
+
+def table_scan(h5file, saver):
+    scan_group = h5file.create_group('/', 'Scan000')
+    scan_group._v_attrs['scan_done'] = False
+    return scan_group, create_storage('table', saver, scan_group, actions, index=False)
+
+
+def test_resume_from_footer(h5file, saver):
+    scan_group, storage = table_scan(h5file, saver)
+    storage.write([Event(10, 'Eat', 3), Event(20, 'Landed', 3), Event(30, 'Eat', 5)])
+    storage.write_footer()
+    storage.write([Event(40, 'Landed', 5)])  # written after the last flush of the footer
+
+    resumed, tail = resume_storage(saver, scan_group)
+    assert resumed.mode == 'table'
+    assert resumed.n_events == 4
+    assert resumed.last_timestamp == 40
+    assert resumed.action_counts.tolist() == [2, 2]
+    assert resumed.bee_counts == {3: 2, 5: 2}
+    assert tail['timestamp'].tolist() == [10, 20, 30, 40]
+
+
+def test_resume_reads_only_events_after_footer(h5file, saver):
+    scan_group, storage = table_scan(h5file, saver)
+    storage.write([Event(10, 'Eat', 3), Event(20, 'Landed', 3)])
+    storage.write_footer()
+    scan_group._v_attrs['action_counts'] = np.array([7, 0])  # counts not recomputed from the events before
+    storage.write([Event(30, 'Eat', 5)])
+
+    resumed, tail = resume_storage(saver, scan_group)
+    assert resumed.action_counts.tolist() == [8, 0]
+
+
+def test_resume_without_footer(h5file, saver):
+    scan_group, storage = table_scan(h5file, saver)
+    storage.write([Event(10, 'Eat', 3), Event(20, 'Landed', -1)])
+
+    resumed, tail = resume_storage(saver, scan_group)
+    assert resumed.n_events == 2
+    assert resumed.last_timestamp == 20
+    assert resumed.action_counts.tolist() == [1, 1]
+    assert resumed.bee_counts == {3: 1}
+
+
+def test_resume_ignores_footer_ahead_of_rows(h5file, saver):
+    scan_group, storage = table_scan(h5file, saver)
+    storage.write([Event(10, 'Eat', 3), Event(20, 'Landed', 3)])
+    storage.write_footer()
+    storage.table.truncate(1)  # the footer was flushed but not the last rows
+
+    resumed, tail = resume_storage(saver, scan_group)
+    assert resumed.n_events == 1
+    assert resumed.last_timestamp == 10
+    assert resumed.action_counts.tolist() == [1, 0]
+
+
+def test_resume_tail_size(h5file, saver):
+    scan_group, storage = table_scan(h5file, saver)
+    storage.write([Event(10 * ind, 'Eat', ind) for ind in range(50)])
+    storage.write_footer()
+    resumed, tail = resume_storage(saver, scan_group)
+    assert resumed.read_footer(tail_size=5)['timestamp'].tolist() == [450, 460, 470, 480, 490]
+
+
+def test_resume_arrays_truncates_longer_arrays(make_array_scan, append_array_events):
+    scan_group = make_array_scan(actions=actions)
+    append_array_events(scan_group, [10, 20, 30], [0, 1, 0], [3, 3, 5])
+    scan_group.Time_axis.append(np.array([40], dtype=np.int64))  # crash between the appends of an event
+    scan_group.Time_axis._v_attrs['shape'] = (4,)
+    assert is_unfinished(scan_group)
+
+    resumed, tail = resume_storage(None, scan_group)
+    assert resumed.mode == 'arrays'
+    assert scan_group.Time_axis.nrows == 3
+    assert tuple(scan_group.Time_axis._v_attrs['shape']) == (3,)
+    assert resumed.n_events == 3
+    assert resumed.last_timestamp == 30
+    assert tail['timestamp'].tolist() == [10, 20, 30]
+
+    resumed.write([Event(50, 'Landed', None)])
+    events, names = read_events(scan_group)
+    assert events['timestamp'].tolist() == [10, 20, 30, 50]
+    assert events['bee'].tolist() == [3, 3, 5, -1]
+
+
+def test_resume_adds_new_actions(make_array_scan, append_array_events):
+    scan_group = make_array_scan(actions=actions)
+    append_array_events(scan_group, [10], [1], [3])
+    resumed, tail = resume_storage(None, scan_group, ['Landed', 'Attack'])
+    assert resumed.actions == ['Eat', 'Landed', 'Attack']
+    assert resumed.action_counts.tolist() == [0, 1, 0]
+    assert list(scan_group.Actions._v_attrs['actions']) == resumed.actions
+
+
+def test_stopped_scan_is_not_resumed(make_array_scan):
+    scan_group = make_array_scan(actions=actions)
+    scan_group._v_attrs['scan_done'] = True
+    assert not is_unfinished(scan_group)
+
+
+def test_string_actions_cannot_be_resumed(h5file):
+    scan_group = h5file.create_group('/', 'Scan000')
+    scan_group._v_attrs['scan_done'] = False
+    h5file.create_earray(scan_group, 'Time_axis', tables.Float64Atom(), (0,))
+    h5file.create_vlarray(scan_group, 'Actions', tables.VLStringAtom())
+    with pytest.raises(ValueError):
+        resume_storage(None, scan_group)
+
+
+def test_wall_times_of_resumed_scan():
+    from beeactions.timestamps import to_wall_ns
+    # started at wall time 1000, resumed at event time 100 (its last event) when the wall clock was at 5000
+    assert to_wall_ns([0, 10, 100, 150], 1000, [100], [5000]).tolist() == [1000, 1010, 1100, 5050]
+    assert to_wall_ns([10], 1000).tolist() == [1010]
@@ -0,0 +1,77 @@
+import numpy as np
+
+from beeactions.h5writer import Event
+from beeactions.profiles import get_profile
+from beeactions.storage import (create_storage, read_events, iter_events, query_events, read_actions, event_dtype,
+                                get_scan_array)
+
+actions = ['Eat', 'Landed', 'Attack']
+events = [Event(10, 'Eat', 3), Event(20, 'Landed', None), Event(30, 'Eat', 17), Event(40, 'Attack', 17)]
+
+
+def test_table_write_read(h5file, saver):
+    scan_group = h5file.create_group('/', 'Scan000')
+    storage = create_storage('table', saver, scan_group, actions)
+    storage.write(events[:2])
+    storage.write(events[2:])
+    assert storage.offsets() == dict(events=4)
+
+    read, names = read_events(scan_group)
+    assert read.dtype == event_dtype
+    assert names == actions
+    assert read['timestamp'].tolist() == [10, 20, 30, 40]
+    assert read['action'].tolist() == [0, 1, 0, 2]
+    assert read['bee'].tolist() == [3, -1, 17, 17]
+    assert read_actions(scan_group).names().tolist() == ['Eat', 'Landed', 'Eat', 'Attack']
+
+
+def test_table_indexes_and_chunks(h5file, saver):
+    scan_group = h5file.create_group('/', 'Scan000')
+    storage = create_storage('table', saver, scan_group, actions, profile=get_profile('durable'))
+    assert storage.table.chunkshape == (get_profile('durable').chunk_rows,)
+    assert storage.table.cols.action.is_indexed
+    assert storage.table.cols.bee.is_indexed
+
+    storage = create_storage('table', saver, h5file.create_group('/', 'Scan001'), actions, save_bee=False,
+                             index=False)
+    assert not storage.table.cols.action.is_indexed
+    assert not storage.table._v_attrs['save_bee']
+
+
+def test_table_query(h5file, saver):
+    scan_group = h5file.create_group('/', 'Scan000')
+    create_storage('table', saver, scan_group, actions).write(events)
+    h5file.flush()  # appended rows are indexed at flush, as done by the writer
+    assert query_events(scan_group, bee=17)['timestamp'].tolist() == [30, 40]
+    assert query_events(scan_group, action='Eat')['timestamp'].tolist() == [10, 30]
+    assert query_events(scan_group, action='Eat', bee=17)['timestamp'].tolist() == [30]
+    assert len(query_events(scan_group, action='Sleep')) == 0
+    assert len(query_events(scan_group)) == 4
+
+
+def test_iter_events_by_chunks(h5file, saver):
+    scan_group = h5file.create_group('/', 'Scan000')
+    create_storage('table', saver, scan_group, actions).write(events)
+    chunks = list(iter_events(scan_group, chunk_size=3))
+    assert [len(chunk) for chunk, names in chunks] == [3, 1]
+    assert np.concatenate([chunk for chunk, names in chunks])['timestamp'].tolist() == [10, 20, 30, 40]
+
+
+def test_add_actions(h5file, saver):
+    scan_group = h5file.create_group('/', 'Scan000')
+    storage = create_storage('table', saver, scan_group, actions[:2])
+    storage.add_actions(['Landed', 'Attack'])
+    storage.write(events)
+    read, names = read_events(scan_group)
+    assert names == actions
+    assert storage.action_counts.tolist() == [2, 1, 1]
+
+
+def test_arrays_scan_read_query(make_array_scan, append_array_events):
+    scan_group = make_array_scan(actions=actions)
+    append_array_events(scan_group, [10, 20, 30, 40], [0, 1, 0, 2], [3, -1, 17, 17])
+    assert get_scan_array(scan_group, 'time_axis') is scan_group.Time_axis
+    read, names = read_events(scan_group)
+    assert names == actions
+    assert read['bee'].tolist() == [3, -1, 17, 17]
+    assert query_events(scan_group, action='Eat', bee=17)['timestamp'].tolist() == [30]